@@ -0,0 +1,121 @@
+"""
+Click-to-update latency of the question cards in the Streamlit app.
+
+Clicks a card's vote button in a headless ``AppTest`` session and times the
+click until the rerun it triggers has finished, on boards of growing size.
+Run from the justask directory:
+
+    python benchmarks/click_latency.py
+    python benchmarks/click_latency.py --sizes 100 10000 --repeats 50
+
+Two figures are reported per board size:
+
+- app: the click in a session running the whole app. AppTest always reruns
+  the whole script, even for a click inside a fragment, so this is what a
+  card click costs when it triggers a full-app rerun (and an upper bound for
+  a fragment rerun).
+- card: the click in a session rendering just that card. This is the work a
+  fragment-scoped rerun of the card does on a real server.
+
+Timings are medians over --repeats clicks, after one warm-up run.
+"""
+
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+# Add the parent directory to sys.path so we can import the marshmallow_lib module
+sys.path.append(str(Path(__file__).parent.parent))
+
+from streamlit.testing.v1 import AppTest
+
+from marshmallow_lib.core import MarshmallowManager
+from marshmallow_lib.streamlit_gui import SessionState
+
+DEFAULT_SIZES = [100, 1_000, 10_000]
+DEFAULT_REPEATS = 20
+SCRIPT_TIMEOUT_S = 30
+
+
+def app_script() -> None:
+    """Script running the whole app (AppTest runs this function's body)."""
+    from marshmallow_lib.streamlit_gui import run_streamlit_app
+    run_streamlit_app("memory")
+
+
+def card_script(question_id: int) -> None:
+    """Script rendering a single question card."""
+    from marshmallow_lib import streamlit_gui
+    streamlit_gui.SessionState.setup_initial_state("memory")
+    manager = streamlit_gui.SessionState.get_manager()
+    streamlit_gui.display_question(manager.get_question_by_id(question_id))
+
+
+def make_board(size: int) -> MarshmallowManager:
+    """Build a manager holding the given number of approved questions."""
+    manager = MarshmallowManager()
+    for i in range(size):
+        manager.add_question(f"Question {i}?")
+        if i % 3 == 0:
+            manager.vote_for_question(i)
+    return manager
+
+
+def time_clicks(at: AppTest, manager: MarshmallowManager, repeats: int) -> float:
+    """
+    Click the first card's vote button repeatedly and time each click.
+
+    Args:
+        at: Session to click in
+        manager: The manager the session uses
+        repeats: Number of timed clicks
+
+    Returns:
+        Median click-to-update latency in ms
+    """
+    at.session_state[SessionState.MANAGER] = manager
+    at.session_state[SessionState.USER_SESSION] = manager.create_session()
+    at.run()  # First run pays for imports and session setup
+
+    timings = []
+    for _ in range(repeats):
+        button = next(b for b in at.button if b.key and b.key.startswith("vote_"))
+        start = time.perf_counter()
+        button.click().run()
+        timings.append((time.perf_counter() - start) * 1000)
+        if at.exception:
+            raise RuntimeError(f"Script failed: {at.exception[0].message}")
+    return statistics.median(timings)
+
+
+def measure(size: int, repeats: int) -> Dict[str, float]:
+    """Measure the app and card click latency on a board of the given size."""
+    manager = make_board(size)
+    app = AppTest.from_function(app_script, default_timeout=SCRIPT_TIMEOUT_S)
+    # The card of the newest question, which the See All tab shows first
+    card = AppTest.from_function(card_script, args=(size - 1,), default_timeout=SCRIPT_TIMEOUT_S)
+    return {
+        "app": time_clicks(app, manager, repeats),
+        "card": time_clicks(card, manager, repeats),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES,
+                        help="Board sizes (number of questions)")
+    parser.add_argument("--repeats", type=int, default=DEFAULT_REPEATS,
+                        help="Timed clicks per board size and figure")
+    args = parser.parse_args(argv)
+
+    print(f"{'questions':>10}{'app ms':>10}{'card ms':>10}")
+    for size in args.sizes:
+        result = measure(size, args.repeats)
+        print(f"{size:>10}{result['app']:>10.1f}{result['card']:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
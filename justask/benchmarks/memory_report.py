@@ -0,0 +1,90 @@
+"""
+Memory report for the compact question records.
+
+Compares the memory held by N questions stored as plain dicts (the format
+load_questions used to produce) against the same questions stored as
+QuestionRecord objects. Run from the justask directory:
+
+    python benchmarks/memory_report.py [N]
+"""
+
+import datetime
+import gc
+import json
+import random
+import sys
+import tracemalloc
+from pathlib import Path
+
+# Add the parent directory to sys.path so we can import the marshmallow_lib module
+sys.path.append(str(Path(__file__).parent.parent))
+
+from marshmallow_lib.core import MarshmallowManager
+from marshmallow_lib.records import QuestionRecord
+
+
+def make_serialized_questions(count: int) -> str:
+    """Build the JSON text of a data file with the given number of questions."""
+    manager = MarshmallowManager()
+    start = datetime.datetime(2024, 1, 1)
+    questions = []
+    for i in range(count):
+        questions.append({
+            "id": i,
+            "text": f"Question number {i}?",
+            "timestamp": (start + datetime.timedelta(seconds=i)).isoformat(),
+            "status": "approved",
+            "user_id": manager._generate_user_id(),
+            "highlighted": False,
+            "votes": random.randint(0, 30),
+        })
+    return json.dumps({"next_id": count, "questions": questions})
+
+
+def load_as_dicts(payload: str) -> list:
+    """Load questions the way the dict-based store did."""
+    questions = json.loads(payload)["questions"]
+    for q in questions:
+        q["timestamp"] = datetime.datetime.fromisoformat(q["timestamp"])
+    return questions
+
+
+def load_as_records(payload: str) -> list:
+    """Load questions into compact records."""
+    return [QuestionRecord.from_dict(q) for q in load_as_dicts(payload)]
+
+
+def measure(loader, payload: str) -> int:
+    """Return the bytes still allocated by the structure a loader returns."""
+    gc.collect()
+    tracemalloc.start()
+    questions = loader(payload)
+    gc.collect()
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del questions
+    return retained
+
+
+def text_bytes(payload: str) -> int:
+    """Bytes used by the question text strings alone (identical in both layouts)."""
+    return sum(sys.getsizeof(q["text"]) for q in json.loads(payload)["questions"])
+
+
+def main(count: int = 100_000) -> None:
+    payload = make_serialized_questions(count)
+    texts = text_bytes(payload)
+    as_dicts = measure(load_as_dicts, payload)
+    as_records = measure(load_as_records, payload)
+
+    print(f"Memory for {count:,} questions")
+    print(f"{'layout':<12}{'total MiB':>12}{'bytes/question':>16}{'excl. text':>14}")
+    for name, total in (("dict", as_dicts), ("record", as_records)):
+        print(f"{name:<12}{total / 2**20:>12.1f}{total / count:>16.0f}"
+              f"{(total - texts) / count:>14.0f}")
+    print(f"Savings: {as_dicts / as_records:.1f}x overall, "
+          f"{(as_dicts - texts) / (as_records - texts):.1f}x excluding question text")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
@@ -0,0 +1,378 @@
+"""
+Scaling benchmark for the core MarshmallowManager operations.
+
+Times every manager operation on boards of increasing size, with memory and
+file storage, and writes the results as JSON. Comparing a run against a
+stored baseline flags operations that got slower, so the O(n) paths (e.g.
+file storage rewriting the whole data file on each change) are on record
+and fixes to them can be tracked. Run from the justask directory:
+
+    python benchmarks/scaling.py                         # all sizes, compare to baseline
+    python benchmarks/scaling.py --sizes 1000 10000      # quicker run
+    python benchmarks/scaling.py --save-baseline         # record a new baseline
+
+Timings depend on the machine. Each run also times two fixed calibration
+workloads, one CPU-bound (building, sorting and JSON-encoding records) and
+one disk-bound (writing and syncing a file the way a save does). Before
+comparing, each baseline timing is scaled by how much slower or faster the
+CPU workload ran, or for file-storage saves, loads and mutations (which
+also encode the whole board) by the larger of both factors. So a baseline
+recorded elsewhere still gives a rough check. Each figure is the median
+over --repeats fresh boards, which evens out disk hiccups. Still, disk
+syncs on shared or virtual disks can vary by 50% from one minute to the
+next, which no calibration corrects, so the disk-bound timings, and
+clear_all_questions (one call per board), are held to the looser
+--noisy-threshold. For a gate that fails only for code reasons, record the
+baseline on the machine that runs the check.
+
+Exits with status 1 if any operation regressed.
+"""
+
+import argparse
+import datetime
+import gc
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Add the parent directory to sys.path so we can import the marshmallow_lib module
+sys.path.append(str(Path(__file__).parent.parent))
+
+from marshmallow_lib.core import MarshmallowManager
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000, 1_000_000]
+STORAGE_TYPES = ["memory", "file"]
+BASELINE_PATH = Path(__file__).parent / "baseline.json"
+DEFAULT_OUTPUT = Path(__file__).parent / "results.json"
+
+# Timed calls per operation: enough to get a stable median for cheap
+# operations without spending minutes on ones that touch every question
+CHEAP_REPEAT = 200
+EXPENSIVE_REPEAT = 3
+FILE_MUTATION_CALLS = 10_000  # Spread over the board size: more calls where each is quick
+
+DEFAULT_REPEATS = 3  # Fresh boards per size; each operation's median is reported
+
+DEFAULT_THRESHOLD = 1.5  # Flag an operation this many times slower than the baseline
+DEFAULT_NOISY_THRESHOLD = 2.0  # ...or this many, for the noisy timings (see is_noisy)
+MIN_DELTA_S = 0.0001  # ...and at least this much slower, to ignore timer noise
+
+CALIBRATION_RECORDS = 20_000
+CALIBRATION_REPEAT = 15  # Disk syncs vary a lot from call to call
+
+# File-storage operations whose time goes into writing (or reading) the data file
+DISK_OPERATIONS = {
+    "save_questions", "load_questions", "add_question", "vote_for_question", "unvote_question",
+    "highlight_question", "set_question_status", "delete_question", "clear_all_questions",
+}
+
+
+def populate(manager: MarshmallowManager, count: int, rng: random.Random) -> List[Tuple[int, str]]:
+    """
+    Fill a manager with questions, some voted on and some pending.
+
+    Runs as one batch, so file storage saves the board once, through the
+    normal save path, when it is complete.
+
+    Returns:
+        The (question ID, user ID) of every vote cast, in the order cast
+    """
+    votes = []
+    with manager.batch():
+        for i in range(count):
+            manager.add_question(f"Question number {i}: how does topic {i % 97} work?",
+                                 user_id=manager._generate_user_id())
+        for n in range(count // 2):
+            vote = (rng.randrange(count), f"voter-{n}")
+            manager.vote_for_question(*vote)
+            votes.append(vote)
+        for i in range(0, count, 10):
+            manager.set_question_status(i, "pending")
+    return votes
+
+
+def call_times(func: Callable[[], object], repeat: int) -> List[float]:
+    """Return the durations of several calls, in seconds (garbage collection paused, like timeit)."""
+    timings = []
+    gc.collect()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start)
+    finally:
+        gc.enable()
+    return timings
+
+
+def median_call_time(func: Callable[[], object], repeat: int) -> float:
+    """Return the median duration of several calls, in seconds."""
+    return statistics.median(call_times(func, repeat))
+
+
+def calibrate(tmp: Path) -> Dict[str, float]:
+    """
+    Time fixed workloads, to compare this machine's speed with the baseline's.
+
+    Returns:
+        Duration in seconds of the "cpu" workload (building, sorting and
+        JSON-encoding records; fastest call, as noise only adds time) and
+        the "disk" one (writing, syncing and renaming a small file, like a
+        save; median call, as sync times spread widely)
+    """
+    path = tmp / "calibration.json"
+    payload = json.dumps(list(range(10_000)))
+
+    def cpu():
+        records = [{"id": i, "text": f"Calibration record {i}?", "votes": (i * 7919) % 101}
+                   for i in range(CALIBRATION_RECORDS)]
+        records.sort(key=lambda r: (-r["votes"], r["id"]))
+        return json.loads(json.dumps(records))
+
+    def disk():
+        tmp_path = path.with_name(path.name + ".tmp")
+        with open(tmp_path, "w") as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    cpu()  # Warm up: the first call runs noticeably slower
+    disk()
+    return {"cpu": min(call_times(cpu, CALIBRATION_REPEAT)),
+            "disk": median_call_time(disk, CALIBRATION_REPEAT)}
+
+
+def operations(manager: MarshmallowManager, count: int, rng: random.Random, storage_type: str,
+               votes: List[Tuple[int, str]]) -> List[Tuple[str, Callable[[], object], int]]:
+    """
+    List the operations to time as (name, call, repeat).
+
+    Mutations with file storage rewrite the whole data file, so they get the
+    expensive repeat count on big boards.
+    """
+    if storage_type == "memory":
+        mutation_repeat = CHEAP_REPEAT
+    else:
+        mutation_repeat = max(EXPENSIVE_REPEAT, FILE_MUTATION_CALLS // count)
+    ids = iter(range(count - 1, -1, -2))  # Distinct questions to delete
+    cast_votes = iter(votes)  # Distinct votes to take back
+    _, cursor = manager.get_questions_page("votes", "approved", limit=20)
+    return [
+        ("add_question", lambda: manager.add_question("Benchmark question?"), mutation_repeat),
+        ("vote_for_question", lambda: manager.vote_for_question(rng.randrange(count)), mutation_repeat),
+        ("unvote_question", lambda: manager.unvote_question(*next(cast_votes)), mutation_repeat),
+        ("highlight_question", lambda: manager.highlight_question(rng.randrange(count)), mutation_repeat),
+        ("set_question_status", lambda: manager.set_question_status(rng.randrange(count), "approved"),
+         mutation_repeat),
+        ("delete_question", lambda: manager.delete_question(next(ids)), mutation_repeat),
+        ("get_random_question", lambda: manager.get_random_question(), CHEAP_REPEAT),
+        ("get_question_by_id", lambda: manager.get_question_by_id(rng.randrange(count)), CHEAP_REPEAT),
+        ("count_questions", lambda: manager.count_questions("approved"), CHEAP_REPEAT),
+        ("get_questions_page[votes]",
+         lambda: manager.get_questions_page("votes", "approved", limit=20, cursor=cursor), CHEAP_REPEAT),
+        ("get_questions_page[newest]",
+         lambda: manager.get_questions_page("newest", limit=20), CHEAP_REPEAT),
+        ("find_duplicate",
+         lambda: manager.find_duplicate(f"How does topic {rng.randrange(97)} work, "
+                                        f"question number {rng.randrange(count)}?"),
+         CHEAP_REPEAT),
+        ("search_questions",  # Common words: every question matches
+         lambda: manager.search_questions(f"how does topic {rng.randrange(97)} work", "approved"),
+         EXPENSIVE_REPEAT),
+        ("changes_since", lambda: manager.changes_since(manager.version - 20), CHEAP_REPEAT),
+        ("get_sorted_questions[newest]", lambda: manager.get_sorted_questions("newest", "approved"),
+         EXPENSIVE_REPEAT),
+        ("get_sorted_questions[votes]", lambda: manager.get_sorted_questions("votes", "approved"),
+         EXPENSIVE_REPEAT),
+        ("get_sorted_questions[random]", lambda: manager.get_sorted_questions("random"),
+         EXPENSIVE_REPEAT),
+        ("questions", lambda: manager.questions, EXPENSIVE_REPEAT),
+    ]
+
+
+def bench_size(storage_type: str, count: int, tmp: Path) -> Dict[str, float]:
+    """Time every operation on a board of the given size."""
+    rng = random.Random(count)
+    path = tmp / f"{storage_type}-{count}.json"
+    manager = MarshmallowManager(storage_type=storage_type, storage_path=path)
+    votes = populate(manager, count, rng)
+
+    results = {}
+    if storage_type == "file":
+        results["save_questions"] = median_call_time(manager.save_questions, EXPENSIVE_REPEAT)
+
+        def load():
+            MarshmallowManager(storage_type="file", storage_path=path).count_questions()
+        results["load_questions"] = median_call_time(load, EXPENSIVE_REPEAT)
+
+    for name, func, repeat in operations(manager, count, rng, storage_type, votes):
+        results[name] = median_call_time(func, repeat)
+
+    results["clear_all_questions"] = median_call_time(manager.clear_all_questions, 1)
+    return results
+
+
+def run(sizes: List[int], storage_types: List[str], repeats: int = DEFAULT_REPEATS) -> Dict:
+    """
+    Run the benchmark and return its results document.
+
+    Args:
+        sizes: Board sizes to benchmark
+        storage_types: Storage types to benchmark
+        repeats: Fresh boards per size; each operation's median over them is kept
+    """
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        # Before any board is built: a process holding big boards runs the workload slower
+        calibration = calibrate(Path(tmp))
+        for storage_type in storage_types:
+            for count in sizes:
+                started = time.perf_counter()
+                runs = [bench_size(storage_type, count, Path(tmp)) for _ in range(repeats)]
+                print(f"{storage_type:>6} {count:>9,}: done in {time.perf_counter() - started:.1f}s",
+                      file=sys.stderr)
+                for operation in runs[0]:
+                    results.append({"storage": storage_type, "size": count, "operation": operation,
+                                    "seconds": statistics.median(r[operation] for r in runs)})
+    return {
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "calibration": calibration,
+        "repeats": repeats,
+        "results": results,
+    }
+
+
+def is_disk_bound(result: Dict) -> bool:
+    """Return whether a timing is of an operation that writes (or reads) the data file."""
+    return result["storage"] == "file" and result["operation"] in DISK_OPERATIONS
+
+
+def is_noisy(result: Dict) -> bool:
+    """Return whether a timing varies too much from run to run for the normal threshold."""
+    return is_disk_bound(result) or result["operation"] == "clear_all_questions"
+
+
+def machine_scale(current: Dict, baseline: Dict, kind: str) -> float:
+    """
+    How much slower this machine is than the baseline's, from a calibration workload.
+
+    Args:
+        current: Results document of this run
+        baseline: Results document of the baseline run
+        kind: "cpu" or "disk"
+
+    Returns:
+        Ratio of the calibration timings (1.0 if either document lacks them)
+    """
+    before = baseline.get("calibration", {}).get(kind)
+    after = current.get("calibration", {}).get(kind)
+    if not before or not after:
+        return 1.0
+    return after / before
+
+
+def compare(current: Dict, baseline: Dict, threshold: float,
+            noisy_threshold: float = DEFAULT_NOISY_THRESHOLD) -> List[Dict]:
+    """
+    Find operations that got slower than the baseline.
+
+    Args:
+        current: Results document of this run
+        baseline: Results document of the baseline run
+        threshold: Slowdown ratio, after scaling the baseline to this
+            machine (see machine_scale), that counts as a regression
+        noisy_threshold: The same for the noisy timings (see is_noisy)
+
+    Returns:
+        One dict per regressed (storage, size, operation), with both timings
+        and the scaled slowdown ratio
+    """
+    def key(result: Dict) -> Tuple:
+        return result["storage"], result["size"], result["operation"]
+
+    cpu_scale = machine_scale(current, baseline, "cpu")
+    disk_scale = max(cpu_scale, machine_scale(current, baseline, "disk"))
+    baseline_times = {key(r): r["seconds"] for r in baseline["results"]}
+    regressions = []
+    for result in current["results"]:
+        before = baseline_times.get(key(result))
+        if before is None:
+            continue
+        expected = before * (disk_scale if is_disk_bound(result) else cpu_scale)
+        limit = noisy_threshold if is_noisy(result) else threshold
+        after = result["seconds"]
+        if after > expected * limit and after - expected > MIN_DELTA_S:
+            regressions.append({**result, "baseline_seconds": before, "ratio": after / expected})
+    return regressions
+
+
+def print_table(document: Dict, baseline: Optional[Dict]) -> None:
+    """Print the results as a table of milliseconds per call."""
+    baseline_times = {}
+    if baseline:
+        baseline_times = {(r["storage"], r["size"], r["operation"]): r["seconds"]
+                          for r in baseline["results"]}
+    print(f"{'storage':<8}{'questions':>10}  {'operation':<30}{'ms/call':>12}{'baseline':>12}")
+    for r in document["results"]:
+        before = baseline_times.get((r["storage"], r["size"], r["operation"]))
+        before_text = f"{before * 1000:>12.4f}" if before is not None else f"{'-':>12}"
+        print(f"{r['storage']:<8}{r['size']:>10,}  {r['operation']:<30}{r['seconds'] * 1000:>12.4f}"
+              f"{before_text}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES,
+                        help="Board sizes to benchmark")
+    parser.add_argument("--storage", nargs="+", choices=STORAGE_TYPES, default=STORAGE_TYPES,
+                        help="Storage types to benchmark")
+    parser.add_argument("--output", type=Path, default=DEFAULT_OUTPUT,
+                        help="Where to write this run's results (JSON)")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH,
+                        help="Baseline results to compare against")
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="Store this run as the new baseline instead of comparing")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Slowdown ratio (after calibration scaling) reported as a regression")
+    parser.add_argument("--noisy-threshold", type=float, default=DEFAULT_NOISY_THRESHOLD,
+                        help="The same for file-storage saves, loads and mutations, and clearing")
+    parser.add_argument("--repeats", type=int, default=DEFAULT_REPEATS,
+                        help="Fresh boards per size; each operation's median over them is reported")
+    args = parser.parse_args(argv)
+
+    document = run(args.sizes, args.storage, args.repeats)
+    output = args.baseline if args.save_baseline else args.output
+    output.write_text(json.dumps(document, indent=1) + "\n")
+
+    baseline = None
+    if not args.save_baseline and args.baseline.exists():
+        baseline = json.loads(args.baseline.read_text())
+    print_table(document, baseline)
+    print(f"\nResults written to {output}")
+
+    if baseline is None:
+        return 0
+    for kind, seconds in document["calibration"].items():
+        print(f"Calibration ({kind}): {seconds * 1000:.1f} ms, "
+              f"{machine_scale(document, baseline, kind):.2f}x the baseline's")
+    regressions = compare(document, baseline, args.threshold, args.noisy_threshold)
+    for r in regressions:
+        print(f"REGRESSION: {r['storage']} {r['size']:,} {r['operation']}: "
+              f"{r['baseline_seconds'] * 1000:.4f} ms -> {r['seconds'] * 1000:.4f} ms "
+              f"({r['ratio']:.1f}x after scaling)")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,275 @@
+"""
+Concurrent-session load test for the Streamlit app.
+
+Simulates a class of students using one Streamlit server, without a browser
+or network: each simulated session is an in-process ``AppTest`` running
+``run_streamlit_app``, and all of them share the server's cached manager just
+like real browser sessions do. Every session repeatedly submits questions,
+votes and picks random questions at a configurable rate and mix. Run from the
+justask directory:
+
+    python benchmarks/session_load.py --sessions 200 --duration 60
+    python benchmarks/session_load.py --sessions 50 --rate 2 --mix submit=1 vote=5 random=2
+
+AppTest instances running at the same time in one process break each other
+(they share Streamlit's runtime singleton), and separate processes wouldn't
+share the cached manager. So the sessions' reruns are interleaved on one
+thread: each session plans its next action an exponential think time after
+the previous plan, and the earliest planned action runs next. The latencies
+are therefore those of the app alone, and the throughput is what one
+script-runner thread sustains. When the offered load (sessions x rate) is
+more than that, actions start late; the schedule lag shows by how much.
+
+Reports throughput, per-rerun latency percentiles per action, schedule lag,
+errors by exception type and how much memory each session adds. Exits with
+status 1 if more than --max-error-rate of the actions fail.
+"""
+
+import argparse
+import heapq
+import random
+import sys
+import time
+import tracemalloc
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Optional
+
+# Add the parent directory to sys.path so we can import the marshmallow_lib module
+sys.path.append(str(Path(__file__).parent.parent))
+
+from streamlit.testing.v1 import AppTest
+
+from marshmallow_lib.metrics import LatencyHistogram, PERCENTILES
+from marshmallow_lib.streamlit_gui import get_shared_manager
+
+ACTIONS = ("submit", "vote", "random")
+DEFAULT_MIX = {"submit": 1, "vote": 3, "random": 2}
+SCRIPT_TIMEOUT_S = 30  # Per rerun, so slow reruns on big boards still finish
+DEFAULT_MAX_ERROR_RATE = 0.01
+
+
+def app_script(storage_type: str) -> None:
+    """The script each simulated session runs (AppTest runs this function's body)."""
+    from marshmallow_lib.streamlit_gui import run_streamlit_app
+    run_streamlit_app(storage_type=storage_type)
+
+
+def new_session(storage_type: str) -> AppTest:
+    """Create a simulated browser session and run its first page load."""
+    at = AppTest.from_function(app_script, args=(storage_type,), default_timeout=SCRIPT_TIMEOUT_S)
+    at.run()
+    return at
+
+
+def find_button(at: AppTest, label: Optional[str] = None, key_prefix: Optional[str] = None):
+    """Return the first button with this label or key prefix, or None."""
+    for button in at.button:
+        if label is not None and button.label == label:
+            return button
+        if key_prefix is not None and button.key and button.key.startswith(key_prefix):
+            return button
+    return None
+
+
+class ScriptError(Exception):
+    """An exception raised by the app script, which AppTest records instead of raising."""
+
+    def __init__(self, type_name: str, message: str):
+        super().__init__(message)
+        self.type_name = type_name
+
+
+def perform(at: AppTest, action: str, rng: random.Random) -> bool:
+    """
+    Carry out one user action, including the rerun it triggers.
+
+    Args:
+        at: The session
+        action: "submit", "vote" or "random"
+        rng: Random number generator of the session
+
+    Returns:
+        bool: True if the action was possible (e.g. there was something to vote on)
+
+    Raises:
+        ScriptError: If the rerun raised an exception in the app
+    """
+    done = True
+    if action == "submit":
+        at.text_area[0].input(f"Load test question {rng.randrange(10 ** 9)}?")
+        find_button(at, label="Submit Marshmallow").click().run()
+    elif action == "random":
+        find_button(at, label="Pick a Random Marshmallow").click().run()
+    else:
+        button = find_button(at, key_prefix="vote_")
+        if button is None:
+            at.run()  # Nothing to vote on yet: just refresh
+            done = False
+        else:
+            button.click().run()
+    if at.exception:
+        raise ScriptError(at.exception[0].proto.type or "Exception", at.exception[0].message)
+    return done
+
+
+class SessionStats:
+    """Latencies, schedule lag and errors collected by the simulated sessions."""
+
+    def __init__(self):
+        self.latency = {action: LatencyHistogram() for action in ACTIONS}
+        self.lag = LatencyHistogram()  # How late actions started, in ms
+        self.errors: Counter = Counter()  # Exception type name -> count
+        self.error_examples: Dict[str, str] = {}  # Exception type name -> first message
+
+    def record(self, action: str, seconds: float) -> None:
+        self.latency[action].add(seconds * 1000)
+
+    def record_error(self, error: Exception) -> None:
+        type_name = getattr(error, "type_name", type(error).__name__)
+        self.errors[type_name] += 1
+        message = str(error).strip().splitlines()
+        self.error_examples.setdefault(type_name, message[0][:200] if message else "")
+
+    @property
+    def reruns(self) -> int:
+        return sum(histogram.count for histogram in self.latency.values())
+
+    @property
+    def error_count(self) -> int:
+        return sum(self.errors.values())
+
+
+def run_load(sessions: List[AppTest], stats: SessionStats, duration: float, rate: float,
+             mix: Dict[str, float]) -> float:
+    """
+    Drive every session until the deadline, one rerun at a time.
+
+    Each session plans its actions an exponential think time apart (back to
+    back with rate 0), and the session whose action is due first runs next.
+
+    Returns:
+        Seconds the load ran for
+    """
+    actions, weights = list(mix), list(mix.values())
+    rngs = [random.Random(seed) for seed in range(len(sessions))]
+
+    def think(index: int) -> float:
+        return rngs[index].expovariate(rate) if rate > 0 else 0
+
+    started = time.monotonic()
+    deadline = started + duration
+    due = [(started + think(i), i) for i in range(len(sessions))]
+    heapq.heapify(due)
+    while True:
+        planned, index = heapq.heappop(due)
+        if planned >= deadline:
+            time.sleep(max(0.0, deadline - time.monotonic()))
+            return time.monotonic() - started
+        time.sleep(max(0.0, planned - time.monotonic()))
+        if time.monotonic() >= deadline:
+            return time.monotonic() - started
+        rng = rngs[index]
+        action = rng.choices(actions, weights)[0]
+        start = time.perf_counter()
+        stats.lag.add(max(0.0, time.monotonic() - planned) * 1000)
+        try:
+            perform(sessions[index], action, rng)
+        except Exception as e:
+            stats.record_error(e)
+        else:
+            stats.record(action, time.perf_counter() - start)
+        # Without a rate, plan from now so every session gets its turn
+        heapq.heappush(due, ((planned if rate > 0 else time.monotonic()) + think(index), index))
+
+
+def measure_session_memory(storage_type: str, count: int) -> float:
+    """
+    Measure the memory each new session adds, in bytes.
+
+    Done in its own phase because tracing allocations slows everything down.
+    """
+    new_session(storage_type)  # Warm up imports and the shared manager
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    sessions = [new_session(storage_type) for _ in range(count)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del sessions
+    return (after - before) / count
+
+
+def parse_mix(pairs: List[str]) -> Dict[str, float]:
+    """Parse "action=weight" pairs."""
+    mix = {}
+    for pair in pairs:
+        action, _, weight = pair.partition("=")
+        if action not in ACTIONS:
+            raise argparse.ArgumentTypeError(f"Unknown action {action!r} (choose from {ACTIONS})")
+        mix[action] = float(weight or 1)
+    return mix
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sessions", type=int, default=50, help="Number of concurrent sessions")
+    parser.add_argument("--duration", type=float, default=30, help="Seconds of load to generate")
+    parser.add_argument("--rate", type=float, default=0.5,
+                        help="Actions per second per session (0: as fast as possible)")
+    parser.add_argument("--mix", nargs="+", default=None,
+                        help="Action weights, e.g. submit=1 vote=3 random=2")
+    parser.add_argument("--seed-questions", type=int, default=100,
+                        help="Questions on the board before the load starts")
+    parser.add_argument("--storage", default="memory", help="Storage type of the shared manager")
+    parser.add_argument("--memory-sample", type=int, default=10,
+                        help="Sessions to trace when measuring memory per session")
+    parser.add_argument("--max-error-rate", type=float, default=DEFAULT_MAX_ERROR_RATE,
+                        help="Fail (exit status 1) if more than this fraction of actions fail")
+    args = parser.parse_args(argv)
+    mix = parse_mix(args.mix) if args.mix else DEFAULT_MIX
+
+    # Seed the board through the same cached manager the sessions will share
+    # (called with the same arguments as SessionState.initialize_manager)
+    manager = get_shared_manager(args.storage, None)
+    rate_limiter, manager.rate_limiter = manager.rate_limiter, None  # Seeding isn't a user
+    for i in range(args.seed_questions):
+        manager.add_question(f"Seed question {i}?")
+    manager.rate_limiter = rate_limiter
+
+    bytes_per_session = measure_session_memory(args.storage, args.memory_sample)
+
+    print(f"Starting {args.sessions} sessions...", file=sys.stderr)
+    sessions = [new_session(args.storage) for _ in range(args.sessions)]
+
+    stats = SessionStats()
+    elapsed = run_load(sessions, stats, args.duration, args.rate, mix)
+
+    attempts = stats.reruns + stats.error_count
+    error_rate = stats.error_count / attempts if attempts else 0.0
+    offered = f"{args.sessions * args.rate:.1f} actions/s" if args.rate > 0 else "unlimited"
+    print(f"Sessions: {args.sessions}   duration: {elapsed:.1f}s   "
+          f"board: {manager.count_questions()} questions")
+    print(f"Offered load: {offered}   throughput: {stats.reruns / elapsed:.1f} reruns/s")
+    print(f"Schedule lag: p50 {stats.lag.percentile(50):.0f} ms   "
+          f"p99 {stats.lag.percentile(99):.0f} ms")
+    print(f"Errors: {stats.error_count} of {attempts} actions ({error_rate:.1%})")
+    for type_name, count in stats.errors.most_common():
+        print(f"  {type_name}: {count}   e.g. {stats.error_examples[type_name]}")
+    print(f"Memory per session: {bytes_per_session / 1024:.0f} KiB")
+    print()
+    print(f"{'action':<8}{'reruns':>8}" + "".join(f"{f'p{p} ms':>10}" for p in PERCENTILES)
+          + f"{'max ms':>10}")
+    for action, histogram in stats.latency.items():
+        if histogram.count:
+            print(f"{action:<8}{histogram.count:>8}"
+                  + "".join(f"{histogram.percentile(p):>10.1f}" for p in PERCENTILES)
+                  + f"{histogram.max_ms:>10.1f}")
+
+    if error_rate > args.max_error_rate:
+        print(f"FAIL: error rate {error_rate:.1%} is above {args.max_error_rate:.1%}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,72 @@
+"""
+Benchmark of the data file formats used by file storage.
+
+Compares save time, load time and file size of the JSON format against the
+binary format (with and without compression). Run from the justask directory:
+
+    python benchmarks/storage_formats.py [N ...]
+"""
+
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add the parent directory to sys.path so we can import the marshmallow_lib module
+sys.path.append(str(Path(__file__).parent.parent))
+
+from marshmallow_lib.core import MarshmallowManager
+
+FORMATS = [
+    ("json", {"file_format": "json"}),
+    ("binary", {"file_format": "binary", "compress": False}),
+    ("binary+zlib", {"file_format": "binary", "compress": True}),
+]
+
+
+def build_manager(count: int, path: Path, options: dict) -> MarshmallowManager:
+    """Create a file-storage manager holding the given number of questions."""
+    manager = MarshmallowManager(storage_type="file", storage_path=path, **options)
+    manager.storage_type = "memory"  # Don't rewrite the file on every add
+    for i in range(count):
+        manager.add_question(f"Question number {i}: how does topic {i % 97} work?",
+                             user_id=manager._generate_user_id())
+        if i % 3 == 0:
+            manager.vote_for_question(i)
+    manager.storage_type = "file"
+    return manager
+
+
+def best_of(runs: int, func) -> float:
+    """Return the fastest of several timed runs, in seconds."""
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def load(path: Path) -> None:
+    """Load a data file completely, including every timestamp."""
+    manager = MarshmallowManager(storage_type="file", storage_path=path)
+    for q in manager.questions:
+        q["timestamp"]
+
+
+def main(counts) -> None:
+    print(f"{'questions':>10}  {'format':<12}{'save ms':>10}{'load ms':>10}{'size KiB':>11}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for count in counts:
+            for name, options in FORMATS:
+                path = Path(tmp) / f"{name}-{count}.dat"
+                manager = build_manager(count, path, options)
+                save = best_of(3, manager.save_questions)
+                load_time = best_of(3, lambda: load(path))
+                size = path.stat().st_size
+                print(f"{count:>10,}  {name:<12}{save * 1000:>10.1f}{load_time * 1000:>10.1f}"
+                      f"{size / 1024:>11.0f}")
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [10_000, 100_000])
@@ -0,0 +1,246 @@
+"""
+Asyncio interface for the Marshmallows anonymous questions app.
+
+AsyncMarshmallowManager wraps a MarshmallowManager for use from an event
+loop. Every call runs on a worker thread, so file writes, journal appends
+and SQLite queries never block the loop.
+
+Mutations are queued and applied in order by a single drain task. All the
+mutations that arrive while one batch is being applied form the next batch.
+Each batch runs under MarshmallowManager.batch(), so with file storage a
+burst of concurrent votes costs one rewrite of the data file rather than
+one per vote (group commit). An awaited mutation returns only after its
+batch has been saved, so callers see the same results and durability as
+with the sync class.
+"""
+
+import asyncio
+import functools
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .core import MarshmallowManager, UserSession
+
+
+DEFAULT_MAX_BATCH = 256  # Most mutations applied (and saved) together
+DEFAULT_WORKERS = 4
+
+
+class AsyncMarshmallowManager:
+    """
+    Awaitable counterpart of MarshmallowManager.
+
+    Methods take the same arguments and return the same results as the sync
+    methods of the same name. A mutation whose awaiting task is cancelled
+    may still be applied, as with a thread that was abandoned.
+    """
+
+    def __init__(self, manager: MarshmallowManager, executor: Optional[Executor] = None,
+                 max_batch: int = DEFAULT_MAX_BATCH):
+        """
+        Initialize the wrapper.
+
+        Args:
+            manager: The sync manager to run calls on
+            executor: Where to run blocking calls (a private thread pool if None)
+            max_batch: Most mutations to apply in one batch
+        """
+        self.manager = manager
+        self.max_batch = max_batch
+        self._own_executor = executor is None
+        self._executor = executor or ThreadPoolExecutor(DEFAULT_WORKERS,
+                                                        thread_name_prefix="marshmallow")
+        self._pending: List[Tuple[Callable, asyncio.Future]] = []
+        self._drainer: Optional[asyncio.Task] = None
+
+    @classmethod
+    async def open(cls, *args: Any, executor: Optional[Executor] = None,
+                   max_batch: int = DEFAULT_MAX_BATCH, **kwargs: Any) -> "AsyncMarshmallowManager":
+        """
+        Create a manager without blocking the loop on opening its storage.
+
+        Args:
+            *args: Positional arguments for MarshmallowManager
+            executor: Where to run blocking calls (a private thread pool if None)
+            max_batch: Most mutations to apply in one batch
+            **kwargs: Keyword arguments for MarshmallowManager
+
+        Returns:
+            AsyncMarshmallowManager: The wrapper around the new manager
+        """
+        own_executor = executor is None
+        executor = executor or ThreadPoolExecutor(DEFAULT_WORKERS, thread_name_prefix="marshmallow")
+        loop = asyncio.get_running_loop()
+        manager = await loop.run_in_executor(executor, functools.partial(MarshmallowManager, *args, **kwargs))
+        wrapper = cls(manager, executor, max_batch)
+        wrapper._own_executor = own_executor
+        return wrapper
+
+    async def __aenter__(self) -> "AsyncMarshmallowManager":
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.close()
+
+    async def _run(self, method: Callable, *args: Any, **kwargs: Any) -> Any:
+        """Run a blocking call on the executor."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(method, *args, **kwargs))
+
+    async def _mutate(self, method: Callable, *args: Any, **kwargs: Any) -> Any:
+        """Queue a mutation for the next batch and wait for its result."""
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((functools.partial(method, *args, **kwargs), future))
+        if self._drainer is None or self._drainer.done():
+            self._drainer = asyncio.ensure_future(self._drain())
+        return await future
+
+    async def _drain(self) -> None:
+        """Apply queued mutations batch by batch until the queue is empty."""
+        while self._pending:
+            batch = self._pending[:self.max_batch]
+            del self._pending[:self.max_batch]
+            try:
+                outcomes = await self._run(self._apply_batch, [call for call, _ in batch])
+            except Exception as e:
+                # Saving the batch failed: every call in it reports the error
+                outcomes = [(False, e)] * len(batch)
+            for (_, future), (ok, value) in zip(batch, outcomes):
+                if future.done():
+                    continue  # Cancelled by its caller
+                if ok:
+                    future.set_result(value)
+                else:
+                    future.set_exception(value)
+
+    def _apply_batch(self, calls: List[Callable]) -> List[Tuple[bool, Any]]:
+        """
+        Apply mutations with one save (runs on a worker thread).
+
+        Args:
+            calls: The mutations, in call order
+
+        Returns:
+            One (succeeded, result or exception) per call
+        """
+        outcomes = []
+        with self.manager.batch():
+            for call in calls:
+                try:
+                    outcomes.append((True, call()))
+                except Exception as e:
+                    outcomes.append((False, e))
+        return outcomes
+
+    def create_session(self, user_id: Optional[str] = None) -> UserSession:
+        """Create a user session (see MarshmallowManager.create_session; no I/O)."""
+        return self.manager.create_session(user_id)
+
+    # Mutations: queued and saved in batches
+
+    async def add_question(self, question_text: str, user_id: Optional[str] = None,
+                           on_duplicate: Optional[str] = None,
+                           on_merge: Optional[Callable[[Dict], None]] = None) -> bool:
+        """Add a new question (see MarshmallowManager.add_question; on_merge runs on a worker thread)."""
+        return await self._mutate(self.manager.add_question, question_text, user_id, on_duplicate,
+                                  on_merge)
+
+    async def vote_for_question(self, question_id: int, user_id: Optional[str] = None) -> bool:
+        """Vote for a question (see MarshmallowManager.vote_for_question)."""
+        return await self._mutate(self.manager.vote_for_question, question_id, user_id)
+
+    async def unvote_question(self, question_id: int, user_id: str) -> bool:
+        """Take back a vote (see MarshmallowManager.unvote_question)."""
+        return await self._mutate(self.manager.unvote_question, question_id, user_id)
+
+    async def highlight_question(self, question_id: int, highlighted: bool = True,
+                                 expected_version: Optional[int] = None) -> bool:
+        """Highlight a question (see MarshmallowManager.highlight_question)."""
+        return await self._mutate(self.manager.highlight_question, question_id, highlighted,
+                                  expected_version)
+
+    async def set_question_status(self, question_id: int, status: str,
+                                  expected_version: Optional[int] = None) -> bool:
+        """Set a question's status (see MarshmallowManager.set_question_status)."""
+        return await self._mutate(self.manager.set_question_status, question_id, status,
+                                  expected_version)
+
+    async def delete_question(self, question_id: int,
+                              expected_version: Optional[int] = None) -> bool:
+        """Delete a question (see MarshmallowManager.delete_question)."""
+        return await self._mutate(self.manager.delete_question, question_id, expected_version)
+
+    async def clear_all_questions(self) -> None:
+        """Delete every question (see MarshmallowManager.clear_all_questions)."""
+        return await self._mutate(self.manager.clear_all_questions)
+
+    # Queries: run on the executor right away
+
+    async def get_question_by_id(self, question_id: int) -> Optional[Dict]:
+        """Get a question (see MarshmallowManager.get_question_by_id)."""
+        return await self._run(self.manager.get_question_by_id, question_id)
+
+    async def get_random_question(self, session: Optional[UserSession] = None) -> Optional[Dict]:
+        """Pick a random question (see MarshmallowManager.get_random_question)."""
+        return await self._run(self.manager.get_random_question, session)
+
+    async def get_questions_page(self, sort_by: str = "newest", status: Optional[str] = None,
+                                 limit: int = 20, cursor: Optional[str] = None
+                                 ) -> Tuple[List[Dict], Optional[str]]:
+        """Get one page of questions (see MarshmallowManager.get_questions_page)."""
+        return await self._run(self.manager.get_questions_page, sort_by, status, limit, cursor)
+
+    async def get_sorted_questions(self, sort_by: str = "newest",
+                                   status: Optional[str] = None) -> List[Dict]:
+        """Get all questions sorted (see MarshmallowManager.get_sorted_questions)."""
+        return await self._run(self.manager.get_sorted_questions, sort_by, status)
+
+    async def search_questions(self, query: str, status: Optional[str] = None,
+                               limit: int = 20) -> List[Dict]:
+        """Search the questions (see MarshmallowManager.search_questions)."""
+        return await self._run(self.manager.search_questions, query, status, limit)
+
+    async def find_duplicate(self, question_text: str, status: Optional[str] = None) -> Optional[Dict]:
+        """Find a near-duplicate question (see MarshmallowManager.find_duplicate)."""
+        return await self._run(self.manager.find_duplicate, question_text, status)
+
+    async def has_voted(self, question_id: int, user_id: str) -> bool:
+        """Check for a user's vote (see MarshmallowManager.has_voted)."""
+        return await self._run(self.manager.has_voted, question_id, user_id)
+
+    async def count_questions(self, status: Optional[str] = None) -> int:
+        """Count questions (see MarshmallowManager.count_questions)."""
+        return await self._run(self.manager.count_questions, status)
+
+    async def changes_since(self, version: int) -> Dict[str, Any]:
+        """Get the questions changed after a version (see MarshmallowManager.changes_since)."""
+        return await self._run(self.manager.changes_since, version)
+
+    # Persistence
+
+    async def save_questions(self) -> None:
+        """Write questions to storage (see MarshmallowManager.save_questions)."""
+        await self._wait_for_pending()
+        await self._run(self.manager.save_questions)
+
+    async def load_questions(self) -> None:
+        """Reload questions from storage (see MarshmallowManager.load_questions)."""
+        await self._wait_for_pending()
+        await self._run(self.manager.load_questions)
+
+    async def flush(self) -> None:
+        """Write buffered changes now (see MarshmallowManager.flush)."""
+        await self._wait_for_pending()
+        await self._run(self.manager.flush)
+
+    async def close(self) -> None:
+        """Apply queued mutations, close the manager and release the thread pool."""
+        await self._wait_for_pending()
+        await self._run(self.manager.close)
+        if self._own_executor:
+            self._executor.shutdown(wait=False)
+
+    async def _wait_for_pending(self) -> None:
+        """Wait until every mutation queued so far has been applied."""
+        while self._drainer is not None and not self._drainer.done():
+            await asyncio.shield(self._drainer)
@@ -11,19 +11,29 @@ import time
 from typing import List, Dict, Optional
 import datetime
 from .core import MarshmallowManager
+from .metrics import InMemorySink, JSONLinesSink, Metrics, summary_table
+from .ratelimit import RateLimiter, RateLimitExceeded
 
 
 class ConsoleGUI:
     """Console-based interface for the Marshmallows application."""
     
-    def __init__(self, storage_type: str = "file"):
+    PAGE_SIZE = 10  # Questions shown per page in "See All"
+    
+    def __init__(self, storage_type: str = "file", metrics_log: Optional[str] = None):
         """
         Initialize the console GUI.
         
         Args:
             storage_type: Type of storage to use (defaults to "file" for persistence)
+            metrics_log: Optional JSON-lines file to append operation metrics to
         """
-        self.manager = MarshmallowManager(storage_type=storage_type)
+        sinks = [InMemorySink()]
+        if metrics_log:
+            sinks.append(JSONLinesSink(metrics_log))
+        # Shared, so the console app can run next to the web app on one data file
+        self.manager = MarshmallowManager(storage_type=storage_type, metrics=Metrics(sinks),
+                                          rate_limiter=RateLimiter(), shared=True)
         self.admin_mode = False
         self.admin_password = "instructor"
         self.running = True
@@ -129,16 +139,50 @@ class ConsoleGUI:
         
         question_text = input("> ")
         
-        if self.manager.add_question(question_text):
-            print()
-            print(f"{self.colors['green']}Your marshmallow has been tossed into the pile!{self.colors['reset']}")
-        else:
+        try:
+            # Rewordings of a question already on the board count as a vote for
+            # it; checked and applied in one call, so nothing can change in between
+            merged = []
+            added = self.manager.add_question(question_text, on_duplicate="merge",
+                                              on_merge=merged.append)
+            if merged:
+                print()
+                print(f"{self.colors['yellow']}A very similar marshmallow is already in the pile, "
+                      f"so your vote went to it:{self.colors['reset']}")
+                print(f"  \"{merged[0]['text']}\"")
+            elif added:
+                print()
+                print(f"{self.colors['green']}Your marshmallow has been tossed into the pile!{self.colors['reset']}")
+            else:
+                print()
+                print(f"{self.colors['red']}Please enter a question before submitting.{self.colors['reset']}")
+        except RateLimitExceeded as e:
             print()
-            print(f"{self.colors['red']}Please enter a question before submitting.{self.colors['reset']}")
+            print(f"{self.colors['yellow']}{e}{self.colors['reset']}")
             
         print()
         input("Press Enter to continue...")
     
+    def toggle_vote(self, question):
+        """
+        Vote for a question, or take the vote back if already voted.
+        
+        Args:
+            question: Question dictionary
+        """
+        # Display names can collide (e.g. two consoles sharing a data file);
+        # the session ID is unique
+        user_id = self.manager.session_id
+        try:
+            if self.manager.has_voted(question['id'], user_id):
+                self.manager.unvote_question(question['id'], user_id)
+                print(f"{self.colors['yellow']}Vote removed.{self.colors['reset']}")
+            else:
+                self.manager.vote_for_question(question['id'], user_id)
+                print(f"{self.colors['green']}Vote recorded!{self.colors['reset']}")
+        except RateLimitExceeded as e:
+            print(f"{self.colors['yellow']}{e}{self.colors['reset']}")
+    
     def pick_random_marshmallow(self):
         """Handle picking a random question."""
         self.print_header()
@@ -149,12 +193,11 @@ class ConsoleGUI:
         if random_question:
             self.print_question(random_question)
             
-            print(f"Options: {self.colors['green']}V{self.colors['reset']}ote, {self.colors['blue']}B{self.colors['reset']}ack")
+            print(f"Options: {self.colors['green']}V{self.colors['reset']}ote/unvote, {self.colors['blue']}B{self.colors['reset']}ack")
             choice = self.get_input("Enter choice (V/B)").lower()
             
             if choice == 'v':
-                self.manager.vote_for_question(random_question['id'])
-                print(f"{self.colors['green']}Vote recorded!{self.colors['reset']}")
+                self.toggle_vote(random_question)
                 time.sleep(1)
         else:
             print(f"{self.colors['yellow']}No marshmallows available. Be the first to add one!{self.colors['reset']}")
@@ -172,6 +215,7 @@ class ConsoleGUI:
             print("1. Newest First")
             print("2. Most Voted")
             print("3. Random Order")
+            print("4. Search")
             print("0. Back to Main Menu")
             
             sort_choice = self.get_input("Enter choice")
@@ -186,45 +230,80 @@ class ConsoleGUI:
                 sort_method = "votes"
             elif sort_choice == '3':
                 sort_method = "random"
+            elif sort_choice == '4':
+                sort_method = "search"
+                query = self.get_input("Search for")
+                if not query:
+                    continue
             
-            # Display questions
-            self.print_header()
-            print(f"{self.colors['blue']}=== ALL MARSHMALLOWS (Sorted by: {sort_method}) ==={self.colors['reset']}")
-            
-            # Get questions with appropriate sorting
-            sorted_questions = self.manager.get_sorted_questions(sort_method)
-            
-            if sorted_questions:
+            # Questions are shown a page at a time (pending ones only to
+            # admins); random order is a single shuffled list
+            status = None if self.admin_mode else "approved"
+            cursor = None
+            while True:
+                self.print_header()
+                if sort_method == "search":
+                    print(f"{self.colors['blue']}=== SEARCH RESULTS FOR: {query} ==={self.colors['reset']}")
+                else:
+                    print(f"{self.colors['blue']}=== ALL MARSHMALLOWS (Sorted by: {sort_method}) ==={self.colors['reset']}")
+                
+                if sort_method == "search":
+                    # Best matches only; refine the query to see others
+                    sorted_questions = self.manager.search_questions(query, status, limit=self.PAGE_SIZE)
+                    next_cursor = None
+                elif sort_method == "random":
+                    sorted_questions = self.manager.get_sorted_questions(sort_method, status=status)
+                    next_cursor = None
+                else:
+                    sorted_questions, next_cursor = self.manager.get_questions_page(
+                        sort_method, status, limit=self.PAGE_SIZE, cursor=cursor
+                    )
+                
+                if not sorted_questions:
+                    if cursor is not None:
+                        # Everything past the cursor was deleted: start over
+                        cursor = None
+                        continue
+                    if sort_method == "search":
+                        print(f"{self.colors['yellow']}No marshmallows match your search.{self.colors['reset']}")
+                        print()
+                        input("Press Enter to continue...")
+                        break
+                    print(f"{self.colors['yellow']}No marshmallows have been added yet. Be the first!{self.colors['reset']}")
+                    print()
+                    input("Press Enter to continue...")
+                    return
+                
                 # Display the questions
                 for i, q in enumerate(sorted_questions):
-                    if q["status"] == "pending" and not self.admin_mode:
-                        continue  # Skip pending questions for non-admins
-                    
                     print(f"{self.colors['bold']}#{i+1}{self.colors['reset']}")
                     self.print_question(q, self.admin_mode)
                 
                 # Options for interacting with questions
                 print("Options:")
-                print(f"{self.colors['green']}V{self.colors['reset']}: Vote for a question")
+                print(f"{self.colors['green']}V{self.colors['reset']}: Vote for (or unvote) a question")
                 
                 if self.admin_mode:
                     print(f"{self.colors['yellow']}H{self.colors['reset']}: Hide/Show a question")
                     print(f"{self.colors['blue']}S{self.colors['reset']}: Highlight/Unhighlight a question")
                     print(f"{self.colors['red']}D{self.colors['reset']}: Delete a question")
                 
+                if next_cursor is not None:
+                    print(f"{self.colors['cyan']}N{self.colors['reset']}: Next page")
                 print(f"{self.colors['reset']}B{self.colors['reset']}: Back to sort options")
                 
                 choice = self.get_input("Enter choice").lower()
                 
                 if choice == 'b':
-                    continue
+                    break
+                elif choice == 'n' and next_cursor is not None:
+                    cursor = next_cursor
                 elif choice == 'v':
-                    q_num = self.get_input("Enter question number to vote for")
+                    q_num = self.get_input("Enter question number to vote for (or unvote)")
                     try:
                         q_index = int(q_num) - 1
                         if 0 <= q_index < len(sorted_questions):
-                            self.manager.vote_for_question(sorted_questions[q_index]['id'])
-                            print(f"{self.colors['green']}Vote recorded!{self.colors['reset']}")
+                            self.toggle_vote(sorted_questions[q_index])
                         else:
                             print(f"{self.colors['red']}Invalid question number.{self.colors['reset']}")
                     except ValueError:
@@ -272,11 +351,6 @@ class ConsoleGUI:
                     except ValueError:
                         print(f"{self.colors['red']}Please enter a valid number.{self.colors['reset']}")
                     time.sleep(1)
-            else:
-                print(f"{self.colors['yellow']}No marshmallows have been added yet. Be the first!{self.colors['reset']}")
-                print()
-                input("Press Enter to continue...")
-                break
     
     def admin_controls(self):
         """Handle admin-specific controls."""
@@ -284,6 +358,7 @@ class ConsoleGUI:
             self.print_header()
             print(f"{self.colors['red']}=== ADMIN CONTROLS ==={self.colors['reset']}")
             print("1. Clear All Marshmallows")
+            print("2. View Operation Metrics")
             print("0. Back to Main Menu")
             
             choice = self.get_input("Enter choice")
@@ -296,6 +371,25 @@ class ConsoleGUI:
                     self.manager.clear_all_questions()
                     print(f"{self.colors['green']}All questions cleared!{self.colors['reset']}")
                     time.sleep(1)
+            elif choice == '2':
+                self.show_metrics()
+    
+    def show_metrics(self):
+        """Print per-operation call counts and latency percentiles."""
+        self.print_header()
+        print(f"{self.colors['red']}=== OPERATION METRICS ==={self.colors['reset']}")
+        
+        rows = summary_table(self.manager.metrics.summary())
+        if rows:
+            headers = list(rows[0])
+            widths = [max(len(h), *(len(row[h]) for row in rows)) for h in headers]
+            print("  ".join(f"{self.colors['bold']}{h:<{w}}{self.colors['reset']}" for h, w in zip(headers, widths)))
+            for row in rows:
+                print("  ".join(f"{row[h]:<{w}}" for h, w in zip(headers, widths)))
+        else:
+            print(f"{self.colors['yellow']}No operations recorded yet.{self.colors['reset']}")
+        print()
+        input("Press Enter to continue...")
     
     def enter_admin_mode(self):
         """Handle entering admin mode."""
@@ -5,41 +5,327 @@ This module contains the shared business logic that can be used by different
 front-end interfaces (Streamlit GUI, console GUI, etc.).
 """
 
+import atexit
+import base64
+import contextlib
 import datetime
+import functools
+import heapq
+import itertools
+import math
 import random
+import struct
+import threading
+import time
 import uuid
 import json
 import os
+import weakref
+import zlib
+from collections import Counter
 from pathlib import Path
-from typing import Dict, List, Set, Optional, Any, Union
+from typing import Callable, Dict, Iterable, Iterator, List, Set, Optional, Any, Tuple, Union
+from .storage import (JSONArrayStreamer, QuestionJournal, decode_binary, encode_binary,
+                      is_binary_data_file, serialize_question, write_binary_file, write_snapshot)
+from .sqlite_store import SQLiteQuestionMap, SQLiteQuestionStore
+from .indexes import ChangeIndex, RandomPool, SortedIndex
+from .records import QuestionRecord
+from .metrics import Metrics
+from .ratelimit import RateLimiter, RateLimitExceeded
+from .search import InvertedIndex, content_words, jaccard
+from .shared import ChangeLog, FileLock
+from .voters import VoterIndex
+
+
+def synchronized(method):
+    """
+    Run a MarshmallowManager method while holding the manager's lock.
+    
+    Also waits for a background load to finish, so methods never see a
+    half-loaded store, and with shared file storage first applies any changes
+    other processes made.
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        self._wait_until_loaded()
+        with self._lock:
+            if self._changes is not None:
+                self._catch_up()
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+def exclusive(method):
+    """
+    Like @synchronized, for methods that change questions or write storage.
+    
+    With shared file storage the cross-process lock is also held for the
+    whole call, so no other process can change anything between catching up
+    on its changes and recording this one.
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        self._wait_until_loaded()
+        with self._lock:
+            if self._file_lock is None:
+                return method(self, *args, **kwargs)
+            with self._file_lock:
+                self._catch_up()
+                return method(self, *args, **kwargs)
+    return wrapper
+
+
+def instrumented(method):
+    """
+    Report the duration of a MarshmallowManager method to the manager's metrics.
+    
+    When the manager has no metrics this is a single attribute check. Applied
+    outside @synchronized, so the time spent waiting for the lock counts.
+    """
+    name = method.__name__
+    
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if self.metrics is None:
+            return method(self, *args, **kwargs)
+        start = time.perf_counter()
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            self.metrics.record_latency(name, time.perf_counter() - start)
+    return wrapper
+
+
+def _as_record(question: Dict) -> QuestionRecord:
+    """Store a question assigned from outside as a record (plain dicts are converted)."""
+    return question if isinstance(question, QuestionRecord) else QuestionRecord.from_dict(question)
+
+
+def _encode_cursor(sort_by: str, status: Optional[str], key: Tuple) -> str:
+    """Pack a query and the sort key of its last returned question into a cursor."""
+    payload = json.dumps([sort_by, status, *key]).encode()
+    return base64.urlsafe_b64encode(payload).decode("ascii")
+
+
+def _decode_cursor(cursor: str, sort_by: str, status: Optional[str],
+                   primary_type: type = int) -> Tuple:
+    """
+    Unpack a cursor made by _encode_cursor.
+    
+    Cursors come from clients, so the key is type-checked too: a key that
+    can't be compared with the index's keys is as invalid as garbage.
+    
+    Args:
+        cursor: The cursor string
+        sort_by: Sort method of the query the cursor is used with
+        status: Status filter of the query the cursor is used with
+        primary_type: Type of the key's first element (the second is an ID)
+        
+    Returns:
+        The sort key the next page starts after
+        
+    Raises:
+        ValueError: If the cursor is malformed or belongs to a different query
+    """
+    try:
+        cursor_sort, cursor_status, *key = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor!r}") from e
+    if (cursor_sort, cursor_status) != (sort_by, status) or len(key) != 2:
+        raise ValueError(f"Cursor doesn't belong to this query: {cursor!r}")
+    # type() rather than isinstance(), which would let JSON booleans pass as ints
+    if type(key[0]) is not primary_type or type(key[1]) is not int:
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+    return tuple(key)
+
+
+class UserSession:
+    """
+    Per-user state kept outside the shared MarshmallowManager.
+    
+    One manager can serve many users at once (e.g. every browser session of a
+    Streamlit server); each user gets their own session with an identity and
+    a record of which questions they have already been shown.
+    """
+    
+    def __init__(self, user_id: str, session_id: Optional[str] = None):
+        """
+        Initialize a user session.
+        
+        Args:
+            user_id: Display name of the user (colored animal name)
+            session_id: Unique session identifier (generated if None)
+        """
+        self.user_id = user_id
+        self.session_id = session_id or str(uuid.uuid4())
+        self.viewed_questions: Set[int] = set()
+        # Approved question IDs not in viewed_questions, kept by the manager
+        # only once the session has seen most of the board; until then random
+        # picks come from the manager's shared pool
+        self.unviewed_ids: Optional[RandomPool] = None
 
 
 class MarshmallowManager:
-    """Manages marshmallow questions with various operations."""
+    """
+    Manages marshmallow questions with various operations.
+    
+    All public methods are thread-safe, so a single manager can be shared by
+    every session of a server process.
+    """
     
-    def __init__(self, storage_type: str = "memory"):
+    PAGE_SORTS = ("newest", "votes")  # Sort methods get_questions_page supports
+    DEFAULT_FLUSH_INTERVAL_MS = 1000  # Write-behind: max delay before a flush
+    DEFAULT_FLUSH_AFTER = 50  # Write-behind: mutations that force an early flush
+    DUPLICATE_POLICIES = ("allow", "reject", "merge")  # What add_question does with near-duplicates
+    DEFAULT_DUPLICATE_THRESHOLD = 0.7  # Word similarity at which questions count as duplicates
+    PICK_ATTEMPTS = 16  # Random picks tried against a session's viewed set before it gets its own pool
+    
+    def __init__(self, storage_type: str = "memory",
+                 storage_path: Optional[Union[str, Path]] = None,
+                 write_behind: bool = False,
+                 flush_interval_ms: int = DEFAULT_FLUSH_INTERVAL_MS,
+                 flush_after: int = DEFAULT_FLUSH_AFTER,
+                 file_format: str = "json",
+                 compress: bool = True,
+                 metrics: Optional[Metrics] = None,
+                 duplicate_policy: str = "allow",
+                 duplicate_threshold: float = DEFAULT_DUPLICATE_THRESHOLD,
+                 rate_limiter: Optional[RateLimiter] = None,
+                 shared: bool = False):
         """
         Initialize the Marshmallow Manager.
         
         Args:
-            storage_type: Type of storage to use ("memory" or "file")
+            storage_type: Type of storage to use ("memory", "file", "log" or "sqlite")
+            storage_path: Path of the data file (defaults to marshmallow_data.json,
+                or marshmallow_data.db for SQLite storage)
+            write_behind: For file storage, batch mutations and write them from
+                a background thread instead of rewriting the file on every change
+            flush_interval_ms: Write-behind: flush at most this long after the
+                first unsaved change
+            flush_after: Write-behind: flush as soon as this many changes are unsaved
+            file_format: Format file storage saves in ("json" or "binary");
+                loading detects the format, so existing files migrate on the next save
+            compress: Whether to zlib-compress the binary format
+            metrics: Where to report operation timings and bytes written
+                (None disables instrumentation)
+            duplicate_policy: What add_question does when a near-duplicate of
+                the new question exists: "allow" adds it anyway, "reject"
+                refuses it and "merge" votes for the existing question instead
+            duplicate_threshold: Jaccard similarity of the questions' words
+                (stop words aside) at which they count as near-duplicates
+            rate_limiter: Token buckets limiting how often each user, and
+                everybody together, can add and vote; refused calls raise
+                RateLimitExceeded (None disables rate limiting)
+            shared: For file storage, let several processes use the data
+                file at once: changes are appended to a change log under a
+                cross-process lock, and each manager applies the other
+                processes' changes as they happen (see shared.py). Replaces
+                write-behind, and loads in the foreground.
         """
-        self.questions = []
-        self.question_map = {}  # Dictionary for O(1) lookups by ID
-        self.viewed_questions = set()
+        if duplicate_policy not in self.DUPLICATE_POLICIES:
+            raise ValueError(f"Unknown duplicate policy: {duplicate_policy!r}")
+        
+        # Insertion-ordered dict of ID -> question: the main store, giving
+        # O(1) lookups and deletes while keeping submission order
+        self._question_map = {}
+        # Sort indexes keyed by status first, so each status's questions form
+        # one contiguous run that is already in sort order
+        self._vote_index = SortedIndex()  # (status, -votes, id) keys, most voted first
+        self._newest_index = SortedIndex()  # (status, -id, id) keys, newest first
+        self._indexed = {}  # Question ID -> (status, votes) it is indexed under
+        self._status_counts = Counter()  # Number of indexed questions per status
+        # Full-text index, built on the first search and then kept up to date
+        self._search_index: Optional[InvertedIndex] = None
+        self._approved_ids = RandomPool()  # IDs of approved questions
+        self._voters = VoterIndex()  # Who voted for which question (one vote per user)
         self.storage_type = storage_type
-        self.storage_path = Path("marshmallow_data.json")
-        self.next_id = 0  # Track the next ID to use
+        default_path = "marshmallow_data.db" if storage_type == "sqlite" else "marshmallow_data.json"
+        self.storage_path = Path(storage_path or default_path)
+        self.file_format = file_format
+        self.compress = compress
+        self._next_id = 0  # Track the next ID to use
+        # Change version: advanced by every mutation and stamped on the
+        # question it changes, for compare-and-set updates
+        self._version = 0
+        # Which questions changed at which version, for changes_since
+        self._change_index = ChangeIndex()
+        
+        self.metrics = metrics
+        self.duplicate_policy = duplicate_policy
+        self.duplicate_threshold = duplicate_threshold
+        self.rate_limiter = rate_limiter
+        
+        # Guards all state so concurrent threads can share the manager
+        self._lock = threading.RLock()
+        
+        # Set once the store is fully loaded (cleared during a background load)
+        self._loaded = threading.Event()
+        self._loaded.set()
+        self._loader = None
         
-        # Generate a unique session ID
-        self.session_id = str(uuid.uuid4())
+        # Live user sessions, and those holding their own unviewed pool
+        # (kept up to date as questions come and go)
+        self._sessions = weakref.WeakSet()
+        self._pooled_sessions = weakref.WeakSet()
         
-        # Create a random user ID
-        self.user_id = self._generate_user_id()
+        # Session used when no session is passed explicitly (e.g. the console app)
+        self.default_session = self.create_session()
         
-        # Load questions if using file storage
-        if self.storage_type == "file" and self.storage_path.exists():
+        # Append-only journal used by log storage
+        self._journal = None
+        
+        # Database used by SQLite storage (the source of truth in that mode)
+        self._db = None
+        
+        # Lock file and change log used by shared file storage
+        self.shared = shared and storage_type == "file"
+        self._file_lock = None
+        self._changes = None
+        
+        # Write-behind state for file storage (group commit)
+        self.write_behind = write_behind and storage_type == "file" and not self.shared
+        self.flush_interval_ms = flush_interval_ms
+        self.flush_after = flush_after
+        self._dirty_count = 0  # Mutations not yet written to disk
+        self._dirty_since = None  # time.monotonic() of the oldest unsaved mutation
+        self._batch_depth = 0  # Nesting depth of batch() blocks, which defer saves
+        self._closing = False
+        self._flush_wakeup = threading.Condition(self._lock)
+        self._flusher = None
+        # Snapshots are numbered as they're taken; writes of older ones than
+        # the file already holds are skipped, so racing flushes can't reorder
+        self._write_lock = threading.Lock()
+        self._snapshot_generation = 0
+        self._written_generation = 0
+        
+        # Load questions if using persistent storage
+        if self.storage_type == "sqlite":
+            self._db = SQLiteQuestionStore(self.storage_path)
+            self._next_id = self._db.next_id()
+        elif self.storage_type == "log":
+            self._journal = QuestionJournal(self.storage_path, self._copy_state,
+                                            lambda state: self._serialize_snapshot(*state))
             self.load_questions()
+        elif self.storage_type == "file":
+            if self.shared:
+                self._file_lock = FileLock(self.storage_path.with_suffix(".lock"))
+                self._changes = ChangeLog(self.storage_path.with_suffix(".changes"))
+            if self.storage_path.exists():
+                # Stream the data file in the background so the first screen
+                # doesn't wait for the whole archive to be parsed
+                self._loaded.clear()
+                self._loader = threading.Thread(target=self._load_in_background, daemon=True)
+                self._loader.start()
+            elif self.shared:
+                with self._lock, self._file_lock:
+                    self._load_shared()
+        
+        if self.write_behind:
+            self._flusher = threading.Thread(target=self._flush_loop, daemon=True)
+            self._flusher.start()
+            # Don't lose buffered changes when the process exits
+            atexit.register(MarshmallowManager._close_at_exit, weakref.ref(self))
     
     def _generate_user_id(self) -> str:
         """Generate a random user identifier (colored animal name)."""
@@ -49,29 +335,161 @@ class MarshmallowManager:
                  "Silver", "Orange", "Teal", "Emerald", "Azure"]
         return f"{random.choice(colors)} {random.choice(animal_names)}"
     
-    def add_question(self, question_text: str, user_id: Optional[str] = None) -> bool:
+    def create_session(self, user_id: Optional[str] = None) -> UserSession:
+        """
+        Create a new user session (O(1): sessions share the manager's
+        random-pick pool until they have seen most of the board).
+        
+        Doesn't wait for a background load.
+        
+        Args:
+            user_id: Optional user identifier (random colored animal if None)
+            
+        Returns:
+            UserSession: The new session
+        """
+        with self._lock:
+            session = UserSession(user_id or self._generate_user_id())
+            self._sessions.add(session)
+            return session
+    
+    def _wait_until_loaded(self) -> None:
+        """Block until any background load of the data file has finished."""
+        if not self._loaded.is_set():
+            self._loaded.wait()
+    
+    def wait_until_loaded(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait for the data file to finish loading in the background.
+        
+        Every method that reads or changes questions waits for this on its
+        own; front ends can use it to show something while they wait.
+        
+        Args:
+            timeout: Seconds to wait at most (None to wait as long as it takes)
+            
+        Returns:
+            bool: True if loading has finished, False if the timeout passed first
+        """
+        return self._loaded.wait(timeout)
+    
+    @property
+    def session_id(self) -> str:
+        """Session ID of the default session."""
+        return self.default_session.session_id
+    
+    @property
+    def user_id(self) -> str:
+        """User ID of the default session."""
+        return self.default_session.user_id
+    
+    @user_id.setter
+    def user_id(self, value: str) -> None:
+        self.default_session.user_id = value
+    
+    @property
+    def viewed_questions(self) -> Set[int]:
+        """Questions already shown to the default session."""
+        return self.default_session.viewed_questions
+    
+    @viewed_questions.setter
+    def viewed_questions(self, value: Set[int]) -> None:
+        with self._lock:
+            self.default_session.viewed_questions = value
+            self._drop_session_pool(self.default_session)
+    
+    @property
+    def next_id(self) -> int:
+        """The ID the next added question will get."""
+        self._wait_until_loaded()
+        return self._next_id
+    
+    @property
+    def questions(self) -> List[Dict]:
+        """All questions in insertion order (a new list on each access)."""
+        if self._db is not None:
+            return self._db.query()
+        self._wait_until_loaded()
+        with self._lock:
+            if self._changes is not None:
+                self._catch_up()
+            return list(self._question_map.values())
+    
+    @questions.setter
+    def questions(self, value: List[Dict]) -> None:
+        with self._lock:
+            self._question_map = {q["id"]: _as_record(q) for q in value}
+            self._new_version()  # Clients syncing deltas start over
+            self._rebuild_indexes()
+    
+    @property
+    def question_map(self) -> Dict[int, Dict]:
+        """Mapping of question ID to question for O(1) lookups."""
+        if self._db is not None:
+            return SQLiteQuestionMap(self._db)
+        self._wait_until_loaded()
+        if self._changes is not None:
+            with self._lock:
+                self._catch_up()
+        return self._question_map
+    
+    @question_map.setter
+    def question_map(self, value: Dict[int, Dict]) -> None:
+        with self._lock:
+            self._question_map = {question_id: _as_record(q) for question_id, q in value.items()}
+            self._new_version()  # Clients syncing deltas start over
+            self._rebuild_indexes()
+    
+    @instrumented
+    @exclusive
+    def add_question(self, question_text: str, user_id: Optional[str] = None,
+                     on_duplicate: Optional[str] = None,
+                     on_merge: Optional[Callable[[Dict], None]] = None) -> bool:
         """
         Add a new question.
         
+        Only approved questions count as near-duplicates, so a submission
+        is never merged into (or rejected because of) a hidden one.
+        
         Args:
             question_text: The text of the question
-            user_id: Optional user identifier (uses self.user_id if None)
+            user_id: Optional user identifier; pass a unique one such as the
+                session's session_id, since display names can collide (uses
+                the default session's session_id if None)
+            on_duplicate: What to do if a near-duplicate exists ("allow",
+                "reject" or "merge"; defaults to the manager's duplicate_policy)
+            on_merge: Called with the existing question when the new one is
+                merged into it, e.g. to tell the user where their vote went
             
         Returns:
-            bool: True if question was added, False otherwise
+            bool: True if question was added (or merged into a near-duplicate),
+            False otherwise
+            
+        Raises:
+            RateLimitExceeded: If the user, or everybody, is adding too often
+                (a merge only takes an add token, not a vote token as well)
         """
         if not question_text.strip():
             return False
-            
+        
+        policy = on_duplicate or self.duplicate_policy
+        if policy not in self.DUPLICATE_POLICIES:
+            raise ValueError(f"Unknown duplicate policy: {policy!r}")
         if user_id is None:
-            user_id = self.user_id
+            user_id = self.session_id
+        self._acquire_rate("add", "add_question", user_id)
+        
+        if policy != "allow":
+            duplicate = self.find_duplicate(question_text, status="approved")
+            if duplicate is not None:
+                if policy == "reject":
+                    return False
+                if on_merge is not None:
+                    on_merge(duplicate)
+                return self._vote(duplicate["id"], user_id)
         
-        # Use the next available ID
-        question_id = self.next_id
-        self.next_id += 1
-            
         question = {
-            "id": question_id,
+            "id": self._next_id,
             "text": question_text,
             "timestamp": datetime.datetime.now(),
             "status": "approved",  # All questions are immediately approved
@@ -80,158 +498,684 @@ class MarshmallowManager:
             "votes": 0
         }
         
-        # Add to both list and map
-        self.questions.append(question)
-        self.question_map[question_id] = question
+        if self._db is not None:
+            # The database hands out IDs so processes sharing it never collide
+            self._db.insert(question)
+            self._next_id = question["id"] + 1
+            return True
+        
+        # Add to the store as a compact record, using the next available ID
+        question["version"] = self._new_version()
+        question = QuestionRecord.from_dict(question)
+        self._insert_question(question)
         
-        # Save to file if using file storage
-        if self.storage_type == "file":
-            self.save_questions()
+        # Persist the change if using persistent storage
+        self._persist("add", question=serialize_question(question))
             
         return True
     
-    def get_random_question(self) -> Optional[Dict]:
+    def _insert_question(self, question: QuestionRecord) -> None:
+        """Add a question to the store and all indexes, advancing next_id past it."""
+        question_id = question["id"]
+        self._next_id = max(self._next_id, question_id + 1)
+        self._question_map[question_id] = question
+        self._change_index.add(question_id, question["version"])
+        self._index_question(question)
+        if self._search_index is not None:
+            self._search_index.add(question_id, question["text"])
+        self._update_random_pool(question_id, question["status"])
+    
+    @instrumented
+    @synchronized
+    def get_random_question(self, session: Optional[UserSession] = None) -> Optional[Dict]:
         """
-        Get a random approved question.
+        Get a random approved question, skipping those the session has seen.
+        
+        Picks from the shared pool of approved questions until one the
+        session hasn't seen comes up. After PICK_ATTEMPTS misses in a row
+        (the session has seen most of the board) it gets its own pool of
+        the rest, so picks stay O(1) without a copy of the pool per session.
+        
+        Args:
+            session: Session whose viewed questions to skip (default session if None)
         
         Returns:
             Dict or None: A random question or None if no questions available
         """
-        approved_questions = [q for q in self.questions if q["status"] == "approved"]
-        if not approved_questions:
+        session = session or self.default_session
+        if self._db is not None:
+            return self._get_random_question_from_db(session)
+        
+        if not self._approved_ids:
             return None
         
-        # Filter out recently viewed questions unless all have been viewed
-        unviewed = [q for q in approved_questions if q["id"] not in self.viewed_questions]
-        if not unviewed and approved_questions:
+        if session.unviewed_ids is None:
+            for _ in range(self.PICK_ATTEMPTS):
+                question_id = self._approved_ids.choice()
+                if question_id not in session.viewed_questions:
+                    session.viewed_questions.add(question_id)
+                    return self._question_map[question_id]
+            session.unviewed_ids = RandomPool(
+                i for i in self._approved_ids if i not in session.viewed_questions
+            )
+            self._pooled_sessions.add(session)
+        
+        if session.unviewed_ids:
+            question_id = session.unviewed_ids.choice()
+            session.unviewed_ids.discard(question_id)
+        else:
             # Reset viewed questions if all have been seen
-            self.viewed_questions = set()
-            unviewed = approved_questions
+            session.viewed_questions = set()
+            self._drop_session_pool(session)
+            question_id = self._approved_ids.choice()
+        session.viewed_questions.add(question_id)
+        return self._question_map[question_id]
+    
+    def _get_random_question_from_db(self, session: UserSession) -> Optional[Dict]:
+        """Pick a random approved question using the status index."""
+        approved_ids = self._db.ids(status="approved")
+        if not approved_ids:
+            return None
         
-        if unviewed:
-            question = random.choice(unviewed)
-            self.viewed_questions.add(question["id"])
-            return question
-        return None
+        # Filter out recently viewed questions unless all have been viewed
+        unviewed = [i for i in approved_ids if i not in session.viewed_questions]
+        if not unviewed:
+            session.viewed_questions = set()
+            unviewed = approved_ids
+        
+        question_id = random.choice(unviewed)
+        session.viewed_questions.add(question_id)
+        return self._db.get(question_id)
     
-    def vote_for_question(self, question_id: int) -> bool:
+    @instrumented
+    @exclusive
+    def vote_for_question(self, question_id: int, user_id: Optional[str] = None) -> bool:
         """
         Increment votes for a question.
         
+        With a user ID, each user can vote for a question once (see
+        unvote_question to take a vote back). Votes without one aren't
+        tracked and always count.
+        
         Args:
             question_id: ID of the question to vote for
+            user_id: Optional user identifier of the voter
             
         Returns:
-            bool: True if vote successful, False otherwise
+            bool: True if vote successful, False otherwise (including when
+            the user already voted for the question)
+            
+        Raises:
+            RateLimitExceeded: If the user, or everybody, is voting too often
         """
+        self._acquire_rate("vote", "vote_for_question", user_id)
+        return self._vote(question_id, user_id)
+    
+    def _vote(self, question_id: int, user_id: Optional[str]) -> bool:
+        """Apply a vote without rate limiting (see vote_for_question; locks held)."""
+        if self._db is not None:
+            if user_id is None:
+                return self._db.increment_votes(question_id)
+            return self._db.add_vote(question_id, user_id)
+        
         # O(1) lookup using dictionary
-        if question_id in self.question_map:
-            self.question_map[question_id]["votes"] += 1
-            if self.storage_type == "file":
-                self.save_questions()
+        if question_id in self._question_map:
+            if user_id is not None and not self._voters.add(question_id, user_id):
+                return False
+            self._change_votes(question_id, 1)
+            self._stamp(self._question_map[question_id], self._new_version())
+            self._persist("vote", id=question_id, user=user_id)
+            return True
+        return False
+    
+    @instrumented
+    @exclusive
+    def unvote_question(self, question_id: int, user_id: str) -> bool:
+        """
+        Take back a user's vote for a question.
+        
+        Args:
+            question_id: ID of the question
+            user_id: User identifier of the voter
+            
+        Returns:
+            bool: True if the vote was removed, False if the user hadn't
+            voted for the question
+            
+        Raises:
+            RateLimitExceeded: If the user, or everybody, is voting too often
+        """
+        self._acquire_rate("vote", "unvote_question", user_id)
+        if self._db is not None:
+            return self._db.remove_vote(question_id, user_id)
+        
+        if question_id in self._question_map and self._voters.discard(question_id, user_id):
+            self._change_votes(question_id, -1)
+            self._stamp(self._question_map[question_id], self._new_version())
+            self._persist("unvote", id=question_id, user=user_id)
             return True
         return False
     
-    def highlight_question(self, question_id: int, highlighted: bool = True) -> bool:
+    @synchronized
+    def has_voted(self, question_id: int, user_id: str) -> bool:
+        """
+        Check whether a user has voted for a question.
+        
+        Args:
+            question_id: ID of the question
+            user_id: User identifier of the voter
+            
+        Returns:
+            bool: True if the user's vote for the question is recorded
+        """
+        if self._db is not None:
+            return self._db.has_voted(question_id, user_id)
+        return self._voters.has_voted(question_id, user_id)
+    
+    def _acquire_rate(self, operation: str, method: str, user_id: Optional[str]) -> None:
+        """
+        Take a rate-limit token for an operation, if rate limiting is on.
+        
+        Args:
+            operation: Rate-limited operation ("add" or "vote")
+            method: Name of the calling method, for metrics
+            user_id: User identifier of the caller (the default session's
+                session_id if None)
+            
+        Raises:
+            RateLimitExceeded: If the user's or the global bucket is empty
+        """
+        if self.rate_limiter is None:
+            return
+        try:
+            self.rate_limiter.acquire(operation, user_id if user_id is not None else self.session_id)
+        except RateLimitExceeded:
+            if self.metrics is not None:
+                self.metrics.record_throttled(method)
+            raise
+    
+    def _change_votes(self, question_id: int, delta: int) -> None:
+        """Add delta to a question's votes, keeping the vote index in order."""
+        question = self._question_map[question_id]
+        self._unindex_question(question_id)
+        question["votes"] += delta
+        self._index_question(question)
+    
+    @instrumented
+    @exclusive
+    def highlight_question(self, question_id: int, highlighted: bool = True,
+                           expected_version: Optional[int] = None) -> bool:
         """
         Set highlight status for a question.
         
         Args:
             question_id: ID of the question
             highlighted: Whether to highlight or unhighlight
+            expected_version: Only change the question if its "version" is
+                still this (compare-and-set; None to change it regardless)
             
         Returns:
-            bool: True if successful, False otherwise
+            bool: True if successful, False otherwise (including when the
+            question's version isn't expected_version)
         """
+        if self._db is not None:
+            return self._db.update_field(question_id, "highlighted", highlighted, expected_version)
+        
         # O(1) lookup using dictionary
-        if question_id in self.question_map:
-            self.question_map[question_id]["highlighted"] = highlighted
-            if self.storage_type == "file":
-                self.save_questions()
+        question = self._question_map.get(question_id)
+        if question is not None and self._version_matches(question, expected_version):
+            question["highlighted"] = highlighted
+            self._stamp(question, self._new_version())
+            self._persist("highlight", id=question_id, highlighted=highlighted)
             return True
         return False
     
-    def set_question_status(self, question_id: int, status: str) -> bool:
+    @instrumented
+    @exclusive
+    def set_question_status(self, question_id: int, status: str,
+                            expected_version: Optional[int] = None) -> bool:
         """
         Change status of a question.
         
         Args:
             question_id: ID of the question
             status: New status ("approved", "pending", etc.)
+            expected_version: Only change the question if its "version" is
+                still this (compare-and-set; None to change it regardless)
             
         Returns:
-            bool: True if successful, False otherwise
+            bool: True if successful, False otherwise (including when the
+            question's version isn't expected_version)
         """
+        if self._db is not None:
+            return self._db.update_field(question_id, "status", status, expected_version)
+        
         # O(1) lookup using dictionary
-        if question_id in self.question_map:
-            self.question_map[question_id]["status"] = status
-            if self.storage_type == "file":
-                self.save_questions()
+        question = self._question_map.get(question_id)
+        if question is not None and self._version_matches(question, expected_version):
+            self._set_status(question, status)
+            self._stamp(question, self._new_version())
+            self._persist("status", id=question_id, status=status)
             return True
         return False
     
-    def delete_question(self, question_id: int) -> bool:
+    def _set_status(self, question: Dict, status: str) -> None:
+        """Change a question's status, keeping the indexes and random pools in sync."""
+        self._unindex_question(question["id"])
+        question["status"] = status
+        self._index_question(question)
+        self._update_random_pool(question["id"], status)
+    
+    @instrumented
+    @exclusive
+    def delete_question(self, question_id: int, expected_version: Optional[int] = None) -> bool:
         """
         Delete a question.
         
         Args:
             question_id: ID of the question to delete
+            expected_version: Only delete the question if its "version" is
+                still this (compare-and-set; None to delete it regardless)
             
         Returns:
-            bool: True if successful, False otherwise
+            bool: True if successful, False otherwise (including when the
+            question's version isn't expected_version)
         """
-        # O(1) lookup using dictionary
-        if question_id in self.question_map:
-            # Remove from list
-            for i, q in enumerate(self.questions):
-                if q["id"] == question_id:
-                    self.questions.pop(i)
-                    break
-                    
-            # Remove from dictionary
-            del self.question_map[question_id]
-            
-            # Remove from viewed questions if present
-            if question_id in self.viewed_questions:
-                self.viewed_questions.remove(question_id)
-                
-            if self.storage_type == "file":
-                self.save_questions()
-                
+        if self._db is not None:
+            deleted = self._db.delete(question_id, expected_version)
+            if deleted:
+                for session in self._sessions:
+                    session.viewed_questions.discard(question_id)
+            return deleted
+        
+        question = self._question_map.get(question_id)
+        if question is not None and self._version_matches(question, expected_version):
+            self._new_version()
+            self._remove_question(question_id)
+            self._persist("delete", id=question_id)
             return True
         return False
     
+    def _remove_question(self, question_id: int) -> None:
+        """Remove a question from the store, all indexes and the sessions."""
+        # O(1) removal using the insertion-ordered dictionary
+        question = self._question_map.pop(question_id)
+        self._change_index.delete(question_id, self._version)
+        self._unindex_question(question_id)
+        if self._search_index is not None:
+            self._search_index.remove(question_id, question["text"])
+        self._update_random_pool(question_id, None)
+        self._voters.remove_question(question_id)
+        
+        # Remove from viewed questions if present
+        for session in self._sessions:
+            session.viewed_questions.discard(question_id)
+    
+    @instrumented
+    @exclusive
     def clear_all_questions(self) -> None:
         """Clear all questions."""
-        self.questions = []
-        self.question_map = {}
-        self.viewed_questions = set()
-        self.next_id = 0
+        if self._db is not None:
+            self._db.clear()
+            self._reset_sessions()
+            self._next_id = 0
+            return
+        
+        self._new_version()
+        self._clear_store()
+        self._persist("clear")
+    
+    def _clear_store(self) -> None:
+        """Empty the store, its indexes and the sessions' viewed questions."""
+        self._reset_sessions()
+        self._next_id = 0
+        self._question_map = {}
+        self._voters.clear()
+        self._rebuild_indexes()
+    
+    def _reset_sessions(self) -> None:
+        """Forget which questions every session has viewed."""
+        for session in self._sessions:
+            session.viewed_questions = set()
+    
+    @staticmethod
+    def _version_matches(question: Dict, expected_version: Optional[int]) -> bool:
+        """Check a compare-and-set condition (always true without an expected version)."""
+        return expected_version is None or question.get("version", 0) == expected_version
+    
+    def _new_version(self) -> int:
+        """Advance the change version for a mutation and return it."""
+        self._version += 1
+        return self._version
+    
+    def _stamp(self, question: Dict, version: int) -> None:
+        """Record that a question was changed at a change version."""
+        question["version"] = version
+        self._change_index.update(question["id"], version)
+    
+    @property
+    def version(self) -> int:
+        """
+        The change version: advanced by every mutation, including those of
+        other processes sharing the storage. Cheap enough to poll.
+        """
+        if self._db is not None:
+            return self._db.version()
+        self._wait_until_loaded()
+        if self._changes is not None:
+            with self._lock:
+                self._catch_up()
+        return self._version
+    
+    @instrumented
+    @synchronized
+    def changes_since(self, version: int) -> Dict[str, Any]:
+        """
+        Get the questions that changed after a change version (delta sync).
+        
+        A client keeps the "version" of its last sync and passes it back to
+        fetch only what changed since. If the changes are too old to list
+        (the store was cleared or reloaded, or too many questions were
+        deleted since), the result is a reset with every question in "added".
+        
+        Args:
+            version: Change version the caller is up to date with
+            
+        Returns:
+            Dict with the current "version", "reset" (True if the caller
+            should drop everything it has), "added" and "updated" (lists of
+            questions) and "deleted" (list of question IDs)
+        """
+        if self._db is not None:
+            return self._db.changes_since(version)
         
-        if self.storage_type == "file":
-            self.save_questions()
+        changes = None
+        if version == self._version:
+            changes = [], [], []
+        elif version < self._version:
+            changes = self._change_index.since(version)
+        if changes is None:
+            return {"version": self._version, "reset": True,
+                    "added": list(self._question_map.values()), "updated": [], "deleted": []}
+        added, updated, deleted = changes
+        return {
+            "version": self._version,
+            "reset": False,
+            "added": [self._question_map[i] for i in added],
+            "updated": [self._question_map[i] for i in updated],
+            "deleted": deleted,
+        }
     
-    def get_sorted_questions(self, sort_by: str = "newest") -> List[Dict]:
+    @instrumented
+    @synchronized
+    def get_sorted_questions(self, sort_by: str = "newest",
+                             status: Optional[str] = None) -> List[Dict]:
         """
         Get questions sorted according to specified method.
         
         Args:
             sort_by: Sorting method ("newest", "votes", "random")
+            status: Only include questions with this status (None for all)
             
         Returns:
             List of sorted questions
         """
-        if sort_by == "newest":
-            return sorted(self.questions, key=lambda x: x["timestamp"], reverse=True)
-        elif sort_by == "votes":
-            return sorted(self.questions, key=lambda x: x["votes"], reverse=True)
+        if self._db is not None and sort_by != "random":
+            # Served by the (status, timestamp) / (status, votes) indexes
+            return self._db.query(sort_by, status)
+        
+        if sort_by in self.PAGE_SORTS:
+            # Read straight from the sort indexes, already filtered
+            return self._read_index(sort_by, status)
         elif sort_by == "random":
-            sorted_questions = self.questions.copy()
-            random.shuffle(sorted_questions)
-            return sorted_questions
+            questions = self.questions  # Always a fresh list
+            random.shuffle(questions)
         else:
-            return self.questions
+            questions = self.questions
+        
+        if status is not None:
+            questions = [q for q in questions if q["status"] == status]
+        return questions
     
+    @instrumented
+    @synchronized
+    def get_questions_page(self, sort_by: str = "newest", status: Optional[str] = None,
+                           limit: int = 20,
+                           cursor: Optional[str] = None) -> Tuple[List[Dict], Optional[str]]:
+        """
+        Get one page of sorted questions.
+        
+        Pages are read from the sort indexes in time proportional to the page
+        size. The cursor records the sort key of the last question returned
+        rather than a position, so questions added or voted on between
+        requests don't shift the following pages.
+        
+        Args:
+            sort_by: Sorting method ("newest" or "votes")
+            status: Only include questions with this status (None for all)
+            limit: Maximum number of questions on the page
+            cursor: Cursor returned with the previous page (None for the first page)
+            
+        Returns:
+            Tuple of (questions on this page, cursor for the next page or None
+            if there are no more questions)
+            
+        Raises:
+            ValueError: If the sort method can't be paged, the limit is not
+                positive, or the cursor is invalid or from a different query
+        """
+        if sort_by not in self.PAGE_SORTS:
+            raise ValueError(f"Can't page questions sorted by {sort_by!r}")
+        if limit < 1:
+            raise ValueError(f"Page limit must be positive, got {limit}")
+        after = None
+        if cursor is not None:
+            # SQLite pages "newest" by ISO timestamp; everything else by number
+            primary_type = str if self._db is not None and sort_by == "newest" else int
+            after = _decode_cursor(cursor, sort_by, status, primary_type)
+        
+        # Fetch one extra question to find out whether there is a next page
+        if self._db is not None:
+            questions = self._db.query_page(sort_by, status, limit + 1, after)
+        else:
+            questions = self._read_index(sort_by, status, after, limit + 1)
+        if len(questions) <= limit:
+            return questions, None
+        
+        questions = questions[:limit]
+        return questions, _encode_cursor(sort_by, status, self._page_key(sort_by, questions[-1]))
+    
+    def _page_key(self, sort_by: str, question: Dict) -> Tuple:
+        """The sort key a page ending with this question continues after."""
+        if self._db is not None:
+            primary = question["timestamp"].isoformat() if sort_by == "newest" else question["votes"]
+            return (primary, question["id"])
+        primary = -question["id"] if sort_by == "newest" else -question["votes"]
+        return (primary, question["id"])
+    
+    def _read_index(self, sort_by: str, status: Optional[str],
+                    after: Optional[Tuple] = None, limit: Optional[int] = None) -> List[Dict]:
+        """
+        Read questions in sort order straight from a sort index.
+        
+        Each status is one contiguous run of its index; without a status
+        filter the runs of all statuses are merged.
+        
+        Args:
+            sort_by: "newest" or "votes"
+            status: Only read questions with this status (None for all)
+            after: Sort key (without the status) to start after (None to start at the top)
+            limit: Maximum number of questions to read (None for all)
+            
+        Returns:
+            List of questions
+        """
+        index = self._vote_index if sort_by == "votes" else self._newest_index
+        statuses = [status] if status is not None else list(self._status_counts)
+        runs = [
+            index.irange((s, *after) if after else (s,), (s, math.inf),
+                         inclusive=(after is None, False))
+            for s in statuses
+        ]
+        if not runs:
+            return []
+        keys = runs[0] if len(runs) == 1 else heapq.merge(*runs, key=lambda key: key[1:])
+        
+        questions = []
+        for key in itertools.islice(keys, limit):
+            question = self._question_map[key[2]]
+            if question["status"] != key[0] or (sort_by == "votes" and question["votes"] != -key[1]):
+                # A question dict was changed outside the manager; resync
+                self._rebuild_indexes()
+                return self._read_index(sort_by, status, after, limit)
+            questions.append(question)
+        return questions
+    
+    @instrumented
+    @synchronized
+    def search_questions(self, query: str, status: Optional[str] = None,
+                         limit: int = 20) -> List[Dict]:
+        """
+        Full-text search over question text, best matches first.
+        
+        Questions matching more of the query's words, and rarer words, rank
+        higher. The last word also matches longer words starting with it
+        (search as you type), as does any word ending in "*". Only questions
+        sharing a word with the query are looked at, so searching doesn't
+        scan the board.
+        
+        Args:
+            query: Search text
+            status: Only include questions with this status (None for all)
+            limit: Maximum number of results
+            
+        Returns:
+            List of matching questions, most relevant first
+        """
+        if self._db is not None:
+            return self._db.search(query, status, limit)
+        
+        accept = None
+        if status is not None:
+            accept = lambda question_id: self._question_map[question_id]["status"] == status
+        results = self._get_search_index().search(query, limit, accept=accept)
+        return [self._question_map[question_id] for question_id, _ in results]
+    
+    @instrumented
+    @synchronized
+    def find_duplicate(self, question_text: str, status: Optional[str] = None) -> Optional[Dict]:
+        """
+        Find an existing question that is a near-duplicate of some text.
+        
+        Questions are compared by the Jaccard similarity of their words,
+        leaving out stop words, so rewordings like "What is a Python list?"
+        and "what's a python list" match. Only questions sharing one of
+        the text's rarest words and having about as many words are compared
+        (see InvertedIndex.similar_candidates), so the check doesn't scan the
+        board.
+        
+        Args:
+            question_text: Text of the new question
+            status: Only consider questions with this status (None for all)
+            
+        Returns:
+            The most similar question at or above duplicate_threshold (the
+            oldest one on ties), or None
+        """
+        words = content_words(question_text)
+        if not words:
+            return None
+        if self._db is not None:
+            candidates = self._db.similar_candidates(words, self.duplicate_threshold)
+        else:
+            candidates = [self._question_map[question_id] for question_id in
+                          self._get_search_index().similar_candidates(words, self.duplicate_threshold)]
+        
+        best, best_key = None, None
+        for question in candidates:
+            if status is not None and question["status"] != status:
+                continue
+            similarity = jaccard(words, content_words(question["text"]))
+            key = (similarity, -question["id"])
+            if similarity >= self.duplicate_threshold and (best_key is None or key > best_key):
+                best, best_key = question, key
+        return best
+    
+    def _get_search_index(self) -> InvertedIndex:
+        """Get the full-text index, building it on first use (O(n) once)."""
+        if self._search_index is None:
+            self._search_index = InvertedIndex()
+            for question in self._question_map.values():
+                self._search_index.add(question["id"], question["text"])
+        return self._search_index
+    
+    def _index_question(self, question: Dict) -> None:
+        """Add a question to the sort indexes (O(log n))."""
+        question_id, status, votes = question["id"], question["status"], question["votes"]
+        self._indexed[question_id] = (status, votes)
+        self._vote_index.add((status, -votes, question_id))
+        self._newest_index.add((status, -question_id, question_id))
+        self._status_counts[status] += 1
+    
+    def _unindex_question(self, question_id: int) -> None:
+        """Remove a question from the sort indexes (O(log n))."""
+        entry = self._indexed.pop(question_id, None)
+        if entry is not None:
+            status, votes = entry
+            self._vote_index.discard((status, -votes, question_id))
+            self._newest_index.discard((status, -question_id, question_id))
+            self._status_counts[status] -= 1
+            if not self._status_counts[status]:
+                del self._status_counts[status]
+    
+    def _update_random_pool(self, question_id: int, status: Optional[str]) -> None:
+        """
+        Keep the random-pick pools in sync with a question's status.
+        
+        O(1), plus O(1) for each session holding its own pool (only those
+        that have seen most of the board).
+        
+        Args:
+            question_id: ID of the question
+            status: The question's new status (None if it was deleted)
+        """
+        if status == "approved":
+            self._approved_ids.add(question_id)
+            for session in self._pooled_sessions:
+                if question_id not in session.viewed_questions:
+                    session.unviewed_ids.add(question_id)
+        else:
+            self._approved_ids.discard(question_id)
+            for session in self._pooled_sessions:
+                session.unviewed_ids.discard(question_id)
+    
+    def _rebuild_indexes(self) -> None:
+        """Rebuild the sort indexes and random pools from scratch (after a load or clear)."""
+        self._indexed = {q["id"]: (q["status"], q["votes"]) for q in self._question_map.values()}
+        self._vote_index = SortedIndex(
+            (status, -votes, question_id) for question_id, (status, votes) in self._indexed.items()
+        )
+        self._newest_index = SortedIndex(
+            (status, -question_id, question_id) for question_id, (status, _) in self._indexed.items()
+        )
+        self._status_counts = Counter(status for status, _ in self._indexed.values())
+        self._search_index = None  # Rebuilt by the next search
+        # Changes before now can't be listed any more
+        self._change_index = ChangeIndex(self._version)
+        
+        self._approved_ids = RandomPool(
+            q["id"] for q in self._question_map.values() if q["status"] == "approved"
+        )
+        for session in list(self._pooled_sessions):
+            self._drop_session_pool(session)  # Rebuilt by the next pick if needed
+    
+    def _drop_session_pool(self, session: UserSession) -> None:
+        """Go back to picking from the shared pool for a session."""
+        session.unviewed_ids = None
+        self._pooled_sessions.discard(session)
+    
+    @instrumented
+    @synchronized
     def get_question_by_id(self, question_id: int) -> Optional[Dict]:
         """
         Get a question by its ID.
@@ -242,58 +1186,402 @@ class MarshmallowManager:
         Returns:
             Dict or None: The question if found, None otherwise
         """
-        return self.question_map.get(question_id)
+        if self._db is not None:
+            return self._db.get(question_id)
+        return self._question_map.get(question_id)
     
-    def save_questions(self) -> None:
-        """Save questions to file storage."""
-        if self.storage_type != "file":
-            return
+    @instrumented
+    @synchronized
+    def count_questions(self, status: Optional[str] = None) -> int:
+        """
+        Count questions, optionally only those with a given status.
+        
+        Args:
+            status: Only count questions with this status (None for all)
+            
+        Returns:
+            Number of matching questions
+        """
+        if self._db is not None:
+            return self._db.count(status)
+        if status is None:
+            return len(self._question_map)
+        return self._status_counts[status]  # Kept up to date with the sort indexes
+    
+    def _persist(self, op: str, **fields: Any) -> None:
+        """
+        Persist a single mutation according to the storage type.
+        
+        File storage rewrites the whole data file, while log storage appends
+        one small record to the journal, and shared file storage to the
+        change log. Records carry the change version the mutation produced.
+        
+        Args:
+            op: Operation name ("add", "vote", "unvote", "highlight", "status",
+                "delete", "clear")
+            **fields: Operation-specific fields for the journal record
+        """
+        if self._changes is not None:
+            written = self._changes.append({"op": op, "version": self._version, **fields})
+            if self.metrics is not None:
+                self.metrics.record_bytes("change_append", written)
+            if self._changes.size >= ChangeLog.DEFAULT_COMPACT_THRESHOLD:
+                self.save_questions()  # Fold the change log into the data file
+        elif self.storage_type == "file":
+            if self.write_behind or self._batch_depth:
+                self._mark_dirty()
+            else:
+                self.save_questions()
+        elif self.storage_type == "log":
+            written = self._journal.append(op, version=self._version, **fields)
+            if self.metrics is not None:
+                self.metrics.record_bytes("journal_append", written)
+    
+    def _mark_dirty(self) -> None:
+        """Record an unsaved mutation and wake the flusher if needed (lock held)."""
+        if self._dirty_count == 0:
+            self._dirty_since = time.monotonic()
+        self._dirty_count += 1
+        if self._dirty_count == 1 or self._dirty_count >= self.flush_after:
+            self._flush_wakeup.notify()
+    
+    def _flush_loop(self) -> None:
+        """Background thread that writes batched changes to disk."""
+        while True:
+            with self._lock:
+                if self._closing:
+                    return
+                if self._dirty_count == 0:
+                    self._flush_wakeup.wait()
+                    continue
+                
+                deadline = self._dirty_since + self.flush_interval_ms / 1000
+                remaining = deadline - time.monotonic()
+                if remaining > 0 and self._dirty_count < self.flush_after:
+                    self._flush_wakeup.wait(remaining)
+                    continue
             
+            self.flush()  # Outside the lock, so the write doesn't block anyone
+    
+    @instrumented
+    def flush(self) -> None:
+        """
+        Write any changes buffered by write-behind mode to disk now.
+        
+        In write-behind mode only copying the questions happens under the
+        manager's lock; they're serialized and written after releasing it,
+        so other threads aren't held up by the disk.
+        """
+        self._wait_until_loaded()
+        with self._lock:
+            if not self._dirty_count:
+                return
+            if not self.write_behind:
+                self.save_questions()  # End of a batch() block
+                return
+            snapshot = self._take_snapshot()
+        self._write_snapshot(snapshot)
+    
+    @contextlib.contextmanager
+    def batch(self) -> Iterator["MarshmallowManager"]:
+        """
+        Apply several mutations with a single file write.
+        
+        Holds the manager's lock for the whole block, so other threads see
+        either none or all of its changes (with shared file storage, other
+        processes too). With file storage the data file is rewritten once
+        when the block exits instead of after every change. Other storage
+        types are unaffected. Blocks may be nested.
+        
+        Yields:
+            The manager itself
+        """
+        self._wait_until_loaded()  # The loader needs the lock to finish
+        with self._lock, (self._file_lock or contextlib.nullcontext()):
+            if self._changes is not None:
+                self._catch_up()
+            self._batch_depth += 1
+            try:
+                yield self
+            finally:
+                self._batch_depth -= 1
+                if not self._batch_depth and not self.write_behind:
+                    self.flush()
+    
+    @staticmethod
+    def _close_at_exit(manager_ref: "weakref.ref") -> None:
+        """atexit hook: flush and close a manager if it is still alive."""
+        manager = manager_ref()
+        if manager is not None:
+            manager.close()
+    
+    @staticmethod
+    def _serialize_snapshot(next_id: int, version: int, questions: Iterable[QuestionRecord],
+                            voters: VoterIndex) -> Dict:
+        """Build the JSON-serializable snapshot of the given questions."""
         # Save the next_id too for continuity across sessions
-        data_to_save = {
-            "next_id": self.next_id,
-            "questions": []
+        return {
+            "next_id": next_id,
+            "version": version,
+            "questions": [serialize_question(q) for q in questions],
+            "voters": voters.to_serialized(),
         }
+    
+    def _take_snapshot(self, copy: bool = True) -> Tuple[int, int, int, Iterable[QuestionRecord], VoterIndex]:
+        """
+        Copy everything a data file holds, for writing it out (lock held).
         
-        # Convert datetime objects to strings for JSON serialization
-        for q in self.questions:
-            q_copy = q.copy()
-            q_copy["timestamp"] = q_copy["timestamp"].isoformat()
-            data_to_save["questions"].append(q_copy)
-            
-        with open(self.storage_path, 'w') as f:
-            json.dump(data_to_save, f)
+        Copying the records is much cheaper than serializing them, so the
+        lock can be released before the copy is serialized and written.
+        
+        Args:
+            copy: Whether to copy the questions and voters (False when the
+                lock stays held until the snapshot is written)
+        
+        Returns:
+            (generation, next ID, version, question records, voters)
+        """
+        # Everything buffered by write-behind mode is about to be written
+        self._dirty_count = 0
+        self._dirty_since = None
+        self._snapshot_generation += 1
+        if not copy:
+            return (self._snapshot_generation, self._next_id, self._version,
+                    self._question_map.values(), self._voters)
+        return (self._snapshot_generation,) + self._copy_state()
+    
+    def _copy_state(self) -> Tuple[int, int, List[QuestionRecord], VoterIndex]:
+        """
+        Copy the questions and voters, for serializing outside the lock (lock held).
+        
+        Returns:
+            (next ID, version, question records, voters)
+        """
+        return (self._next_id, self._version,
+                [q.copy() for q in self._question_map.values()], self._voters.copy())
+    
+    def _write_snapshot(self, snapshot: Tuple[int, int, int, Iterable[QuestionRecord], VoterIndex]) -> None:
+        """
+        Serialize a snapshot and write it to the data file.
+        
+        Needn't hold the manager's lock. A snapshot older than the one the
+        file already holds isn't written.
+        
+        Args:
+            snapshot: Snapshot from _take_snapshot
+        """
+        generation, next_id, version, questions, voters = snapshot
+        if self.file_format == "binary":
+            data = encode_binary(next_id, questions, self.compress, voters, version)
+        else:
+            data = self._serialize_snapshot(next_id, version, questions, voters)
+        
+        with self._write_lock:
+            if generation < self._written_generation:
+                return
+            if self.file_format == "binary":
+                written = write_binary_file(self.storage_path, data)
+            elif self.shared:
+                # Atomic, as other processes may read the file at any time
+                written = write_snapshot(self.storage_path, data)
+            else:
+                with open(self.storage_path, 'w') as f:
+                    json.dump(data, f)
+                    written = f.tell()
+            self._written_generation = generation
+        
+        if self.metrics is not None:
+            self.metrics.record_bytes("save_questions", written)
+    
+    @instrumented
+    @exclusive
+    def save_questions(self) -> None:
+        """
+        Save questions to file storage.
+        
+        With shared file storage this writes a snapshot including every
+        process's changes and restarts the change log.
+        """
+        if self.storage_type == "log":
+            # Fold the journal into a fresh snapshot
+            self._journal.compact(wait=True)
+            return
+        if self.storage_type != "file":
+            return
+        
+        self._write_snapshot(self._take_snapshot(copy=False))
+        if self._changes is not None:
+            self._changes.reset(self._version)
     
+    @instrumented
+    @exclusive
     def load_questions(self) -> None:
         """Load questions from file storage."""
-        if not self.storage_path.exists():
+        if self.storage_type == "log":
+            # Replay the snapshot plus the journal
+            self._journal.close()
+            self._next_id, questions, self._voters, self._version = self._journal.load()
+            self._question_map = {
+                question_id: QuestionRecord.from_dict(q) for question_id, q in questions.items()
+            }
+            self._rebuild_indexes()
             return
-            
+        if self.shared:
+            self._load_shared()
+            return
+        if self.storage_type == "sqlite" or not self.storage_path.exists():
+            # SQLite storage reads straight from the database
+            return
+        
+        self._next_id, self._question_map, self._voters, self._version = self._read_data_file()
+        self._rebuild_indexes()
+    
+    def _read_data_file(self) -> Tuple[int, Dict[int, QuestionRecord], VoterIndex, int]:
+        """
+        Read questions from the data file, detecting its format.
+        
+        Binary files are recognized by their magic header. JSON questions are
+        decoded one at a time rather than with a single json.load, and their
+        timestamps are only parsed when first accessed. Handles both the old
+        JSON format (a list of questions) and the new format (a dict with
+        next_id and questions).
+        
+        Returns:
+            Tuple of (next_id, insertion-ordered mapping of ID to record,
+            voters, change version)
+        """
+        questions = {}
         try:
-            with open(self.storage_path, 'r') as f:
-                data = json.load(f)
+            if is_binary_data_file(self.storage_path):
+                return decode_binary(self.storage_path.read_bytes())
             
-            # Handle both old and new format
-            if isinstance(data, list):
-                # Old format (just a list of questions)
-                serialized_questions = data
-                self.next_id = len(serialized_questions)
-            else:
-                # New format (dict with next_id and questions)
-                serialized_questions = data.get("questions", [])
-                self.next_id = data.get("next_id", len(serialized_questions))
-                
-            # Convert string timestamps back to datetime objects
-            self.questions = []
-            self.question_map = {}
-            
-            for q in serialized_questions:
-                q["timestamp"] = datetime.datetime.fromisoformat(q["timestamp"])
-                self.questions.append(q)
-                self.question_map[q["id"]] = q
-                
-        except (json.JSONDecodeError, IOError) as e:
+            with open(self.storage_path, 'r') as f:
+                streamer = JSONArrayStreamer(f)
+                for q in streamer.questions():
+                    questions[q["id"]] = QuestionRecord.from_serialized(q)
+            # The old format has no next_id (or voters)
+            return (streamer.header.get("next_id", len(questions)), questions,
+                    VoterIndex.from_serialized(streamer.header.get("voters")),
+                    streamer.header.get("version", 0))
+        except (json.JSONDecodeError, IOError, ValueError, struct.error, zlib.error) as e:
             print(f"Error loading questions: {e}")
-            self.questions = []
-            self.question_map = {}
-            self.next_id = 0
\ No newline at end of file
+            return 0, {}, VoterIndex(), 0
+    
+    def _load_in_background(self) -> None:
+        """Loader thread: parse the data file, then swap it in under the lock."""
+        start = time.perf_counter()
+        try:
+            # Without the file lock: data files are replaced atomically, and
+            # _load_shared rereads the file if it changed in the meantime
+            data = self._read_data_file()
+            with self._lock:
+                if self.shared:
+                    with self._file_lock:
+                        self._load_shared(data)
+                else:
+                    self._next_id, self._question_map, self._voters, self._version = data
+                    self._rebuild_indexes()
+        finally:
+            self._loaded.set()
+            if self.metrics is not None:
+                self.metrics.record_latency("load_questions", time.perf_counter() - start)
+    
+    def _load_shared(self, data: Optional[Tuple[int, Dict[int, QuestionRecord], VoterIndex, int]] = None) -> None:
+        """
+        Load the data file plus the change log (shared file storage; both locks held).
+        
+        Args:
+            data: The data file as read by _read_data_file before the locks
+                were taken (None to read it now)
+        """
+        base, records = self._changes.read(from_start=True)
+        if data is not None and base is not None and base != data[3]:
+            data = None  # Another process rewrote the data file since it was read
+        if data is None and self.storage_path.exists():
+            data = self._read_data_file()
+        self._next_id, self._question_map, self._voters, self._version = (
+            data or (0, {}, VoterIndex(), 0))
+        self._rebuild_indexes()
+        
+        if base is None:
+            self._changes.reset(self._version)  # First shared use of this data file
+        for record in records:
+            if record["version"] > self._version:  # Else already in the data file
+                self._apply_change(record)
+    
+    def _catch_up(self) -> None:
+        """
+        Apply the changes other processes made to the shared data file (lock held).
+        
+        Costs one stat() when there are none. Otherwise only the new change
+        records are read, unless another process restarted the change log
+        before this one read all of it, which means a full reload.
+        """
+        if not self._changes.changed():
+            return
+        with self._file_lock:
+            base, records = self._changes.read()
+            if base is not None and base != self._version:
+                self._load_shared()
+                return
+            for record in records:
+                self._apply_change(record)
+    
+    def _apply_change(self, record: Dict) -> None:
+        """
+        Apply a change record written by another process.
+        
+        Args:
+            record: Change record, as written by _persist
+        """
+        op = record["op"]
+        self._version = record["version"]
+        if op == "add":
+            self._insert_question(QuestionRecord.from_serialized(record["question"]))
+            return
+        if op == "clear":
+            self._clear_store()
+            return
+        
+        question_id = record["id"]
+        question = self._question_map.get(question_id)
+        if question is None:
+            return
+        if op == "delete":
+            self._remove_question(question_id)
+            return
+        
+        self._stamp(question, record["version"])
+        user_id = record.get("user")
+        if op == "vote":
+            # Untracked votes (no user) always count
+            if user_id is None or self._voters.add(question_id, user_id):
+                self._change_votes(question_id, 1)
+        elif op == "unvote":
+            if self._voters.discard(question_id, user_id):
+                self._change_votes(question_id, -1)
+        elif op == "highlight":
+            question["highlighted"] = record["highlighted"]
+        elif op == "status":
+            self._set_status(question, record["status"])
+    
+    def close(self) -> None:
+        """
+        Flush buffered changes and release storage resources.
+        
+        Waits for the write-behind flusher and any background compaction.
+        """
+        self._wait_until_loaded()
+        with self._lock:
+            self._closing = True
+            self._flush_wakeup.notify_all()
+        if self._flusher is not None:
+            self._flusher.join()
+            self._flusher = None
+        
+        with self._lock:
+            self.flush()
+            if self._journal is not None:
+                self._journal.close()
+            if self._db is not None:
+                self._db.close()
@@ -0,0 +1,384 @@
+"""
+HTTP/JSON API for the Marshmallows anonymous questions app.
+
+A headless alternative to the Streamlit interface, built on the standard
+library's ThreadingHTTPServer. Each request is one manager call, not a
+rerun of a whole script. Connections are kept alive (HTTP/1.1), listings
+are paged with the manager's cursors, and GET responses carry an ETag, so
+a client polling with If-None-Match gets a bodiless 304 when nothing
+changed.
+
+Endpoints (JSON bodies, ``X-User-Id`` header identifies the caller, else
+its IP address):
+
+    GET    /questions?sort=newest|votes&status=&limit=&cursor=   one page
+    GET    /questions?q=text&status=&limit=                      search
+    GET    /questions/<id>
+    GET    /questions/random
+    GET    /questions/count?status=
+    GET    /changes?since=<version>   questions added, updated and deleted since
+    POST   /questions                {"text": ...}
+    POST   /questions/<id>/vote
+    DELETE /questions/<id>/vote      take the vote back
+    PATCH  /questions/<id>           {"status": ..., "highlighted": ...}  (admin)
+    DELETE /questions/<id>                                                (admin)
+
+Admin requests need the admin password in the ``X-Admin-Password`` header.
+Submitter user IDs are never included in responses.
+"""
+
+import hashlib
+import hmac
+import json
+import math
+import re
+import threading
+from collections import OrderedDict
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from .core import MarshmallowManager, UserSession
+from .ratelimit import RateLimiter, RateLimitExceeded
+from .storage import serialize_question
+
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8000
+DEFAULT_PAGE_LIMIT = 20
+MAX_PAGE_LIMIT = 100
+MAX_BODY_BYTES = 64 * 1024
+IDLE_TIMEOUT_S = 30  # Keep-alive connections idle this long are closed
+# Random-pick sessions kept, least recently used dropped first. Sessions share
+# the manager's pool, so each costs about 600 bytes plus the IDs it has viewed
+MAX_SESSIONS = 10_000
+
+
+class APIError(Exception):
+    """An error response: HTTP status plus a message for the JSON body."""
+
+    def __init__(self, status: HTTPStatus, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def public_question(question: Dict) -> Dict:
+    """
+    Convert a question into its API representation.
+
+    Args:
+        question: Question dictionary or record
+
+    Returns:
+        JSON-serializable dict without the submitter's user ID
+    """
+    data = serialize_question(question)
+    data.pop("user_id", None)
+    return data
+
+
+class MarshmallowServer(ThreadingHTTPServer):
+    """HTTP server holding the manager shared by all connections."""
+
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], manager: MarshmallowManager,
+                 admin_password: str = "instructor"):
+        """
+        Initialize the server and bind it.
+
+        Args:
+            address: (host, port) to listen on (port 0 picks a free port)
+            manager: Manager serving every request
+            admin_password: Password expected in X-Admin-Password for admin requests
+        """
+        super().__init__(address, MarshmallowRequestHandler)
+        self.manager = manager
+        self.admin_password = admin_password
+        # User ID -> session, so each user's random picks skip what they've seen
+        self._sessions: "OrderedDict[str, UserSession]" = OrderedDict()
+        self._sessions_lock = threading.Lock()
+
+    def session_for(self, user_id: str) -> UserSession:
+        """Get the random-pick session of a user, creating it on first use."""
+        with self._sessions_lock:
+            session = self._sessions.get(user_id)
+            if session is None:
+                session = self._sessions[user_id] = self.manager.create_session(user_id)
+                if len(self._sessions) > MAX_SESSIONS:
+                    self._sessions.popitem(last=False)
+            else:
+                self._sessions.move_to_end(user_id)
+            return session
+
+
+class MarshmallowRequestHandler(BaseHTTPRequestHandler):
+    """Routes each request to a manager call and writes the JSON response."""
+
+    protocol_version = "HTTP/1.1"  # Keep-alive by default
+    timeout = IDLE_TIMEOUT_S
+    server: MarshmallowServer
+
+    # (method, path pattern, handler method name), tried in order
+    ROUTES: List[Tuple[str, "re.Pattern", str]] = [
+        ("GET", re.compile(r"/questions"), "list_questions"),
+        ("GET", re.compile(r"/questions/random"), "random_question"),
+        ("GET", re.compile(r"/questions/count"), "count_questions"),
+        ("GET", re.compile(r"/questions/(\d+)"), "get_question"),
+        ("GET", re.compile(r"/changes"), "changes"),
+        ("POST", re.compile(r"/questions"), "add_question"),
+        ("POST", re.compile(r"/questions/(\d+)/vote"), "vote"),
+        ("DELETE", re.compile(r"/questions/(\d+)/vote"), "unvote"),
+        ("PATCH", re.compile(r"/questions/(\d+)"), "update_question"),
+        ("DELETE", re.compile(r"/questions/(\d+)"), "delete_question"),
+    ]
+
+    # GET routes whose every call changes state (a random pick uses up a
+    # question for the session), so they never get an ETag or a 304
+    UNCACHEABLE = {"random_question"}
+
+    def do_GET(self) -> None:
+        self._dispatch("GET")
+
+    def do_POST(self) -> None:
+        self._dispatch("POST")
+
+    def do_PATCH(self) -> None:
+        self._dispatch("PATCH")
+
+    def do_PUT(self) -> None:
+        self._dispatch("PUT")  # No PUT routes, but answer 405 in JSON
+
+    def do_DELETE(self) -> None:
+        self._dispatch("DELETE")
+
+    def log_message(self, format: str, *args: Any) -> None:
+        """Keep the console quiet; access logs would dominate under load."""
+
+    def _dispatch(self, method: str) -> None:
+        """Find the route for the request, run it and send the response."""
+        url = urlsplit(self.path)
+        self.query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        try:
+            body = self._read_body()
+            allowed = []
+            for route_method, pattern, name in self.ROUTES:
+                match = pattern.fullmatch(url.path)
+                if match is None:
+                    continue
+                if route_method != method:
+                    allowed.append(route_method)
+                    continue
+                status, payload = getattr(self, name)(*match.groups(), body=body)
+                self._send_json(status, payload,
+                                cacheable=(method == "GET" and name not in self.UNCACHEABLE))
+                return
+            if allowed:
+                raise APIError(HTTPStatus.METHOD_NOT_ALLOWED, f"Use {', '.join(allowed)}")
+            raise APIError(HTTPStatus.NOT_FOUND, "No such endpoint")
+        except APIError as e:
+            self._send_json(e.status, {"error": e.message})
+        except RateLimitExceeded as e:
+            self._send_json(HTTPStatus.TOO_MANY_REQUESTS, {"error": str(e)},
+                            headers={"Retry-After": str(math.ceil(e.retry_after))})
+        except ValueError as e:
+            self._send_json(HTTPStatus.BAD_REQUEST, {"error": str(e)})
+        except Exception:
+            self.close_connection = True
+            self._send_json(HTTPStatus.INTERNAL_SERVER_ERROR, {"error": "Internal server error"})
+            raise  # Let the server report it
+
+    def _read_body(self) -> Dict:
+        """Read and parse the JSON request body ({} if there is none)."""
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            self.close_connection = True  # Where the body ends is unknown
+            raise APIError(HTTPStatus.BAD_REQUEST, "Invalid Content-Length")
+        if length > MAX_BODY_BYTES:
+            self.close_connection = True  # The unread body would be taken for the next request
+            raise APIError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "Request body too large")
+        if not length:
+            return {}
+        try:
+            body = json.loads(self.rfile.read(length))
+        except (UnicodeDecodeError, json.JSONDecodeError):
+            raise APIError(HTTPStatus.BAD_REQUEST, "Request body must be JSON")
+        if not isinstance(body, dict):
+            raise APIError(HTTPStatus.BAD_REQUEST, "Request body must be a JSON object")
+        return body
+
+    def _send_json(self, status: HTTPStatus, payload: Any, cacheable: bool = False,
+                   headers: Optional[Dict[str, str]] = None) -> None:
+        """
+        Send a JSON response, or 304 Not Modified if the client's copy is current.
+
+        Args:
+            status: Response status
+            payload: JSON-serializable body
+            cacheable: Whether to send an ETag and honor If-None-Match
+            headers: Extra response headers
+        """
+        data = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+        etag = None
+        if cacheable and status == HTTPStatus.OK:
+            etag = '"' + hashlib.blake2b(data, digest_size=12).hexdigest() + '"'
+            if etag in re.split(r"\s*,\s*", self.headers.get("If-None-Match", "")):
+                status, data = HTTPStatus.NOT_MODIFIED, b""
+
+        self.send_response(status)
+        if etag is not None:
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", "no-cache")  # Always revalidate
+        if status != HTTPStatus.NOT_MODIFIED:
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+        if self.close_connection:
+            self.send_header("Connection", "close")
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    @property
+    def user_id(self) -> str:
+        """
+        The caller's user ID from the X-User-Id header.
+
+        Without one the client's IP address stands in, so callers without
+        the header don't all share one vote and one rate-limit bucket.
+        """
+        return self.headers.get("X-User-Id") or self.client_address[0]
+
+    def _require_admin(self) -> None:
+        """Refuse the request unless it carries the admin password."""
+        password = self.headers.get("X-Admin-Password", "")
+        if not hmac.compare_digest(password.encode(), self.server.admin_password.encode()):
+            raise APIError(HTTPStatus.FORBIDDEN, "Admin password required")
+
+    def _limit(self) -> int:
+        """The page size from the ``limit`` query parameter."""
+        try:
+            limit = int(self.query.get("limit", DEFAULT_PAGE_LIMIT))
+        except ValueError:
+            raise APIError(HTTPStatus.BAD_REQUEST, "limit must be a number")
+        if not 1 <= limit <= MAX_PAGE_LIMIT:
+            raise APIError(HTTPStatus.BAD_REQUEST, f"limit must be between 1 and {MAX_PAGE_LIMIT}")
+        return limit
+
+    def _question(self, question_id: str) -> Dict:
+        """Get a question or fail with 404."""
+        question = self.server.manager.get_question_by_id(int(question_id))
+        if question is None:
+            raise APIError(HTTPStatus.NOT_FOUND, f"No question {question_id}")
+        return question
+
+    # Route handlers: each returns (status, JSON payload)
+
+    def list_questions(self, body: Dict) -> Tuple[HTTPStatus, Dict]:
+        manager = self.server.manager
+        status = self.query.get("status") or None
+        if "q" in self.query:
+            questions = manager.search_questions(self.query["q"], status, self._limit())
+            return HTTPStatus.OK, {"questions": [public_question(q) for q in questions]}
+        questions, cursor = manager.get_questions_page(
+            self.query.get("sort", "newest"), status, self._limit(), self.query.get("cursor")
+        )
+        return HTTPStatus.OK, {"questions": [public_question(q) for q in questions],
+                               "next_cursor": cursor}
+
+    def random_question(self, body: Dict) -> Tuple[HTTPStatus, Dict]:
+        question = self.server.manager.get_random_question(self.server.session_for(self.user_id))
+        return HTTPStatus.OK, {"question": public_question(question) if question else None}
+
+    def count_questions(self, body: Dict) -> Tuple[HTTPStatus, Dict]:
+        count = self.server.manager.count_questions(self.query.get("status") or None)
+        return HTTPStatus.OK, {"count": count}
+
+    def get_question(self, question_id: str, body: Dict) -> Tuple[HTTPStatus, Dict]:
+        question = self._question(question_id)
+        data = public_question(question)
+        data["voted"] = self.server.manager.has_voted(question["id"], self.user_id)
+        return HTTPStatus.OK, data
+
+    def changes(self, body: Dict) -> Tuple[HTTPStatus, Dict]:
+        try:
+            since = int(self.query.get("since", 0))
+        except ValueError:
+            raise APIError(HTTPStatus.BAD_REQUEST, "since must be a number")
+        changes = self.server.manager.changes_since(since)
+        for key in ("added", "updated"):
+            changes[key] = [public_question(q) for q in changes[key]]
+        return HTTPStatus.OK, changes
+
+    def add_question(self, body: Dict) -> Tuple[HTTPStatus, Dict]:
+        text = body.get("text")
+        if not isinstance(text, str) or not text.strip():
+            raise APIError(HTTPStatus.BAD_REQUEST, "text must be a non-empty string")
+        # Like the GUIs, a reworded copy of an approved question becomes a
+        # vote for it (found and applied in one call, charged as an add)
+        merged = []
+        self.server.manager.add_question(text, user_id=self.user_id, on_duplicate="merge",
+                                         on_merge=merged.append)
+        if merged:
+            return HTTPStatus.OK, {"merged_into": public_question(merged[0])}
+        return HTTPStatus.CREATED, {"added": True}
+
+    def vote(self, question_id: str, body: Dict) -> Tuple[HTTPStatus, Dict]:
+        self._question(question_id)
+        voted = self.server.manager.vote_for_question(int(question_id), self.user_id)
+        return HTTPStatus.OK, {"voted": voted}
+
+    def unvote(self, question_id: str, body: Dict) -> Tuple[HTTPStatus, Dict]:
+        self._question(question_id)
+        removed = self.server.manager.unvote_question(int(question_id), self.user_id)
+        return HTTPStatus.OK, {"removed": removed}
+
+    def update_question(self, question_id: str, body: Dict) -> Tuple[HTTPStatus, Dict]:
+        self._require_admin()
+        self._question(question_id)
+        manager = self.server.manager
+        if "status" in body:
+            if body["status"] not in ("approved", "pending"):
+                raise APIError(HTTPStatus.BAD_REQUEST, "status must be approved or pending")
+            manager.set_question_status(int(question_id), body["status"])
+        if "highlighted" in body:
+            manager.highlight_question(int(question_id), bool(body["highlighted"]))
+        return HTTPStatus.OK, public_question(self._question(question_id))
+
+    def delete_question(self, question_id: str, body: Dict) -> Tuple[HTTPStatus, Dict]:
+        self._require_admin()
+        if not self.server.manager.delete_question(int(question_id)):
+            raise APIError(HTTPStatus.NOT_FOUND, f"No question {question_id}")
+        return HTTPStatus.OK, {"deleted": True}
+
+
+def run_http_server(storage_type: str = "file", host: str = DEFAULT_HOST,
+                    port: int = DEFAULT_PORT, admin_password: str = "instructor") -> None:
+    """
+    Run the HTTP/JSON API server until interrupted.
+
+    File storage is shared with other processes, and submissions and votes
+    are rate limited per user, as in the Streamlit app.
+
+    Args:
+        storage_type: Type of storage to use (defaults to "file" for persistence)
+        host: Interface to listen on
+        port: Port to listen on
+        admin_password: Password for the admin endpoints
+    """
+    manager = MarshmallowManager(storage_type=storage_type, shared=True,
+                                 rate_limiter=RateLimiter())
+    server = MarshmallowServer((host, port), manager, admin_password)
+    print(f"Marshmallows API listening on http://{host}:{server.server_address[1]}/questions")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nExiting Marshmallows. Goodbye!")
+    finally:
+        server.server_close()
+        manager.close()
@@ -0,0 +1,335 @@
+"""
+In-memory index structures for the Marshmallows anonymous questions app.
+
+These are kept up to date as questions change, so reads don't have to sort
+or scan the whole question list.
+"""
+
+import random
+from bisect import bisect_left, bisect_right, insort
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterable, Iterator, List, Optional, Tuple
+
+
+class SortedIndex:
+    """
+    Sorted collection of comparable keys with cheap insert and remove.
+
+    Keys are kept in a list of small sorted blocks. Finding a key is a binary
+    search over the block maxima followed by one inside the block, and an
+    insert or remove only shifts elements within a single block, so updates
+    stay close to O(log n) even with hundreds of thousands of keys.
+    """
+
+    BLOCK_SIZE = 512  # Blocks are split once they reach twice this size
+
+    def __init__(self, keys: Iterable[Any] = ()):
+        """
+        Initialize the index.
+
+        Args:
+            keys: Initial keys (in any order)
+        """
+        self._blocks: List[List[Any]] = []
+        self._maxes: List[Any] = []
+        self._len = 0
+        self.update(keys)
+
+    def update(self, keys: Iterable[Any]) -> None:
+        """
+        Add several keys at once, rebuilding the blocks in one sort.
+
+        Args:
+            keys: Keys to add (in any order)
+        """
+        all_keys = sorted(list(self) + list(keys))
+        size = self.BLOCK_SIZE
+        self._blocks = [all_keys[i:i + size] for i in range(0, len(all_keys), size)]
+        self._maxes = [block[-1] for block in self._blocks]
+        self._len = len(all_keys)
+
+    def add(self, key: Any) -> None:
+        """
+        Insert a key.
+
+        Args:
+            key: Key to insert
+        """
+        if not self._blocks:
+            self._blocks.append([key])
+            self._maxes.append(key)
+            self._len = 1
+            return
+
+        pos = bisect_left(self._maxes, key)
+        if pos == len(self._maxes):
+            # Larger than everything: append to the last block
+            pos -= 1
+            self._blocks[pos].append(key)
+            self._maxes[pos] = key
+        else:
+            insort(self._blocks[pos], key)
+        self._len += 1
+
+        if len(self._blocks[pos]) >= 2 * self.BLOCK_SIZE:
+            block = self._blocks[pos]
+            self._blocks[pos:pos + 1] = [block[:self.BLOCK_SIZE], block[self.BLOCK_SIZE:]]
+            self._maxes[pos:pos + 1] = [block[self.BLOCK_SIZE - 1], block[-1]]
+
+    def remove(self, key: Any) -> None:
+        """
+        Remove a key.
+
+        Args:
+            key: Key to remove
+
+        Raises:
+            KeyError: If the key is not in the index
+        """
+        pos = bisect_left(self._maxes, key)
+        if pos == len(self._maxes):
+            raise KeyError(key)
+        block = self._blocks[pos]
+        i = bisect_left(block, key)
+        if i == len(block) or block[i] != key:
+            raise KeyError(key)
+
+        del block[i]
+        self._len -= 1
+        if not block:
+            del self._blocks[pos]
+            del self._maxes[pos]
+        elif i == len(block):
+            self._maxes[pos] = block[-1]
+
+    def discard(self, key: Any) -> None:
+        """
+        Remove a key if present.
+
+        Args:
+            key: Key to remove
+        """
+        try:
+            self.remove(key)
+        except KeyError:
+            pass
+
+    def irange(self, minimum: Any = None, maximum: Any = None,
+               inclusive: Tuple[bool, bool] = (True, True)) -> Iterator[Any]:
+        """
+        Iterate over the keys between two bounds, in order.
+
+        Finding the first key costs O(log n); after that each key is O(1), so
+        reading a page of k keys is O(log n + k).
+
+        Args:
+            minimum: Lower bound (None to start at the smallest key)
+            maximum: Upper bound (None to run to the largest key)
+            inclusive: Whether each bound itself is included
+
+        Returns:
+            Iterator over the matching keys
+        """
+        if minimum is None:
+            pos, i = 0, 0
+        else:
+            find = bisect_left if inclusive[0] else bisect_right
+            pos = find(self._maxes, minimum)
+            i = find(self._blocks[pos], minimum) if pos < len(self._blocks) else 0
+        while pos < len(self._blocks):
+            block = self._blocks[pos]
+            while i < len(block):
+                key = block[i]
+                if maximum is not None and (key > maximum or (key == maximum and not inclusive[1])):
+                    return
+                yield key
+                i += 1
+            pos += 1
+            i = 0
+
+    def clear(self) -> None:
+        """Remove all keys."""
+        self._blocks = []
+        self._maxes = []
+        self._len = 0
+
+    def __contains__(self, key: Any) -> bool:
+        pos = bisect_left(self._maxes, key)
+        if pos == len(self._maxes):
+            return False
+        block = self._blocks[pos]
+        i = bisect_right(block, key) - 1
+        return i >= 0 and block[i] == key
+
+    def __iter__(self) -> Iterator[Any]:
+        for block in self._blocks:
+            yield from block
+
+    def __len__(self) -> int:
+        return self._len
+
+
+class RandomPool:
+    """
+    Set of hashable items supporting O(1) add, remove and random choice.
+
+    Items are kept in a list for random access plus a dict of each item's
+    position. Removing an item moves the last item into its slot, so nothing
+    is ever shifted.
+    """
+
+    def __init__(self, items: Iterable[Hashable] = ()):
+        """
+        Initialize the pool.
+
+        Args:
+            items: Initial items
+        """
+        self._items: List[Hashable] = []
+        self._positions: Dict[Hashable, int] = {}
+        for item in items:
+            self.add(item)
+
+    def add(self, item: Hashable) -> None:
+        """
+        Add an item (no-op if already present).
+
+        Args:
+            item: Item to add
+        """
+        if item not in self._positions:
+            self._positions[item] = len(self._items)
+            self._items.append(item)
+
+    def discard(self, item: Hashable) -> None:
+        """
+        Remove an item if present.
+
+        Args:
+            item: Item to remove
+        """
+        pos = self._positions.pop(item, None)
+        if pos is None:
+            return
+        last = self._items.pop()
+        if pos < len(self._items):
+            # Swap the last item into the freed slot
+            self._items[pos] = last
+            self._positions[last] = pos
+
+    def choice(self, rng: Optional[random.Random] = None) -> Hashable:
+        """
+        Pick a random item without removing it.
+
+        Args:
+            rng: Random number generator to use (module-level random if None)
+
+        Returns:
+            A uniformly chosen item
+
+        Raises:
+            IndexError: If the pool is empty
+        """
+        return (rng or random).choice(self._items)
+
+    def clear(self) -> None:
+        """Remove all items."""
+        self._items = []
+        self._positions = {}
+
+    def __contains__(self, item: Hashable) -> bool:
+        return item in self._positions
+
+    def __iter__(self) -> Iterator[Hashable]:
+        return iter(self._items)
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+class ChangeIndex:
+    """
+    Which questions changed after a given change version, for delta sync.
+
+    Each question changed since the index was started has one entry: the
+    version of its last change, the version it was added at and whether it
+    was deleted. Entries are kept in version order, so listing the changes
+    since version v only walks the entries newer than v. Deleted questions
+    leave a tombstone; past max_tombstones the oldest entries are dropped and
+    ``floor`` rises past them. Changes at or before ``floor`` are unknown.
+    """
+
+    DEFAULT_MAX_TOMBSTONES = 10_000
+
+    def __init__(self, floor: int = 0, max_tombstones: int = DEFAULT_MAX_TOMBSTONES):
+        """
+        Initialize the index.
+
+        Args:
+            floor: Change version the index starts at
+            max_tombstones: Most deleted questions to remember
+        """
+        self.floor = floor
+        self.max_tombstones = max_tombstones
+        # Question ID -> (last change version, version added at, deleted),
+        # oldest change first; questions added before the floor have 0
+        self._entries: "OrderedDict[int, Tuple[int, int, bool]]" = OrderedDict()
+        self._tombstones = 0
+
+    def add(self, question_id: int, version: int) -> None:
+        """Record that a question was added at a change version."""
+        self._set(question_id, version, version, False)
+
+    def update(self, question_id: int, version: int) -> None:
+        """Record that a question was changed at a change version."""
+        entry = self._entries.get(question_id)
+        self._set(question_id, version, entry[1] if entry else 0, False)
+
+    def delete(self, question_id: int, version: int) -> None:
+        """Record that a question was deleted at a change version."""
+        entry = self._entries.get(question_id)
+        self._set(question_id, version, entry[1] if entry else 0, True)
+        self._tombstones += 1
+        while self._tombstones > self.max_tombstones:
+            _, (dropped, _, deleted) = self._entries.popitem(last=False)
+            self.floor = max(self.floor, dropped)
+            self._tombstones -= deleted
+
+    def _set(self, question_id: int, version: int, added: int, deleted: bool) -> None:
+        """Store a question's entry as the newest one."""
+        old = self._entries.pop(question_id, None)
+        if old is not None and old[2]:
+            self._tombstones -= 1  # An ID reused after a delete
+        self._entries[question_id] = (version, added, deleted)
+
+    def since(self, version: int) -> Optional[Tuple[List[int], List[int], List[int]]]:
+        """
+        List the questions that changed after a change version.
+
+        Args:
+            version: Change version the caller is up to date with
+
+        Returns:
+            Tuple of (IDs added, IDs of older questions changed, IDs of older
+            questions deleted), each oldest change first, or None if changes
+            that old are no longer known. Questions added and deleted since
+            the version aren't listed at all.
+        """
+        if version < self.floor:
+            return None
+        added, updated, deleted = [], [], []
+        for question_id in reversed(self._entries):
+            last, added_at, is_deleted = self._entries[question_id]
+            if last <= version:
+                break
+            if added_at > version:
+                if not is_deleted:
+                    added.append(question_id)
+            elif is_deleted:
+                deleted.append(question_id)
+            else:
+                updated.append(question_id)
+        return added[::-1], updated[::-1], deleted[::-1]
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,269 @@
+"""
+Operation metrics for the Marshmallows anonymous questions app.
+
+A MarshmallowManager given a Metrics object reports how long each operation
+takes and how many bytes it writes to disk. Metrics passes these events on
+to pluggable sinks: InMemorySink keeps per-operation counters and latency
+histograms for live percentiles, and JSONLinesSink appends every event to a
+file for later analysis.
+"""
+
+import json
+import threading
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Union
+
+
+# Upper bounds (in ms) of the latency histogram buckets: 1 microsecond to
+# about a minute, each bucket 25% wider than the last, so percentiles are
+# accurate to within 25% at any scale.
+LATENCY_BUCKETS_MS = [0.001 * 1.25 ** i for i in range(80)]
+
+PERCENTILES = (50, 90, 99)
+
+
+class LatencyHistogram:
+    """Log-scale histogram of operation latencies."""
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS_MS) + 1)  # Last bucket: overflow
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def add(self, ms: float) -> None:
+        """
+        Record one latency.
+
+        Args:
+            ms: Latency in milliseconds
+        """
+        self.counts[bisect_left(LATENCY_BUCKETS_MS, ms)] += 1
+        self.count += 1
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+
+    def percentile(self, p: float) -> float:
+        """
+        Estimate a latency percentile.
+
+        Args:
+            p: Percentile between 0 and 100
+
+        Returns:
+            Upper bound (in ms) of the bucket holding the percentile, capped
+            at the largest latency seen (0.0 if nothing was recorded)
+        """
+        if not self.count:
+            return 0.0
+        rank = max(1, round(self.count * p / 100))
+        seen = 0
+        for i, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= rank:
+                bound = LATENCY_BUCKETS_MS[i] if i < len(LATENCY_BUCKETS_MS) else self.max_ms
+                return min(bound, self.max_ms)
+        return self.max_ms
+
+
+class OperationStats:
+    """Counters and latency histogram of one operation."""
+
+    def __init__(self):
+        self.latency = LatencyHistogram()
+        self.bytes_written = 0
+        self.writes = 0
+        self.throttled = 0
+
+    def summary(self) -> Dict:
+        """Return the stats as a JSON-serializable dict."""
+        summary = {"count": self.latency.count}
+        if self.latency.count:
+            summary["mean_ms"] = self.latency.total_ms / self.latency.count
+            for p in PERCENTILES:
+                summary[f"p{p}_ms"] = self.latency.percentile(p)
+            summary["max_ms"] = self.latency.max_ms
+        if self.writes:
+            summary["writes"] = self.writes
+            summary["bytes_written"] = self.bytes_written
+        if self.throttled:
+            summary["throttled"] = self.throttled
+        return summary
+
+
+class MetricsSink(ABC):
+    """
+    Destination for metrics events.
+
+    Events are dicts with the time (``ts``), the operation name (``op``) and
+    either a latency (``ms``), a number of bytes written (``bytes``) or
+    ``"throttled": true`` for a call refused by rate limiting. Subclasses
+    must implement emit().
+    """
+
+    @abstractmethod
+    def emit(self, event: Dict) -> None:
+        """
+        Handle one event. Called from whichever thread ran the operation.
+
+        Args:
+            event: The metrics event
+        """
+
+    def close(self) -> None:
+        """Release any resources held by the sink."""
+
+
+class InMemorySink(MetricsSink):
+    """Sink that aggregates events into per-operation stats."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._operations: Dict[str, OperationStats] = {}
+
+    def emit(self, event: Dict) -> None:
+        with self._lock:
+            stats = self._operations.get(event["op"])
+            if stats is None:
+                stats = self._operations[event["op"]] = OperationStats()
+            if "ms" in event:
+                stats.latency.add(event["ms"])
+            if "bytes" in event:
+                stats.writes += 1
+                stats.bytes_written += event["bytes"]
+            if event.get("throttled"):
+                stats.throttled += 1
+
+    def summary(self) -> Dict[str, Dict]:
+        """
+        Get the stats of every operation seen so far.
+
+        Returns:
+            Dict of operation name -> stats (count, mean/percentile/max
+            latency in ms, and writes and bytes written where applicable)
+        """
+        with self._lock:
+            return {op: stats.summary() for op, stats in sorted(self._operations.items())}
+
+    def reset(self) -> None:
+        """Forget all recorded stats."""
+        with self._lock:
+            self._operations = {}
+
+
+class JSONLinesSink(MetricsSink):
+    """Sink that appends each event to a file as one line of JSON."""
+
+    def __init__(self, path: Union[str, Path]):
+        """
+        Open the file for appending.
+
+        Args:
+            path: Path of the JSON-lines file
+        """
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._file = open(self.path, "a", buffering=1)  # Line buffered
+
+    def emit(self, event: Dict) -> None:
+        line = json.dumps(event) + "\n"
+        with self._lock:
+            if not self._file.closed:
+                self._file.write(line)
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+
+def summary_table(summary: Dict[str, Dict]) -> List[Dict[str, str]]:
+    """
+    Format a metrics summary as display rows.
+
+    Args:
+        summary: Summary from Metrics.summary()
+
+    Returns:
+        One dict per operation, mapping column headers to formatted values
+    """
+    rows = []
+    for op, stats in summary.items():
+        row = {"Operation": op, "Calls": str(stats["count"])}
+        for p in PERCENTILES:
+            row[f"p{p} ms"] = f"{stats[f'p{p}_ms']:.3f}" if stats["count"] else "-"
+        row["Max ms"] = f"{stats['max_ms']:.3f}" if stats["count"] else "-"
+        row["Bytes written"] = f"{stats.get('bytes_written', 0):,}"
+        row["Throttled"] = str(stats.get("throttled", 0))
+        rows.append(row)
+    return rows
+
+
+class Metrics:
+    """
+    Collects operation timings and write sizes and forwards them to sinks.
+
+    A manager without a Metrics object skips all of this, so instrumentation
+    costs a single attribute check when disabled.
+    """
+
+    def __init__(self, sinks: Optional[Iterable[MetricsSink]] = None):
+        """
+        Initialize the collector.
+
+        Args:
+            sinks: Where to send events (a single InMemorySink if None)
+        """
+        self.sinks: List[MetricsSink] = list(sinks) if sinks is not None else [InMemorySink()]
+
+    def record_latency(self, operation: str, seconds: float) -> None:
+        """
+        Record how long one call of an operation took.
+
+        Args:
+            operation: Operation name (e.g. "add_question")
+            seconds: Duration in seconds
+        """
+        self._emit({"ts": time.time(), "op": operation, "ms": seconds * 1000})
+
+    def record_bytes(self, operation: str, count: int) -> None:
+        """
+        Record bytes written to disk by an operation.
+
+        Args:
+            operation: Operation name (e.g. "save_questions")
+            count: Number of bytes written
+        """
+        self._emit({"ts": time.time(), "op": operation, "bytes": count})
+
+    def record_throttled(self, operation: str) -> None:
+        """
+        Record a call of an operation refused by rate limiting.
+
+        Args:
+            operation: Operation name (e.g. "vote_for_question")
+        """
+        self._emit({"ts": time.time(), "op": operation, "throttled": True})
+
+    def summary(self) -> Dict[str, Dict]:
+        """
+        Get per-operation stats from the first in-memory sink.
+
+        Returns:
+            Dict of operation name -> stats, empty if there is no InMemorySink
+        """
+        for sink in self.sinks:
+            if isinstance(sink, InMemorySink):
+                return sink.summary()
+        return {}
+
+    def close(self) -> None:
+        """Close all sinks."""
+        for sink in self.sinks:
+            sink.close()
+
+    def _emit(self, event: Dict) -> None:
+        for sink in self.sinks:
+            sink.emit(event)
@@ -0,0 +1,157 @@
+"""
+Rate limiting for the Marshmallows anonymous questions app.
+
+A MarshmallowManager given a RateLimiter checks each submission and vote
+against two token buckets: one for the user and one shared by everybody.
+A bucket holds up to ``burst`` tokens and refills at ``rate`` tokens per
+second; an operation takes one token, and is refused with RateLimitExceeded
+when either bucket is empty. A refused operation does nothing, so a flood of
+clicks can't turn into a flood of disk writes.
+
+Buckets are refilled lazily from their last-use time, so each one is two
+numbers and checking it is O(1). A user's bucket that has been idle long
+enough to refill completely is the same as a new one and is dropped.
+"""
+
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Mapping, NamedTuple, Optional, Tuple
+
+
+class Limit(NamedTuple):
+    """Refill rate and capacity of a token bucket."""
+
+    rate: float  # Tokens added per second
+    burst: float  # Most tokens the bucket holds
+
+
+# Operation -> (per-user limit, global limit)
+DEFAULT_LIMITS: Dict[str, Tuple[Limit, Limit]] = {
+    "add": (Limit(rate=0.2, burst=5), Limit(rate=20, burst=100)),
+    "vote": (Limit(rate=1, burst=10), Limit(rate=100, burst=500)),
+}
+
+
+class RateLimitExceeded(Exception):
+    """Raised when an operation is refused because a token bucket is empty."""
+
+    def __init__(self, operation: str, retry_after: float, scope: str):
+        """
+        Initialize the exception.
+
+        Args:
+            operation: The refused operation ("add" or "vote")
+            retry_after: Seconds until a token is available
+            scope: "user" if the user's bucket is empty, "global" if the
+                shared one is
+        """
+        self.operation = operation
+        self.retry_after = retry_after
+        self.scope = scope
+        who = "You are" if scope == "user" else "Everyone is"
+        super().__init__(f"{who} doing that too often; try again in {math.ceil(retry_after)} s")
+
+
+class TokenBucket:
+    """Token count as of a point in time; the Limit lives with the caller."""
+
+    __slots__ = ("tokens", "updated")
+
+    def __init__(self, tokens: float, updated: float):
+        self.tokens = tokens
+        self.updated = updated
+
+    def refill(self, limit: Limit, now: float) -> None:
+        """Add the tokens earned since the last update."""
+        self.tokens = min(limit.burst, self.tokens + (now - self.updated) * limit.rate)
+        self.updated = now
+
+    def wait_time(self, limit: Limit) -> float:
+        """Seconds until the bucket holds a whole token (0.0 if it does)."""
+        return max(0.0, (1 - self.tokens) / limit.rate)
+
+
+class RateLimiter:
+    """
+    Per-user and global token buckets for each operation.
+
+    Thread-safe, so one limiter can be shared by several managers.
+    """
+
+    def __init__(self, limits: Optional[Mapping[str, Tuple[Limit, Limit]]] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Initialize the limiter.
+
+        Args:
+            limits: Operation -> (per-user limit, global limit); operations
+                not listed are never limited (defaults to DEFAULT_LIMITS)
+            clock: Source of the current time in seconds
+        """
+        self.limits = dict(DEFAULT_LIMITS if limits is None else limits)
+        self._clock = clock
+        # Per operation: user ID -> bucket, least recently used first
+        self._users: Dict[str, "OrderedDict[str, TokenBucket]"] = {
+            operation: OrderedDict() for operation in self.limits
+        }
+        now = clock()
+        self._global = {
+            operation: TokenBucket(global_limit.burst, now)
+            for operation, (_, global_limit) in self.limits.items()
+        }
+        self._lock = threading.Lock()
+
+    def acquire(self, operation: str, user_id: str) -> None:
+        """
+        Take a token for an operation from the user's and the global bucket.
+
+        Nothing is taken unless both buckets have a token.
+
+        Args:
+            operation: Operation name ("add" or "vote")
+            user_id: User identifier of the caller
+
+        Raises:
+            RateLimitExceeded: If either bucket is empty
+        """
+        limits = self.limits.get(operation)
+        if limits is None:
+            return
+        user_limit, global_limit = limits
+        with self._lock:
+            now = self._clock()
+            users = self._users[operation]
+            self._expire(users, user_limit, now)
+
+            user_bucket = users.get(user_id)
+            if user_bucket is None:
+                user_bucket = users[user_id] = TokenBucket(user_limit.burst, now)
+            else:
+                users.move_to_end(user_id)
+                user_bucket.refill(user_limit, now)
+            global_bucket = self._global[operation]
+            global_bucket.refill(global_limit, now)
+
+            if user_bucket.tokens < 1:
+                raise RateLimitExceeded(operation, user_bucket.wait_time(user_limit), "user")
+            if global_bucket.tokens < 1:
+                raise RateLimitExceeded(operation, global_bucket.wait_time(global_limit), "global")
+            user_bucket.tokens -= 1
+            global_bucket.tokens -= 1
+
+    @staticmethod
+    def _expire(users: "OrderedDict[str, TokenBucket]", limit: Limit, now: float) -> None:
+        """Drop the least recently used buckets that have refilled completely."""
+        full_after = limit.burst / limit.rate  # An empty bucket is full again after this
+        while users:
+            user_id, bucket = next(iter(users.items()))
+            if now - bucket.updated < full_after:
+                break
+            del users[user_id]
+
+    def tracked_users(self, operation: str) -> int:
+        """Get the number of users with a live bucket for an operation."""
+        with self._lock:
+            return len(self._users.get(operation, ()))
@@ -0,0 +1,182 @@
+"""
+Compact question records for the Marshmallows anonymous questions app.
+
+A plain question dict costs a hash table, a datetime object and its own copy
+of the user ID and status strings. QuestionRecord stores the same eight fields
+in ``__slots__`` with an integer timestamp and interned strings, while still
+behaving like the dict the GUIs expect.
+"""
+
+import datetime
+import sys
+from collections.abc import MutableMapping
+from typing import Any, Dict, Iterator, Mapping
+
+
+# Timestamps are naive local datetimes, so they are stored as microseconds
+# since a naive epoch; this round-trips exactly with no timezone conversion.
+EPOCH = datetime.datetime(1970, 1, 1)
+MICROSECOND = datetime.timedelta(microseconds=1)
+
+
+def to_epoch_us(timestamp: datetime.datetime) -> int:
+    """Convert a naive datetime to integer microseconds since the epoch."""
+    return (timestamp - EPOCH) // MICROSECOND
+
+
+def from_epoch_us(epoch_us: int) -> datetime.datetime:
+    """Convert integer microseconds since the epoch back to a naive datetime."""
+    return EPOCH + datetime.timedelta(microseconds=epoch_us)
+
+
+class QuestionRecord(MutableMapping):
+    """
+    Memory-compact question with a dict-compatible interface.
+
+    ``record["timestamp"]`` returns a datetime built on access, and setting a
+    field works just like on a dict. Only the eight question fields exist:
+    fields can't be added or removed.
+
+    ``version`` is the manager's change version as of the record's last
+    change, for compare-and-set updates (0 for records saved before versions
+    existed).
+
+    Records loaded from a data file keep the ISO timestamp string in
+    ``timestamp_us`` until the timestamp is first read, so loading doesn't
+    pay for parsing timestamps nobody looks at.
+    """
+
+    __slots__ = ("id", "text", "timestamp_us", "status", "user_id", "highlighted", "votes",
+                 "version")
+
+    FIELDS = ("id", "text", "timestamp", "status", "user_id", "highlighted", "votes", "version")
+    _FIELD_SET = frozenset(FIELDS)
+
+    def __init__(self, id: int, text: str, timestamp: datetime.datetime,
+                 status: str, user_id: str, highlighted: bool = False, votes: int = 0,
+                 version: int = 0):
+        """
+        Initialize a question record.
+
+        Args:
+            id: Question ID
+            text: The text of the question
+            timestamp: When the question was submitted
+            status: Question status ("approved", "pending", etc.)
+            user_id: User identifier of the submitter
+            highlighted: Whether the question is highlighted
+            votes: Number of votes
+            version: Change version of the question's last change
+        """
+        self.id = id
+        self.text = text
+        self.timestamp_us = to_epoch_us(timestamp)
+        self.status = sys.intern(status)
+        self.user_id = sys.intern(user_id)
+        self.highlighted = highlighted
+        self.votes = votes
+        self.version = version
+
+    @classmethod
+    def from_dict(cls, data: Mapping) -> "QuestionRecord":
+        """
+        Build a record from a question dictionary.
+
+        Args:
+            data: Question dictionary with a datetime timestamp
+
+        Returns:
+            QuestionRecord: The equivalent record
+        """
+        return cls(data["id"], data["text"], data["timestamp"], data["status"],
+                   data["user_id"], data["highlighted"], data["votes"], data.get("version", 0))
+
+    @classmethod
+    def from_serialized(cls, data: Mapping) -> "QuestionRecord":
+        """
+        Build a record from a serialized question, deferring timestamp parsing.
+
+        Args:
+            data: Question dictionary with an ISO timestamp string
+
+        Returns:
+            QuestionRecord: The equivalent record
+        """
+        record = cls.__new__(cls)
+        record.id = data["id"]
+        record.text = data["text"]
+        record.timestamp_us = data["timestamp"]  # Parsed on first access
+        record.status = sys.intern(data["status"])
+        record.user_id = sys.intern(data["user_id"])
+        record.highlighted = data["highlighted"]
+        record.votes = data["votes"]
+        record.version = data.get("version", 0)
+        return record
+
+    def copy(self) -> "QuestionRecord":
+        """Return a shallow copy of the record (like dict.copy)."""
+        record = QuestionRecord.__new__(QuestionRecord)
+        record.id = self.id
+        record.text = self.text
+        record.timestamp_us = self.timestamp_us
+        record.status = self.status
+        record.user_id = self.user_id
+        record.highlighted = self.highlighted
+        record.votes = self.votes
+        record.version = self.version
+        return record
+
+    def to_serialized(self) -> Dict:
+        """Return the question as a JSON-serializable dict (ISO timestamp)."""
+        timestamp = self.timestamp_us
+        return {
+            "id": self.id,
+            "text": self.text,
+            "timestamp": timestamp if isinstance(timestamp, str) else from_epoch_us(timestamp).isoformat(),
+            "status": self.status,
+            "user_id": self.user_id,
+            "highlighted": self.highlighted,
+            "votes": self.votes,
+            "version": self.version,
+        }
+
+    @property
+    def epoch_us(self) -> int:
+        """The timestamp as integer microseconds since the epoch."""
+        timestamp = self.timestamp_us
+        if isinstance(timestamp, str):
+            timestamp = self.timestamp_us = to_epoch_us(datetime.datetime.fromisoformat(timestamp))
+        return timestamp
+
+    def __getitem__(self, key: str) -> Any:
+        if key == "timestamp":
+            return from_epoch_us(self.epoch_us)
+        if key in self._FIELD_SET:
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        if key == "timestamp":
+            self.timestamp_us = to_epoch_us(value)
+        elif key in ("status", "user_id"):
+            setattr(self, key, sys.intern(value))
+        elif key in self._FIELD_SET:
+            setattr(self, key, value)
+        else:
+            raise KeyError(key)
+
+    def __delitem__(self, key: str) -> None:
+        raise TypeError("Question record fields can't be removed")
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.FIELDS)
+
+    def __len__(self) -> int:
+        return len(self.FIELDS)
+
+    def __repr__(self) -> str:
+        return repr(dict(self))
+
+    def copy(self) -> Dict:
+        """Return the question as a plain dict."""
+        return dict(self)
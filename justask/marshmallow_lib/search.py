@@ -0,0 +1,329 @@
+"""
+Full-text search for the Marshmallows anonymous questions app.
+
+InvertedIndex maps each word to the questions containing it, so a search
+only looks at the questions that share a word with the query instead of
+scanning every question. Results are ranked with BM25. The same index finds
+near-duplicate questions (see content_words and similar_candidates).
+"""
+
+import heapq
+import math
+import re
+import sys
+from collections import Counter
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from .indexes import SortedIndex
+
+
+WORD_RE = re.compile(r"\w+")
+
+MAX_PREFIX_EXPANSIONS = 50  # Words a prefix may expand to, most frequent first
+
+# BM25 parameters: term frequency saturation and document length normalization
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Words too common to tell questions apart, left out when comparing them
+STOP_WORDS = frozenset("""
+    a about an and are as at be but by can could did do does for from had has
+    have how i if in is it its me my of on or should so that the their there
+    this to was we what when where which who why will with would you your
+""".split())
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Split text into lowercase words.
+
+    Args:
+        text: Text to split
+
+    Returns:
+        The words in order, including repeats
+    """
+    return WORD_RE.findall(text.lower())
+
+
+def parse_query(query: str, prefix_last: bool = True) -> List[Tuple[str, bool]]:
+    """
+    Split a search query into terms.
+
+    Args:
+        query: Search text
+        prefix_last: Whether the last word also matches as a prefix (search
+            as you type); words ending in "*" always do
+
+    Returns:
+        List of (word, matches as prefix), without repeats, in query order
+    """
+    terms: Dict[str, bool] = {}
+    for chunk in query.lower().split():
+        words = WORD_RE.findall(chunk)
+        for i, word in enumerate(words):
+            is_prefix = chunk.endswith("*") and i == len(words) - 1
+            terms[word] = terms.get(word, False) or is_prefix
+    if prefix_last and terms:
+        terms[next(reversed(terms))] = True
+    return list(terms.items())
+
+
+def content_words(text: str) -> Set[str]:
+    """
+    Get the words used to compare questions for near-duplicates.
+
+    Args:
+        text: Question text
+
+    Returns:
+        The distinct words of the text other than stop words and single
+        letters (all of its words if it has nothing else)
+    """
+    words = set(tokenize(text))
+    return {word for word in words if len(word) > 1 and word not in STOP_WORDS} or words
+
+
+def jaccard(a: Set[str], b: Set[str]) -> float:
+    """
+    Jaccard similarity of two word sets: shared words over all words.
+
+    Args:
+        a: First set
+        b: Second set
+
+    Returns:
+        Similarity from 0.0 (nothing shared) to 1.0 (the same words)
+    """
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+def similarity_bounds(size: int, threshold: float) -> Tuple[int, int, int]:
+    """
+    Get what a word set must satisfy to be ``threshold``-similar to a set of
+    ``size`` words.
+
+    Similarity t = shared / union needs at least t * size shared words, and
+    the other set can't be smaller than t * size or bigger than size / t.
+
+    Args:
+        size: Number of words in the new question
+        threshold: Jaccard similarity between 0 and 1
+
+    Returns:
+        Tuple of (minimum shared words, minimum size, maximum size)
+    """
+    eps = 1e-9  # Keep float error from moving exact bounds
+    low = max(1, math.ceil(threshold * size - eps))
+    high = math.floor(size / threshold + eps) if threshold > 0 else sys.maxsize
+    return low, low, high
+
+
+def probe_words(words: Set[str], overlap: int, frequency: Callable[[str], int]) -> List[str]:
+    """
+    Choose the words to look up when searching for questions sharing at
+    least ``overlap`` of some words (prefix filtering).
+
+    A question sharing ``overlap`` of n words contains at least one of any
+    n - overlap + 1 of them, so looking up only the rarest ones finds every
+    such question while reading the fewest postings.
+
+    Args:
+        words: Words of the new question
+        overlap: Minimum number of shared words
+        frequency: Number of questions containing a word
+
+    Returns:
+        The words to look up
+    """
+    ordered = sorted(words, key=lambda word: (frequency(word), word))
+    return ordered[:len(ordered) - overlap + 1]
+
+
+class InvertedIndex:
+    """
+    Incrementally maintained inverted index with ranked, prefix-aware search.
+
+    Each word has a posting dict of question ID -> occurrences. All words are
+    also kept in a SortedIndex, so the words starting with a prefix are one
+    range scan away. Questions are also grouped by their number of content
+    words, for finding near-duplicates.
+    """
+
+    def __init__(self):
+        self._postings: Dict[str, Dict[int, int]] = {}
+        self._words = SortedIndex()
+        self._doc_lengths: Dict[int, int] = {}
+        self._total_length = 0
+        self._by_size: Dict[int, Set[int]] = {}  # Content word count -> IDs
+        self._max_size = 0
+
+    def add(self, doc_id: int, text: str) -> None:
+        """
+        Index a question's text.
+
+        Args:
+            doc_id: Question ID
+            text: Question text
+        """
+        words = tokenize(text)
+        self._doc_lengths[doc_id] = len(words)
+        self._total_length += len(words)
+        for word, count in Counter(words).items():
+            postings = self._postings.get(word)
+            if postings is None:
+                postings = self._postings[sys.intern(word)] = {}
+                self._words.add(word)
+            postings[doc_id] = count
+        size = len(content_words(text))
+        self._by_size.setdefault(size, set()).add(doc_id)
+        self._max_size = max(self._max_size, size)
+
+    def remove(self, doc_id: int, text: str) -> None:
+        """
+        Remove a question from the index.
+
+        Args:
+            doc_id: Question ID
+            text: The text the question was indexed with
+        """
+        length = self._doc_lengths.pop(doc_id, None)
+        if length is None:
+            return
+        self._total_length -= length
+        self._by_size.get(len(content_words(text)), set()).discard(doc_id)
+        for word in set(tokenize(text)):
+            postings = self._postings.get(word)
+            if postings is None:
+                continue
+            postings.pop(doc_id, None)
+            if not postings:
+                del self._postings[word]
+                self._words.discard(word)
+
+    def clear(self) -> None:
+        """Remove everything from the index."""
+        self._postings = {}
+        self._words.clear()
+        self._doc_lengths = {}
+        self._total_length = 0
+        self._by_size = {}
+        self._max_size = 0
+
+    def expand_prefix(self, prefix: str) -> List[str]:
+        """
+        Find the indexed words starting with a prefix.
+
+        Args:
+            prefix: Lowercase prefix
+
+        Returns:
+            Up to MAX_PREFIX_EXPANSIONS words, those in the most questions first
+        """
+        words = []
+        for word in self._words.irange(prefix):
+            if not word.startswith(prefix):
+                break
+            words.append(word)
+        if len(words) > MAX_PREFIX_EXPANSIONS:
+            words = heapq.nlargest(MAX_PREFIX_EXPANSIONS, words,
+                                   key=lambda w: len(self._postings[w]))
+        return words
+
+    def similar_candidates(self, words: Set[str], threshold: float) -> List[int]:
+        """
+        Find the questions whose content words may be ``threshold``-similar
+        to some words.
+
+        Only the posting lists of the rarest words are read (see
+        probe_words), and questions of the wrong size are dropped before
+        counting shared words.
+
+        Args:
+            words: Content words of the new question (see content_words)
+            threshold: Jaccard similarity between 0 and 1
+
+        Returns:
+            IDs of the questions sharing enough words, in no particular order
+        """
+        overlap, min_size, max_size = similarity_bounds(len(words), threshold)
+        empty: Dict[int, int] = {}
+        candidates = set()
+        for word in probe_words(words, overlap, lambda word: len(self._postings.get(word, empty))):
+            candidates.update(self._postings.get(word, empty))
+        sized = set()
+        for size in range(min_size, min(max_size, self._max_size) + 1):
+            group = self._by_size.get(size)
+            if group:
+                sized |= candidates & group
+        # Count shared words with set intersections rather than a lookup per
+        # candidate and word; common words have long posting lists
+        hits: Counter = Counter()
+        for word in words:
+            hits.update(sized & self._postings.get(word, empty).keys())
+        return [doc_id for doc_id, count in hits.items() if count >= overlap]
+
+    def scores(self, query: str, prefix_last: bool = True) -> Dict[int, float]:
+        """
+        Score every question matching any word of a query.
+
+        Each query word contributes its BM25 score. A word ending in "*", and
+        the last word when ``prefix_last`` is set (search as you type), also
+        matches longer words starting with it; such a word contributes the
+        best score among its expansions.
+
+        Args:
+            query: Search text
+            prefix_last: Whether the last word also matches as a prefix
+
+        Returns:
+            Dict of question ID -> relevance score (higher is better)
+        """
+        doc_count = len(self._doc_lengths)
+        if not doc_count:
+            return {}
+        avg_length = self._total_length / doc_count
+
+        scores: Dict[int, float] = {}
+        for term, is_prefix in parse_query(query, prefix_last):
+            words = self.expand_prefix(term) if is_prefix else [term]
+            term_scores: Dict[int, float] = {}
+            for word in words:
+                postings = self._postings.get(word)
+                if not postings:
+                    continue
+                idf = math.log(1 + (doc_count - len(postings) + 0.5) / (len(postings) + 0.5))
+                # Exact matches rank above prefix expansions
+                weight = idf if word == term else idf * 0.5
+                for doc_id, tf in postings.items():
+                    norm = BM25_K1 * (1 - BM25_B + BM25_B * self._doc_lengths[doc_id] / avg_length)
+                    score = weight * tf * (BM25_K1 + 1) / (tf + norm)
+                    if score > term_scores.get(doc_id, 0.0):
+                        term_scores[doc_id] = score
+            for doc_id, score in term_scores.items():
+                scores[doc_id] = scores.get(doc_id, 0.0) + score
+        return scores
+
+    def search(self, query: str, limit: int = 20, prefix_last: bool = True,
+               accept: Optional[Callable[[int], bool]] = None) -> List[Tuple[int, float]]:
+        """
+        Find the questions best matching a query.
+
+        Args:
+            query: Search text
+            limit: Maximum number of results
+            prefix_last: Whether the last word also matches as a prefix
+            accept: Optional filter; only question IDs it returns True for are kept
+
+        Returns:
+            List of (question ID, score), best first; ties go to newer questions
+        """
+        scores = self.scores(query, prefix_last).items()
+        if accept is not None:
+            scores = [item for item in scores if accept(item[0])]
+        return heapq.nlargest(limit, scores, key=lambda item: (item[1], item[0]))
+
+    def __len__(self) -> int:
+        return len(self._doc_lengths)
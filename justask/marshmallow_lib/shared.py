@@ -0,0 +1,216 @@
+"""
+Multi-process file storage for the Marshmallows anonymous questions app.
+
+Several processes (Streamlit workers, the console app, the HTTP server) can
+share one data file when their managers are created with ``shared=True``.
+Rewriting the whole data file on every change would overwrite the changes
+of the other processes, so instead each mutation appends one record to a
+change log next to the data file, while holding an advisory lock:
+
+    marshmallow_data.json      snapshot (JSON or binary) with its change version
+    marshmallow_data.changes   header line, then one JSON record per change
+    marshmallow_data.lock      locked while changing either of the above
+
+Each record carries the change version it produced. A process catches up on
+the other processes' records (under the lock) before it changes anything,
+so the versions of all the processes form one sequence. Noticing that
+nothing changed costs one stat() of the change log, and catching up reads
+only the records appended since the last look. Once the log grows past a
+threshold it is folded into a new snapshot and restarted; processes that
+hadn't read all of the old log then reload the snapshot once.
+"""
+
+import json
+import os
+import uuid
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+class FileLock:
+    """
+    Exclusive advisory lock on a file, shared between processes.
+
+    Reentrant: nested acquires only count. Not thread-safe by itself; the
+    manager only uses it while holding its own lock. Two FileLock objects
+    on the same path exclude each other even within one process.
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        """
+        Initialize the lock (the lock file is created on first use).
+
+        Args:
+            path: Path of the lock file
+        """
+        self.path = Path(path)
+        self._fd: Optional[int] = None
+        self._depth = 0
+
+    def acquire(self) -> None:
+        """Block until the lock is held."""
+        if self._depth == 0:
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                if fcntl is not None:
+                    fcntl.flock(fd, fcntl.LOCK_EX)
+                else:
+                    msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+            except BaseException:
+                os.close(fd)
+                raise
+            self._fd = fd
+        self._depth += 1
+
+    def release(self) -> None:
+        """Release one acquire; the lock is freed when the outermost one ends."""
+        self._depth -= 1
+        if self._depth == 0:
+            fd, self._fd = self._fd, None
+            try:
+                if fcntl is not None:
+                    fcntl.flock(fd, fcntl.LOCK_UN)
+                else:
+                    msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+            finally:
+                os.close(fd)
+
+    def is_held(self) -> bool:
+        """Check whether this object holds the lock."""
+        return self._depth > 0
+
+    def __enter__(self) -> "FileLock":
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.release()
+
+
+class ChangeLog:
+    """
+    Change log of a shared data file, read incrementally.
+
+    Remembers which log it last read and how far, so each read returns only
+    the records appended since. Every restarted log has a header with a
+    unique ID, so a new log is told apart from the old one even if the file
+    system reuses the old file's inode. All methods except changed() expect
+    the FileLock to be held.
+    """
+
+    DEFAULT_COMPACT_THRESHOLD = 1024 * 1024  # 1 MiB of change records
+
+    def __init__(self, path: Union[str, Path]):
+        """
+        Initialize the log reader.
+
+        Args:
+            path: Path of the change log file
+        """
+        self.path = Path(path)
+        self._identity: Optional[Tuple[int, int]] = None  # (device, inode) last read
+        self._header: Optional[bytes] = None  # Header line of the log last read
+        self._offset = 0  # Bytes of that log already read
+
+    @property
+    def size(self) -> int:
+        """Bytes of the log read or written so far."""
+        return self._offset
+
+    def changed(self) -> bool:
+        """
+        Check whether anything was written since the last read (one stat).
+
+        Safe to call without the lock: a False answer may be stale, but only
+        by changes that are still being made.
+        """
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return self._identity is not None
+        return (st.st_dev, st.st_ino) != self._identity or st.st_size != self._offset
+
+    def read(self, from_start: bool = False) -> Tuple[Optional[int], List[Dict]]:
+        """
+        Read the records appended since the last read.
+
+        A torn final line (from a process that died mid-write) is left
+        unread and is cut off by the next append.
+
+        Args:
+            from_start: Read the whole log, as if never read before
+
+        Returns:
+            Tuple of (base version from the header if the log is read from
+            the start, i.e. it is new to this reader, else None; new records).
+            The base is also None if there is no log yet.
+        """
+        try:
+            f = open(self.path, 'rb')
+        except FileNotFoundError:
+            self._identity, self._header, self._offset = None, None, 0
+            return None, []
+        with f:
+            st = os.fstat(f.fileno())
+            header = f.readline()
+            if not header.endswith(b"\n"):
+                raise ValueError(f"Change log {self.path} has no header")
+            base = None
+            if from_start or header != self._header:
+                base = json.loads(header)["base"]
+                self._header, self._offset = header, len(header)
+            self._identity = (st.st_dev, st.st_ino)
+            f.seek(self._offset)
+            data = f.read()
+
+        end = data.rfind(b"\n") + 1
+        self._offset += end
+        return base, [json.loads(line) for line in data[:end].splitlines()]
+
+    def append(self, record: Dict) -> int:
+        """
+        Append one change record (the log must have been read up to its end).
+
+        Args:
+            record: JSON-serializable change record
+
+        Returns:
+            Number of bytes appended
+        """
+        line = (json.dumps(record) + "\n").encode("utf-8")
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND)
+        try:
+            if os.fstat(fd).st_size != self._offset:
+                os.ftruncate(fd, self._offset)  # Drop a torn line left by a crash
+            os.write(fd, line)
+        finally:
+            os.close(fd)
+        self._offset += len(line)
+        return len(line)
+
+    def reset(self, base_version: int) -> None:
+        """
+        Atomically replace the log with an empty one.
+
+        Called after writing a snapshot that includes every change up to
+        base_version.
+
+        Args:
+            base_version: Change version of the snapshot the new log follows
+        """
+        header = json.dumps({"base": base_version, "id": uuid.uuid4().hex}) + "\n"
+        header = header.encode("utf-8")
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp_path, 'wb') as f:
+            f.write(header)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        st = os.stat(self.path)
+        self._identity, self._header, self._offset = (st.st_dev, st.st_ino), header, len(header)
@@ -0,0 +1,761 @@
+"""
+SQLite storage backend for the Marshmallows anonymous questions app.
+
+Questions live in a local SQLite database in WAL mode, so several processes
+(e.g. multiple Streamlit workers) can share one data file. Every mutation is
+a single-row statement and reads are served by indexed queries.
+"""
+
+import datetime
+import sqlite3
+import threading
+from collections.abc import Mapping
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Set, Tuple, Union
+
+from .search import content_words, parse_query, probe_words, similarity_bounds
+from .voters import VoterSet
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS questions (
+    id INTEGER PRIMARY KEY,
+    text TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    status TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    highlighted INTEGER NOT NULL DEFAULT 0,
+    votes INTEGER NOT NULL DEFAULT 0,
+    version INTEGER NOT NULL DEFAULT 0,
+    added_version INTEGER NOT NULL DEFAULT 0
+);
+DROP INDEX IF EXISTS idx_questions_timestamp;
+CREATE INDEX IF NOT EXISTS idx_questions_newest ON questions (timestamp DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_questions_votes ON questions (votes DESC, id);
+DROP INDEX IF EXISTS idx_questions_status_timestamp;
+CREATE INDEX IF NOT EXISTS idx_questions_status_newest ON questions (status, timestamp DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_questions_status_votes ON questions (status, votes DESC, id);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO meta (key, value) VALUES ('next_id', 0);
+-- Content words of each question with their count, for near-duplicate
+-- lookups (see similar_candidates); filled on insert, emptied by trigger
+CREATE TABLE IF NOT EXISTS question_words (
+    word TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    id INTEGER NOT NULL,
+    PRIMARY KEY (word, size, id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_question_words_id ON question_words (id);
+CREATE TRIGGER IF NOT EXISTS question_words_delete AFTER DELETE ON questions BEGIN
+    DELETE FROM question_words WHERE id = old.id;
+END;
+-- Number of questions containing each content word
+CREATE TABLE IF NOT EXISTS word_counts (
+    word TEXT PRIMARY KEY,
+    questions INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE TRIGGER IF NOT EXISTS word_counts_insert AFTER INSERT ON question_words BEGIN
+    INSERT INTO word_counts (word, questions) VALUES (new.word, 1)
+    ON CONFLICT (word) DO UPDATE SET questions = questions + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS word_counts_delete AFTER DELETE ON question_words BEGIN
+    UPDATE word_counts SET questions = questions - 1 WHERE word = old.word;
+END;
+INSERT OR IGNORE INTO meta (key, value) VALUES ('word_index', 0);
+-- Voters of each question as VoterSet bytes of user numbers (see voters.py)
+CREATE TABLE IF NOT EXISTS voter_users (
+    number INTEGER PRIMARY KEY,
+    user_id TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS question_voters (
+    id INTEGER PRIMARY KEY,
+    voters BLOB NOT NULL
+);
+CREATE TRIGGER IF NOT EXISTS question_voters_delete AFTER DELETE ON questions BEGIN
+    DELETE FROM question_voters WHERE id = old.id;
+END;
+-- Change version: advanced by every change to a question and stamped on the
+-- question, for compare-and-set updates and delta sync (see changes_since).
+-- Triggers run inside the changing statement, so processes sharing the
+-- database never hand out the same one.
+INSERT OR IGNORE INTO meta (key, value) VALUES ('version', 0);
+CREATE INDEX IF NOT EXISTS idx_questions_version ON questions (version);
+CREATE TRIGGER IF NOT EXISTS questions_version_insert AFTER INSERT ON questions BEGIN
+    UPDATE meta SET value = value + 1 WHERE key = 'version';
+    UPDATE questions SET version = (SELECT value FROM meta WHERE key = 'version'),
+        added_version = (SELECT value FROM meta WHERE key = 'version') WHERE id = new.id;
+END;
+CREATE TRIGGER IF NOT EXISTS questions_version_update
+AFTER UPDATE OF text, status, user_id, highlighted, votes ON questions BEGIN
+    UPDATE meta SET value = value + 1 WHERE key = 'version';
+    UPDATE questions SET version = (SELECT value FROM meta WHERE key = 'version') WHERE id = new.id;
+END;
+-- Deleted questions with the version they were deleted at, for delta sync;
+-- emptied by clear(), which raises changes_floor past them
+CREATE TABLE IF NOT EXISTS deleted_questions (
+    id INTEGER PRIMARY KEY,
+    version INTEGER NOT NULL,
+    added_version INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_deleted_questions_version ON deleted_questions (version);
+INSERT OR IGNORE INTO meta (key, value) VALUES ('changes_floor', 0);
+CREATE TRIGGER IF NOT EXISTS questions_version_delete AFTER DELETE ON questions BEGIN
+    UPDATE meta SET value = value + 1 WHERE key = 'version';
+    INSERT OR REPLACE INTO deleted_questions (id, version, added_version)
+    VALUES (old.id, (SELECT value FROM meta WHERE key = 'version'), old.added_version);
+END;
+"""
+
+# Triggers whose body changed since they were first shipped, with a phrase
+# only the current body contains; older versions are dropped and recreated
+UPGRADED_TRIGGERS = {
+    "questions_version_insert": "added_version",
+    "questions_version_delete": "deleted_questions",
+}
+
+COLUMNS = "id, text, timestamp, status, user_id, highlighted, votes, version"
+
+# Full-text index over question text, kept in sync by triggers. Created
+# separately from SCHEMA because SQLite may be built without FTS5.
+FTS_SCHEMA = (
+    "CREATE VIRTUAL TABLE questions_fts USING fts5(text, content='questions', content_rowid='id')",
+    """CREATE TRIGGER questions_fts_insert AFTER INSERT ON questions BEGIN
+        INSERT INTO questions_fts (rowid, text) VALUES (new.id, new.text);
+    END""",
+    """CREATE TRIGGER questions_fts_delete AFTER DELETE ON questions BEGIN
+        INSERT INTO questions_fts (questions_fts, rowid, text) VALUES ('delete', old.id, old.text);
+    END""",
+    "INSERT INTO questions_fts (questions_fts) VALUES ('rebuild')",
+)
+
+# ORDER BY clauses for each sort method. Ties are broken by ID the way the
+# in-memory sort indexes break them (newest: highest ID first, votes: lowest
+# ID first), so both stores return the same order and pages.
+ORDER_BY = {
+    "newest": "timestamp DESC, id DESC",
+    "votes": "votes DESC, id",
+}
+
+# Column each sort method orders by before the ID tie-break
+SORT_COLUMN = {
+    "newest": "timestamp",
+    "votes": "votes",
+}
+
+# Condition on the ID for rows after a tie, in each sort method's order
+ID_AFTER = {
+    "newest": "id < ?",
+    "votes": "id > ?",
+}
+
+
+def _row_to_question(row: sqlite3.Row) -> Dict:
+    """Convert a database row into a question dictionary."""
+    return {
+        "id": row["id"],
+        "text": row["text"],
+        "timestamp": datetime.datetime.fromisoformat(row["timestamp"]),
+        "status": row["status"],
+        "user_id": row["user_id"],
+        "highlighted": bool(row["highlighted"]),
+        "votes": row["votes"],
+        "version": row["version"],
+    }
+
+
+class SQLiteQuestionStore:
+    """Question store backed by a SQLite database."""
+
+    BUSY_TIMEOUT_MS = 5000  # How long to wait for another process's write lock
+
+    def __init__(self, path: Union[str, Path]):
+        """
+        Open (and if needed create) the database.
+
+        Args:
+            path: Path of the SQLite database file
+        """
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        # Autocommit mode: each statement is its own transaction unless we
+        # open one explicitly.
+        self._conn = sqlite3.connect(
+            str(self.path), isolation_level=None, check_same_thread=False
+        )
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute(f"PRAGMA busy_timeout = {self.BUSY_TIMEOUT_MS}")
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        self._conn.execute("PRAGMA synchronous = NORMAL")
+        self._upgrade_schema()
+        self._conn.executescript(SCHEMA)
+        self.has_fts = self._create_search_index()
+        self._fill_word_index()
+
+    def _upgrade_schema(self) -> None:
+        """
+        Bring a database created by an older release up to date (SCHEMA
+        then creates whatever is missing).
+
+        Adds the version columns to the questions table and drops outdated
+        triggers. Changes made before added_version existed can't be listed,
+        so changes_floor starts at the current version.
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                columns = [row["name"] for row in self._conn.execute("PRAGMA table_info(questions)")]
+                for column in ("version", "added_version"):
+                    if columns and column not in columns:
+                        self._conn.execute(
+                            f"ALTER TABLE questions ADD COLUMN {column} INTEGER NOT NULL DEFAULT 0"
+                        )
+                if columns and "added_version" not in columns:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO meta (key, value)"
+                        " SELECT 'changes_floor', value FROM meta WHERE key = 'version'"
+                    )
+                for name, phrase in UPGRADED_TRIGGERS.items():
+                    row = self._conn.execute(
+                        "SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name = ?", (name,)
+                    ).fetchone()
+                    if row is not None and phrase not in row["sql"]:
+                        self._conn.execute(f"DROP TRIGGER {name}")
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _create_search_index(self) -> bool:
+        """
+        Create the full-text index if it doesn't exist yet.
+
+        Returns:
+            bool: True if full-text search is available, False if this SQLite
+            build lacks FTS5
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                exists = self._conn.execute(
+                    "SELECT 1 FROM sqlite_master WHERE name = 'questions_fts'"
+                ).fetchone()
+                if not exists:
+                    for statement in FTS_SCHEMA:
+                        self._conn.execute(statement)
+                self._conn.execute("COMMIT")
+            except sqlite3.OperationalError:
+                self._conn.execute("ROLLBACK")
+                return False
+        return True
+
+    def _fill_word_index(self) -> None:
+        """Index the content words of questions stored before question_words existed."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                done = self._conn.execute(
+                    "SELECT value FROM meta WHERE key = 'word_index'"
+                ).fetchone()["value"]
+                if not done:
+                    for row in self._conn.execute("SELECT id, text FROM questions").fetchall():
+                        self._insert_words(row["id"], row["text"])
+                    self._conn.execute("UPDATE meta SET value = 1 WHERE key = 'word_index'")
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _insert_words(self, question_id: int, text: str) -> None:
+        """Add a question's content words to question_words (inside a transaction)."""
+        words = content_words(text)
+        self._conn.executemany(
+            "INSERT OR IGNORE INTO question_words (word, size, id) VALUES (?, ?, ?)",
+            [(word, len(words), question_id) for word in words],
+        )
+
+    def next_id(self) -> int:
+        """Get the next question ID that will be assigned."""
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'next_id'").fetchone()
+        return row["value"]
+
+    def version(self) -> int:
+        """Get the change version (advanced by every change, in any process)."""
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+        return row["value"]
+
+    def changes_since(self, version: int) -> Dict:
+        """
+        Get the questions that changed after a change version.
+
+        One indexed query on questions.version plus one on the deleted
+        questions, read in a single transaction so they agree with each other.
+
+        Args:
+            version: Change version the caller is up to date with
+
+        Returns:
+            Dict as returned by MarshmallowManager.changes_since
+        """
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                meta = dict(self._conn.execute(
+                    "SELECT key, value FROM meta WHERE key IN ('version', 'changes_floor')"
+                ).fetchall())
+                current = meta["version"]
+                reset = version < meta["changes_floor"] or version > current
+                if reset:
+                    rows = self._conn.execute(f"SELECT {COLUMNS} FROM questions ORDER BY id").fetchall()
+                    deleted = []
+                elif version == current:
+                    rows, deleted = [], []
+                else:
+                    rows = self._conn.execute(
+                        f"SELECT {COLUMNS}, added_version FROM questions"
+                        " WHERE version > ? ORDER BY version", (version,)
+                    ).fetchall()
+                    deleted = [row["id"] for row in self._conn.execute(
+                        "SELECT id FROM deleted_questions WHERE version > ? AND added_version <= ?"
+                        " ORDER BY version", (version, version)
+                    )]
+            finally:
+                self._conn.execute("COMMIT")
+        added = [row for row in rows if reset or row["added_version"] > version]
+        return {
+            "version": current,
+            "reset": reset,
+            "added": [_row_to_question(row) for row in added],
+            "updated": [_row_to_question(row) for row in rows
+                        if not reset and row["added_version"] <= version],
+            "deleted": deleted,
+        }
+
+    def insert(self, question: Dict) -> int:
+        """
+        Insert a new question, assigning it the next ID.
+
+        Args:
+            question: Question dictionary (its "id" is overwritten)
+
+        Returns:
+            The ID assigned to the question
+        """
+        with self._lock:
+            # BEGIN IMMEDIATE takes the write lock up front so two processes
+            # can't hand out the same ID.
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                question_id = self._conn.execute(
+                    "SELECT value FROM meta WHERE key = 'next_id'"
+                ).fetchone()["value"]
+                self._conn.execute(
+                    "INSERT INTO questions (id, text, timestamp, status, user_id, highlighted, votes)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (question_id, question["text"], question["timestamp"].isoformat(),
+                     question["status"], question["user_id"],
+                     int(question["highlighted"]), question["votes"]),
+                )
+                self._insert_words(question_id, question["text"])
+                self._conn.execute(
+                    "UPDATE meta SET value = ? WHERE key = 'next_id'", (question_id + 1,)
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        question["id"] = question_id
+        return question_id
+
+    def increment_votes(self, question_id: int) -> bool:
+        """
+        Add one vote to a question.
+
+        Args:
+            question_id: ID of the question
+
+        Returns:
+            bool: True if the question exists, False otherwise
+        """
+        return self._execute_update(
+            "UPDATE questions SET votes = votes + 1 WHERE id = ?", (question_id,)
+        )
+
+    def add_vote(self, question_id: int, user_id: str) -> bool:
+        """
+        Add a user's vote to a question, at most once per user.
+
+        Args:
+            question_id: ID of the question
+            user_id: User identifier of the voter
+
+        Returns:
+            bool: True if the vote was added, False if the question doesn't
+            exist or the user already voted for it
+        """
+        return self._change_vote(question_id, user_id, 1)
+
+    def remove_vote(self, question_id: int, user_id: str) -> bool:
+        """
+        Take back a user's vote for a question.
+
+        Args:
+            question_id: ID of the question
+            user_id: User identifier of the voter
+
+        Returns:
+            bool: True if the vote was removed, False if there was none
+        """
+        return self._change_vote(question_id, user_id, -1)
+
+    def _change_vote(self, question_id: int, user_id: str, delta: int) -> bool:
+        """Add (delta 1) or remove (delta -1) a user's vote in one transaction."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                changed = False
+                exists = self._conn.execute(
+                    "SELECT 1 FROM questions WHERE id = ?", (question_id,)
+                ).fetchone()
+                if exists and delta > 0:
+                    self._conn.execute(
+                        "INSERT OR IGNORE INTO voter_users (user_id) VALUES (?)", (user_id,)
+                    )
+                user = self._conn.execute(
+                    "SELECT number FROM voter_users WHERE user_id = ?", (user_id,)
+                ).fetchone()
+                if exists and user is not None:
+                    row = self._conn.execute(
+                        "SELECT voters FROM question_voters WHERE id = ?", (question_id,)
+                    ).fetchone()
+                    voters = VoterSet.from_bytes(row["voters"]) if row else VoterSet()
+                    if delta > 0:
+                        changed = voters.add(user["number"])
+                    else:
+                        changed = voters.discard(user["number"])
+                if changed:
+                    if voters:
+                        self._conn.execute(
+                            "INSERT OR REPLACE INTO question_voters (id, voters) VALUES (?, ?)",
+                            (question_id, voters.to_bytes()),
+                        )
+                    else:
+                        self._conn.execute("DELETE FROM question_voters WHERE id = ?", (question_id,))
+                    self._conn.execute(
+                        "UPDATE questions SET votes = votes + ? WHERE id = ?", (delta, question_id)
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return changed
+
+    def has_voted(self, question_id: int, user_id: str) -> bool:
+        """
+        Check whether a user has voted for a question.
+
+        Args:
+            question_id: ID of the question
+            user_id: User identifier of the voter
+
+        Returns:
+            bool: True if the user's vote is recorded
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT v.voters, u.number FROM question_voters v, voter_users u"
+                " WHERE v.id = ? AND u.user_id = ?", (question_id, user_id)
+            ).fetchone()
+        return row is not None and row["number"] in VoterSet.from_bytes(row["voters"])
+
+    def update_field(self, question_id: int, field: str, value,
+                     expected_version: Optional[int] = None) -> bool:
+        """
+        Set a single field of a question.
+
+        Args:
+            question_id: ID of the question
+            field: Field to set ("highlighted" or "status")
+            value: New value
+            expected_version: Only update the question if its version is
+                still this (None to update it regardless)
+
+        Returns:
+            bool: True if the question exists (with the expected version),
+            False otherwise
+        """
+        if field not in ("highlighted", "status"):
+            raise ValueError(f"Unsupported field: {field}")
+        if field == "highlighted":
+            value = int(value)
+        sql, params = f"UPDATE questions SET {field} = ? WHERE id = ?", (value, question_id)
+        if expected_version is not None:
+            sql, params = sql + " AND version = ?", params + (expected_version,)
+        return self._execute_update(sql, params)
+
+    def delete(self, question_id: int, expected_version: Optional[int] = None) -> bool:
+        """
+        Delete a question.
+
+        Args:
+            question_id: ID of the question
+            expected_version: Only delete the question if its version is
+                still this (None to delete it regardless)
+
+        Returns:
+            bool: True if the question existed (with the expected version),
+            False otherwise
+        """
+        sql, params = "DELETE FROM questions WHERE id = ?", (question_id,)
+        if expected_version is not None:
+            sql, params = sql + " AND version = ?", params + (expected_version,)
+        return self._execute_update(sql, params)
+
+    def clear(self) -> None:
+        """Delete all questions and voters and reset the ID counter."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute("DELETE FROM questions")
+                self._conn.execute("DELETE FROM voter_users")
+                self._conn.execute("UPDATE meta SET value = 0 WHERE key = 'next_id'")
+                # IDs are reused from now on, so clients syncing deltas start over
+                self._conn.execute("DELETE FROM deleted_questions")
+                self._conn.execute(
+                    "UPDATE meta SET value = (SELECT value FROM meta WHERE key = 'version')"
+                    " WHERE key = 'changes_floor'"
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def get(self, question_id: int) -> Optional[Dict]:
+        """
+        Get a question by its ID (primary key lookup).
+
+        Args:
+            question_id: ID of the question
+
+        Returns:
+            Dict or None: The question if found, None otherwise
+        """
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {COLUMNS} FROM questions WHERE id = ?", (question_id,)
+            ).fetchone()
+        return _row_to_question(row) if row else None
+
+    def query(self, sort_by: Optional[str] = None, status: Optional[str] = None) -> List[Dict]:
+        """
+        Get questions, optionally filtered by status and sorted.
+
+        Args:
+            sort_by: "newest", "votes", or None for insertion order
+            status: Only return questions with this status (None for all)
+
+        Returns:
+            List of questions
+        """
+        sql = f"SELECT {COLUMNS} FROM questions"
+        params = ()
+        if status is not None:
+            sql += " WHERE status = ?"
+            params = (status,)
+        sql += " ORDER BY " + ORDER_BY.get(sort_by, "id")
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [_row_to_question(row) for row in rows]
+
+    def query_page(self, sort_by: str, status: Optional[str], limit: int,
+                   after: Optional[Tuple] = None) -> List[Dict]:
+        """
+        Get one page of sorted questions using keyset pagination.
+
+        Rather than skipping rows with OFFSET, the query seeks straight to the
+        last row of the previous page in the sort index, so every page costs
+        the same however deep it is.
+
+        Args:
+            sort_by: "newest" or "votes"
+            status: Only return questions with this status (None for all)
+            limit: Maximum number of questions to return
+            after: (sort column value, id) of the previous page's last
+                question, or None for the first page
+
+        Returns:
+            List of questions
+        """
+        column = SORT_COLUMN[sort_by]
+        clauses, params = [], []
+        if status is not None:
+            clauses.append("status = ?")
+            params.append(status)
+        if after is not None:
+            value, last_id = after
+            # Rows after (value, last_id) in ORDER_BY order; the leading
+            # range condition lets SQLite seek in the index
+            clauses.append(f"{column} <= ? AND ({column} < ? OR {ID_AFTER[sort_by]})")
+            params += [value, value, last_id]
+        sql = f"SELECT {COLUMNS} FROM questions"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += f" ORDER BY {ORDER_BY[sort_by]} LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [_row_to_question(row) for row in rows]
+
+    def search(self, query: str, status: Optional[str] = None, limit: int = 20) -> List[Dict]:
+        """
+        Full-text search over question text, best matches first.
+
+        Uses the FTS5 index ranked by bm25(), with the same query syntax as
+        the in-memory InvertedIndex. Without FTS5, falls back to a substring
+        scan in newest-first order.
+
+        Args:
+            query: Search text
+            status: Only return questions with this status (None for all)
+            limit: Maximum number of results
+
+        Returns:
+            List of matching questions
+        """
+        terms = parse_query(query)
+        if not terms:
+            return []
+        columns = ", ".join(f"q.{column}" for column in COLUMNS.split(", "))
+        if self.has_fts:
+            # Words are \w+ runs, so quoting them can't break the syntax
+            match = " OR ".join(f'"{word}"' + ("*" if is_prefix else "") for word, is_prefix in terms)
+            sql = (f"SELECT {columns} FROM questions_fts"
+                   " JOIN questions q ON q.id = questions_fts.rowid WHERE questions_fts MATCH ?")
+            params = [match]
+            order = "bm25(questions_fts), q.id DESC"
+        else:
+            sql = f"SELECT {columns} FROM questions q WHERE ("
+            sql += " OR ".join("q.text LIKE ?" for _ in terms) + ")"
+            params = [f"%{word}%" for word, _ in terms]
+            order = "q.id DESC"
+        if status is not None:
+            sql += " AND q.status = ?"
+            params.append(status)
+        sql += f" ORDER BY {order} LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [_row_to_question(row) for row in rows]
+
+    def similar_candidates(self, words: Set[str], threshold: float) -> List[Dict]:
+        """
+        Find the questions whose content words may be ``threshold``-similar
+        to some words.
+
+        Candidates come from the rarest words only (see search.probe_words,
+        using word_counts), restricted to questions of a compatible size;
+        their shared words are then counted in SQL.
+
+        Args:
+            words: Content words of the new question (see search.content_words)
+            threshold: Jaccard similarity between 0 and 1
+
+        Returns:
+            The questions sharing enough words; callers compare the text
+        """
+        if not words:
+            return []
+        overlap, min_size, max_size = similarity_bounds(len(words), threshold)
+        words = sorted(words)
+        placeholders = ", ".join("?" * len(words))
+        with self._lock:
+            counts = dict(self._conn.execute(
+                f"SELECT word, questions FROM word_counts WHERE word IN ({placeholders})", words
+            ).fetchall())
+            probe = probe_words(set(words), overlap, lambda word: counts.get(word, 0))
+            rows = self._conn.execute(
+                f"SELECT {COLUMNS} FROM questions WHERE id IN ("
+                " SELECT id FROM question_words WHERE id IN ("
+                f"  SELECT id FROM question_words WHERE word IN ({', '.join('?' * len(probe))})"
+                "   AND size BETWEEN ? AND ?)"
+                f" AND word IN ({placeholders}) GROUP BY id HAVING COUNT(*) >= ?)",
+                [*probe, min_size, max_size, *words, overlap]
+            ).fetchall()
+        return [_row_to_question(row) for row in rows]
+
+    def ids(self, status: Optional[str] = None) -> List[int]:
+        """
+        Get question IDs in insertion order, optionally filtered by status.
+
+        Args:
+            status: Only return IDs of questions with this status (None for all)
+
+        Returns:
+            List of question IDs
+        """
+        if status is None:
+            sql, params = "SELECT id FROM questions ORDER BY id", ()
+        else:
+            sql, params = "SELECT id FROM questions WHERE status = ? ORDER BY id", (status,)
+        with self._lock:
+            return [row["id"] for row in self._conn.execute(sql, params)]
+
+    def count(self, status: Optional[str] = None) -> int:
+        """
+        Count questions, optionally filtered by status.
+
+        Args:
+            status: Only count questions with this status (None for all)
+
+        Returns:
+            Number of questions
+        """
+        if status is None:
+            sql, params = "SELECT COUNT(*) FROM questions", ()
+        else:
+            sql, params = "SELECT COUNT(*) FROM questions WHERE status = ?", (status,)
+        with self._lock:
+            return self._conn.execute(sql, params).fetchone()[0]
+
+    def close(self) -> None:
+        """Close the database connection."""
+        with self._lock:
+            self._conn.close()
+
+    def _execute_update(self, sql: str, params: tuple) -> bool:
+        """Run a single-row write statement and report whether a row matched."""
+        with self._lock:
+            cursor = self._conn.execute(sql, params)
+        return cursor.rowcount > 0
+
+
+class SQLiteQuestionMap(Mapping):
+    """
+    Read-only mapping view of question IDs to questions in a SQLite store.
+
+    Lets code written against ``MarshmallowManager.question_map`` keep working
+    with the SQLite backend. Each lookup is a primary key query, and the
+    returned dictionaries are copies: changing them doesn't update the database.
+    """
+
+    def __init__(self, store: SQLiteQuestionStore):
+        self._store = store
+
+    def __getitem__(self, question_id: int) -> Dict:
+        question = self._store.get(question_id)
+        if question is None:
+            raise KeyError(question_id)
+        return question
+
+    def __contains__(self, question_id) -> bool:
+        return self._store.get(question_id) is not None
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self._store.ids())
+
+    def __len__(self) -> int:
+        return self._store.count()
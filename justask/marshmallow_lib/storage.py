@@ -0,0 +1,667 @@
+"""
+Storage helpers for the Marshmallows anonymous questions app.
+
+This module contains the serialization helpers shared by the storage backends,
+a streaming reader for JSON data files, the compact binary data file format
+and the append-only journal used by the "log" storage type.
+"""
+
+import datetime
+import json
+import os
+import struct
+import sys
+import threading
+import zlib
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+from .records import QuestionRecord
+from .voters import VoterIndex, VoterSet
+
+
+def serialize_question(question: Dict) -> Dict:
+    """
+    Convert a question into a JSON-serializable dictionary.
+
+    Args:
+        question: Question dictionary (or record) with a datetime timestamp
+
+    Returns:
+        A copy of the question with the timestamp as an ISO string
+    """
+    if isinstance(question, QuestionRecord):
+        # Avoids parsing timestamps that were never accessed
+        return question.to_serialized()
+    q_copy = dict(question)
+    q_copy["timestamp"] = q_copy["timestamp"].isoformat()
+    return q_copy
+
+
+def deserialize_question(data: Dict) -> Dict:
+    """
+    Convert a serialized question back into a question dictionary.
+
+    Args:
+        data: Dictionary as produced by serialize_question
+
+    Returns:
+        The question with its timestamp parsed back into a datetime
+    """
+    data["timestamp"] = datetime.datetime.fromisoformat(data["timestamp"])
+    return data
+
+
+class JSONArrayStreamer:
+    """
+    Incremental reader for the questions array of a JSON data file.
+
+    Reads the file in fixed-size chunks and decodes one question at a time,
+    so peak memory is one chunk plus one question instead of the whole
+    document. Supports both the legacy format (a plain list of questions) and
+    the current format (a dict with next_id and questions).
+    """
+
+    CHUNK_SIZE = 64 * 1024
+
+    def __init__(self, f):
+        """
+        Initialize the reader.
+
+        Args:
+            f: Text file object positioned at the start of the document
+        """
+        self._file = f
+        self._decoder = json.JSONDecoder()
+        self._buffer = ""
+        self._pos = 0
+        self._eof = False
+        self.header: Dict[str, Any] = {}  # Top-level values other than "questions"
+
+    def questions(self) -> Iterator[Dict]:
+        """
+        Yield each serialized question in file order.
+
+        Top-level values such as next_id are collected in ``header`` as they
+        are passed.
+
+        Raises:
+            json.JSONDecodeError: If the document is malformed
+        """
+        first = self._peek_char()
+        if first == "[":
+            # Old format (just a list of questions)
+            yield from self._array_items()
+            return
+        if first != "{":
+            raise self._error("Expected a list or an object")
+
+        self._pos += 1
+        if self._peek_char() == "}":
+            self._pos += 1
+            return
+        while True:
+            key = self._value()
+            if not isinstance(key, str):
+                raise self._error("Expected an object key")
+            self._expect(":")
+            if key == "questions":
+                if self._peek_char() != "[":
+                    raise self._error("Expected a list of questions")
+                yield from self._array_items()
+            else:
+                self.header[key] = self._value()
+
+            separator = self._peek_char()
+            self._pos += 1
+            if separator == "}":
+                return
+            if separator != ",":
+                raise self._error("Expected ',' or '}'")
+
+    def _array_items(self) -> Iterator[Any]:
+        """Yield the items of the array starting at the current position."""
+        self._pos += 1  # Skip "["
+        if self._peek_char() == "]":
+            self._pos += 1
+            return
+        while True:
+            yield self._value()
+            separator = self._peek_char()
+            self._pos += 1
+            if separator == "]":
+                return
+            if separator != ",":
+                raise self._error("Expected ',' or ']'")
+
+    def _value(self) -> Any:
+        """Decode the JSON value at the current position, reading more as needed."""
+        self._peek_char()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                if self._eof:
+                    raise
+                self._read_chunk()
+                continue
+            # A number at the end of the buffer may continue in the next chunk
+            if end == len(self._buffer) and not self._eof:
+                self._read_chunk()
+                continue
+            self._pos = end
+            return value
+
+    def _expect(self, char: str) -> None:
+        """Consume the given structural character."""
+        if self._peek_char() != char:
+            raise self._error(f"Expected '{char}'")
+        self._pos += 1
+
+    def _peek_char(self) -> str:
+        """Skip whitespace and return the next character ("" at end of file)."""
+        while True:
+            while self._pos < len(self._buffer) and self._buffer[self._pos] in " \t\r\n":
+                self._pos += 1
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if self._eof:
+                return ""
+            self._read_chunk()
+
+    def _read_chunk(self) -> None:
+        """Append the next chunk of the file to the buffer, dropping consumed text."""
+        chunk = self._file.read(self.CHUNK_SIZE)
+        self._buffer = self._buffer[self._pos:] + chunk
+        self._pos = 0
+        if not chunk:
+            self._eof = True
+
+    def _error(self, message: str) -> json.JSONDecodeError:
+        """Build a decode error for the current position."""
+        return json.JSONDecodeError(message, self._buffer, self._pos)
+
+
+# Binary data file layout (all integers little-endian):
+#   header:  magic b"MMQB", version u8, flags u8
+#   payload (zlib-compressed when FLAG_ZLIB is set):
+#     next_id i64, string count u32, then per string: length u16 + UTF-8 bytes
+#     question count u32, then per question: QUESTION_STRUCT + UTF-8 text
+#     (version 2) voter user count u32, then per user: length u16 + UTF-8 bytes
+#     (version 2) voter set count u32, then per set: question id i64,
+#       length u32 + VoterSet.to_bytes()
+#     (version 3) change version i64, then per question (in order): version i64
+# Status and user ID strings repeat a lot, so questions refer to them by
+# index into the string table. Version 1 files have no voters, and files
+# before version 3 have no change versions.
+BINARY_MAGIC = b"MMQB"
+BINARY_VERSION = 3
+READABLE_BINARY_VERSIONS = (1, 2, 3)
+FLAG_ZLIB = 0x01
+HEADER_STRUCT = struct.Struct("<4sBB")
+QUESTION_STRUCT = struct.Struct("<qqqIIBI")  # id, timestamp_us, votes, status, user_id, highlighted, text length
+
+
+def is_binary_data_file(path: Path) -> bool:
+    """
+    Check whether a data file uses the binary format (by its magic header).
+
+    Args:
+        path: Path of the data file
+
+    Returns:
+        bool: True for the binary format, False otherwise (e.g. JSON)
+    """
+    with open(path, 'rb') as f:
+        return f.read(len(BINARY_MAGIC)) == BINARY_MAGIC
+
+
+def encode_binary(next_id: int, questions: Iterable[QuestionRecord], compress: bool = True,
+                  voters: Optional[VoterIndex] = None, version: int = 0) -> bytes:
+    """
+    Encode questions in the compact binary data file format.
+
+    Args:
+        next_id: The next question ID
+        questions: Question records in insertion order
+        compress: Whether to zlib-compress the payload
+        voters: Who voted for which question (None for nobody)
+        version: The manager's change version
+
+    Returns:
+        The encoded file contents
+    """
+    strings: Dict[str, int] = {}
+    body = bytearray()
+    versions = []
+    for q in questions:
+        status = strings.setdefault(q.status, len(strings))
+        user_id = strings.setdefault(q.user_id, len(strings))
+        text = q.text.encode("utf-8")
+        body += QUESTION_STRUCT.pack(q.id, q.epoch_us, q.votes, status, user_id,
+                                     q.highlighted, len(text))
+        body += text
+        versions.append(q.version)
+
+    payload = bytearray(struct.pack("<qI", next_id, len(strings)))
+    for string in strings:
+        encoded = string.encode("utf-8")
+        payload += struct.pack("<H", len(encoded)) + encoded
+    payload += struct.pack("<I", len(versions)) + body
+
+    voters = voters or VoterIndex()
+    payload += struct.pack("<I", len(voters.user_ids))
+    for user_id in voters.user_ids:
+        encoded = user_id.encode("utf-8")
+        payload += struct.pack("<H", len(encoded)) + encoded
+    payload += struct.pack("<I", len(voters.voter_sets))
+    for question_id, voter_set in voters.voter_sets.items():
+        encoded = voter_set.to_bytes()
+        payload += struct.pack("<qI", question_id, len(encoded)) + encoded
+    payload += struct.pack(f"<q{len(versions)}q", version, *versions)
+
+    flags = FLAG_ZLIB if compress else 0
+    if compress:
+        payload = zlib.compress(payload, 6)
+    return HEADER_STRUCT.pack(BINARY_MAGIC, BINARY_VERSION, flags) + bytes(payload)
+
+
+def decode_binary(data: bytes) -> Tuple[int, Dict[int, QuestionRecord], VoterIndex, int]:
+    """
+    Decode a binary data file.
+
+    Args:
+        data: The file contents
+
+    Returns:
+        Tuple of (next_id, insertion-ordered mapping of ID to record, voters,
+        change version)
+
+    Raises:
+        ValueError: If the data isn't a supported binary data file
+    """
+    magic, version, flags = HEADER_STRUCT.unpack_from(data)
+    if magic != BINARY_MAGIC or version not in READABLE_BINARY_VERSIONS:
+        raise ValueError("Not a supported binary marshmallow data file")
+    payload = memoryview(data)[HEADER_STRUCT.size:]
+    if flags & FLAG_ZLIB:
+        payload = memoryview(zlib.decompress(payload))
+
+    next_id, string_count = struct.unpack_from("<qI", payload)
+    pos = 12
+    strings = []
+    for _ in range(string_count):
+        (length,) = struct.unpack_from("<H", payload, pos)
+        pos += 2
+        strings.append(sys.intern(str(payload[pos:pos + length], "utf-8")))
+        pos += length
+
+    (count,) = struct.unpack_from("<I", payload, pos)
+    pos += 4
+    questions = {}
+    unpack_question = QUESTION_STRUCT.unpack_from
+    question_size = QUESTION_STRUCT.size
+    for _ in range(count):
+        question_id, timestamp_us, votes, status, user_id, highlighted, length = \
+            unpack_question(payload, pos)
+        pos += question_size
+        record = QuestionRecord.__new__(QuestionRecord)
+        record.id = question_id
+        record.text = str(payload[pos:pos + length], "utf-8")
+        record.timestamp_us = timestamp_us
+        record.status = strings[status]
+        record.user_id = strings[user_id]
+        record.highlighted = bool(highlighted)
+        record.votes = votes
+        record.version = 0
+        questions[question_id] = record
+        pos += length
+
+    if version < 2:
+        return next_id, questions, VoterIndex(), 0
+    (user_count,) = struct.unpack_from("<I", payload, pos)
+    pos += 4
+    user_ids = []
+    for _ in range(user_count):
+        (length,) = struct.unpack_from("<H", payload, pos)
+        pos += 2
+        user_ids.append(str(payload[pos:pos + length], "utf-8"))
+        pos += length
+    (set_count,) = struct.unpack_from("<I", payload, pos)
+    pos += 4
+    voter_sets = {}
+    for _ in range(set_count):
+        question_id, length = struct.unpack_from("<qI", payload, pos)
+        pos += 12
+        voter_sets[question_id] = VoterSet.from_bytes(bytes(payload[pos:pos + length]))
+        pos += length
+    voters = VoterIndex(user_ids, voter_sets)
+    if version < 3:
+        return next_id, questions, voters, 0
+
+    change_version, *versions = struct.unpack_from(f"<q{count}q", payload, pos)
+    for record, record_version in zip(questions.values(), versions):
+        record.version = record_version
+    return next_id, questions, voters, change_version
+
+
+def write_binary_file(path: Path, data: bytes) -> int:
+    """
+    Atomically replace a data file with binary contents.
+
+    Args:
+        path: Path of the data file
+        data: Encoded file contents
+
+    Returns:
+        Number of bytes written
+    """
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+    return len(data)
+
+
+def read_snapshot(path: Path) -> Tuple[int, List[Dict], int, VoterIndex, int]:
+    """
+    Read a JSON snapshot file.
+
+    Supports both the legacy format (a plain list of questions) and the
+    current format (a dict with next_id and questions).
+
+    Args:
+        path: Path of the snapshot file
+
+    Returns:
+        Tuple of (next_id, serialized questions, last applied journal
+        sequence, voters, change version)
+    """
+    with open(path, 'r') as f:
+        data = json.load(f)
+
+    if isinstance(data, list):
+        # Old format (just a list of questions)
+        return len(data), data, 0, VoterIndex(), 0
+
+    questions = data.get("questions", [])
+    return (data.get("next_id", len(questions)), questions, data.get("seq", 0),
+            VoterIndex.from_serialized(data.get("voters")), data.get("version", 0))
+
+
+def write_snapshot(path: Path, data: Dict) -> int:
+    """
+    Atomically write a JSON snapshot file.
+
+    The data is written to a temporary file first and then moved into place,
+    so readers never see a half-written snapshot.
+
+    Args:
+        path: Path of the snapshot file
+        data: JSON-serializable snapshot data
+
+    Returns:
+        Number of bytes written
+    """
+    payload = json.dumps(data)
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, 'w') as f:
+        f.write(payload)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return len(payload)
+
+
+def apply_record(questions: Dict[int, Dict], record: Dict, next_id: int,
+                 voters: VoterIndex) -> int:
+    """
+    Apply a single journal record to a dictionary of questions.
+
+    Records carrying a change version stamp it on the question they change.
+
+    Args:
+        questions: Insertion-ordered mapping of question ID to question
+        record: Journal record to apply
+        next_id: The next question ID before the record
+        voters: Who voted for which question, updated by vote records
+
+    Returns:
+        The next question ID after the record
+    """
+    op = record["op"]
+
+    if op == "add":
+        question = deserialize_question(record["question"])
+        questions[question["id"]] = question
+        return max(next_id, question["id"] + 1)
+    elif op == "clear":
+        questions.clear()
+        voters.clear()
+        return 0
+
+    question = questions.get(record["id"])
+    if question is None:
+        return next_id
+
+    if "version" in record:
+        question["version"] = record["version"]
+    user_id = record.get("user")
+    if op == "vote":
+        # Untracked votes (no user) always count
+        if user_id is None or voters.add(record["id"], user_id):
+            question["votes"] += 1
+    elif op == "unvote":
+        if voters.discard(record["id"], user_id):
+            question["votes"] -= 1
+    elif op == "highlight":
+        question["highlighted"] = record["highlighted"]
+    elif op == "status":
+        question["status"] = record["status"]
+    elif op == "delete":
+        del questions[record["id"]]
+        voters.remove_question(record["id"])
+    return next_id
+
+
+class QuestionJournal:
+    """
+    Append-only write-ahead log backed by a JSON snapshot.
+
+    Every mutation appends one small JSON line to the log file instead of
+    rewriting the whole data file. State is rebuilt by replaying the snapshot
+    plus the log, and the log is folded into a new snapshot in a background
+    thread once it grows past the compaction threshold.
+
+    Each record carries a sequence number and the snapshot stores the last
+    sequence it includes, so records are never applied twice even if the
+    process dies halfway through a compaction.
+    """
+
+    DEFAULT_COMPACT_THRESHOLD = 1024 * 1024  # 1 MiB of log records
+
+    def __init__(self, snapshot_path: Union[str, Path],
+                 capture_fn: Callable[[], Any],
+                 serialize_fn: Callable[[Any], Dict],
+                 compact_threshold: int = DEFAULT_COMPACT_THRESHOLD):
+        """
+        Initialize the journal.
+
+        A compaction captures the state when it starts, while appends are
+        blocked, and serializes the capture on the compaction thread. So
+        capture_fn should just copy the state, as cheaply as it can.
+
+        Args:
+            snapshot_path: Path of the JSON snapshot file
+            capture_fn: Callable returning a copy of the current state that
+                later changes don't affect
+            serialize_fn: Callable turning a capture into
+                {"next_id": ..., "version": ..., "questions": [...serialized
+                questions], "voters": ...serialized VoterIndex}
+            compact_threshold: Log size in bytes that triggers a compaction
+        """
+        self.snapshot_path = Path(snapshot_path)
+        self.log_path = self.snapshot_path.with_suffix(".log")
+        self.pending_path = self.snapshot_path.with_suffix(".log.compacting")
+        self.compact_threshold = compact_threshold
+        self._capture_fn = capture_fn
+        self._serialize_fn = serialize_fn
+        self._seq = 0
+        self._log_file = None
+        self._log_size = 0
+        self._compaction = None  # Background compaction thread
+        self._lock = threading.Lock()
+
+    def load(self) -> Tuple[int, Dict[int, Dict], VoterIndex, int]:
+        """
+        Rebuild state by replaying the snapshot and the log.
+
+        If any log records were found they are folded into a fresh snapshot
+        right away, so the process starts with an empty log.
+
+        Returns:
+            Tuple of (next_id, insertion-ordered mapping of ID to question,
+            voters, change version)
+        """
+        next_id, questions, self._seq, voters, version = 0, {}, 0, VoterIndex(), 0
+        if self.snapshot_path.exists():
+            next_id, serialized, self._seq, voters, version = read_snapshot(self.snapshot_path)
+            for q in serialized:
+                question = deserialize_question(q)
+                questions[question["id"]] = question
+
+        # A leftover pending log means a compaction was interrupted; its
+        # records come before anything in the current log.
+        log_paths = [path for path in (self.pending_path, self.log_path) if path.exists()]
+        for path in log_paths:
+            for record in self._read_records(path):
+                if record["seq"] <= self._seq:
+                    continue  # Already part of the snapshot
+                next_id = apply_record(questions, record, next_id, voters)
+                self._seq = record["seq"]
+                version = record.get("version", version)
+
+        if log_paths:
+            write_snapshot(self.snapshot_path, {
+                "next_id": next_id,
+                "seq": self._seq,
+                "version": version,
+                "questions": [serialize_question(q) for q in questions.values()],
+                "voters": voters.to_serialized(),
+            })
+            for path in log_paths:
+                os.remove(path)
+
+        self._open_log()
+        return next_id, questions, voters, version
+
+    def append(self, op: str, **fields: Any) -> int:
+        """
+        Append one mutation record to the log.
+
+        Args:
+            op: Operation name ("add", "vote", "unvote", "highlight", "status",
+                "delete", "clear")
+            **fields: Operation-specific fields
+
+        Returns:
+            Number of bytes appended
+        """
+        with self._lock:
+            self._seq += 1
+            record = {"seq": self._seq, "op": op}
+            record.update(fields)
+            line = json.dumps(record) + "\n"
+            self._log_file.write(line)
+            self._log_file.flush()
+            self._log_size += len(line)
+
+            if self._log_size >= self.compact_threshold and not self.is_compacting():
+                self._start_compaction()
+        return len(line)
+
+    def compact(self, wait: bool = True) -> None:
+        """
+        Fold the log into a new snapshot.
+
+        Args:
+            wait: Whether to block until the snapshot has been written
+        """
+        with self._lock:
+            if not self.is_compacting():
+                self._start_compaction()
+            thread = self._compaction
+        if wait and thread is not None:
+            thread.join()
+
+    def is_compacting(self) -> bool:
+        """Check whether a background compaction is in progress."""
+        return self._compaction is not None and self._compaction.is_alive()
+
+    def close(self) -> None:
+        """Wait for any running compaction and close the log file."""
+        if self._compaction is not None:
+            self._compaction.join()
+        with self._lock:
+            if self._log_file is not None:
+                self._log_file.close()
+                self._log_file = None
+
+    def _start_compaction(self) -> None:
+        """Rotate the log and write a snapshot in a background thread (lock held)."""
+        state = self._capture_fn()
+
+        # Move the current log aside so new records go to a fresh file while
+        # the snapshot is being written.
+        self._log_file.close()
+        if self.log_path.exists():
+            if self.pending_path.exists():
+                # Leftover from an interrupted compaction: keep its records
+                with open(self.pending_path, 'a') as pending, open(self.log_path, 'r') as log:
+                    pending.write(log.read())
+                os.remove(self.log_path)
+            else:
+                os.replace(self.log_path, self.pending_path)
+        self._open_log()
+
+        self._compaction = threading.Thread(
+            target=self._write_snapshot, args=(state, self._seq), daemon=True
+        )
+        self._compaction.start()
+
+    def _write_snapshot(self, state: Any, seq: int) -> None:
+        """Serialize and write the snapshot and drop the log records it now contains."""
+        try:
+            data = self._serialize_fn(state)
+            data["seq"] = seq
+            write_snapshot(self.snapshot_path, data)
+            if self.pending_path.exists():
+                os.remove(self.pending_path)
+        except OSError as e:
+            print(f"Error compacting question log: {e}")
+
+    def _open_log(self) -> None:
+        """Open the log file for appending."""
+        self._log_file = open(self.log_path, 'a')
+        self._log_size = self._log_file.tell()
+
+    @staticmethod
+    def _read_records(path: Path) -> Iterable[Dict]:
+        """
+        Read journal records from a log file.
+
+        A torn final line (from a crash mid-write) is ignored.
+
+        Args:
+            path: Path of the log file
+
+        Returns:
+            Iterator over the decoded records
+        """
+        if not path.exists():
+            return
+        with open(path, 'r') as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    break
@@ -6,9 +6,43 @@ core functionality from the marshmallow_lib package.
 """
 
 import streamlit as st
-from typing import Dict, Optional, Any, List, Callable
+from typing import Dict, Optional, Any, List, Callable, Tuple, Union
 import functools
-from .core import MarshmallowManager
+import random
+import time
+from .core import MarshmallowManager, UserSession
+from .metrics import InMemorySink, JSONLinesSink, Metrics, summary_table
+from .ratelimit import RateLimiter, RateLimitExceeded
+
+
+DEFAULT_PAGE_SIZE = 20  # Questions rendered per page in the See All tab
+PAGE_SIZE_OPTIONS = [10, 20, 50, 100]
+AUTO_REFRESH_SECONDS = 5  # How often each session checks for other users' changes
+
+
+@st.cache_resource
+def get_shared_manager(storage_type: str, metrics_log: Optional[str] = None) -> MarshmallowManager:
+    """
+    Get the MarshmallowManager shared by every session of this server process.
+    
+    File storage is shared, so several server processes (and the console
+    app) can use the same data file; each vote appends one small record to
+    its change log rather than rewriting the file. Submissions and votes are
+    rate limited per user and overall. Operation metrics are kept in memory
+    for the Debug Mode panel.
+    
+    Args:
+        storage_type: Storage type for manager
+        metrics_log: Optional JSON-lines file to also append metrics events to
+        
+    Returns:
+        The process-wide manager for this storage type
+    """
+    sinks = [InMemorySink()]
+    if metrics_log:
+        sinks.append(JSONLinesSink(metrics_log))
+    return MarshmallowManager(storage_type=storage_type, shared=True,
+                              metrics=Metrics(sinks), rate_limiter=RateLimiter())
 
 
 class SessionState:
@@ -16,12 +50,22 @@ class SessionState:
     
     # Keys used in session state
     MANAGER = "marshmallow_manager"
+    USER_SESSION = "user_session"
     ADMIN_VIEW = "admin_view"
     DEBUG_MODE = "debug_mode"
     SORT_OPTION = "sort_option"
     CURRENT_TAB = "current_tab"
     RANDOM_QUESTION = "random_question"
     LAST_SORT_OPTION = "last_sort_option"
+    PAGE_SIZE = "page_size"
+    PAGE_CURSORS = "page_cursors"
+    PAGE_QUERY = "page_query"
+    SHUFFLED_IDS = "shuffled_ids"
+    REMOVED_IDS = "removed_ids"
+    CLICK_STARTED = "click_started"
+    THROTTLED = "throttled"
+    SEEN_VERSION = "seen_version"
+    SHOWN_VERSIONS = "shown_versions"
     
     @staticmethod
     def initialize_if_missing(key: str, default_value: Any) -> None:
@@ -36,31 +80,42 @@ class SessionState:
             st.session_state[key] = default_value
     
     @staticmethod
-    def initialize_manager(storage_type: str) -> None:
+    def initialize_manager(storage_type: str, metrics_log: Optional[str] = None) -> None:
         """
-        Initialize the MarshmallowManager in session state.
+        Attach the shared MarshmallowManager and a per-user session to session state.
         
         Args:
             storage_type: Storage type for manager
+            metrics_log: Optional JSON-lines file for metrics events
         """
         if SessionState.MANAGER not in st.session_state:
-            st.session_state[SessionState.MANAGER] = MarshmallowManager(storage_type=storage_type)
+            manager = get_shared_manager(storage_type, metrics_log)
+            st.session_state[SessionState.MANAGER] = manager
+            st.session_state[SessionState.USER_SESSION] = manager.create_session()
     
     @staticmethod
     def get_manager() -> MarshmallowManager:
-        """Get the MarshmallowManager from session state."""
+        """Get the shared MarshmallowManager from session state."""
         return st.session_state[SessionState.MANAGER]
     
     @staticmethod
-    def setup_initial_state(storage_type: str) -> None:
+    def get_user_session() -> UserSession:
+        """Get this browser session's UserSession from session state."""
+        return st.session_state[SessionState.USER_SESSION]
+    
+    @staticmethod
+    def setup_initial_state(storage_type: str, page_size: int = DEFAULT_PAGE_SIZE,
+                            metrics_log: Optional[str] = None) -> None:
         """
         Set up all initial session state values.
         
         Args:
             storage_type: Storage type for manager
+            page_size: Initial number of questions per page in the See All tab
+            metrics_log: Optional JSON-lines file for metrics events
         """
         # Initialize manager
-        SessionState.initialize_manager(storage_type)
+        SessionState.initialize_manager(storage_type, metrics_log)
         
         # Initialize UI state
         SessionState.initialize_if_missing(SessionState.ADMIN_VIEW, False)
@@ -69,6 +124,14 @@ class SessionState:
         SessionState.initialize_if_missing(SessionState.CURRENT_TAB, 0)
         SessionState.initialize_if_missing(SessionState.RANDOM_QUESTION, None)
         SessionState.initialize_if_missing(SessionState.LAST_SORT_OPTION, "newest")
+        SessionState.initialize_if_missing(SessionState.PAGE_SIZE, page_size)
+        SessionState.initialize_if_missing(SessionState.PAGE_CURSORS, [None])
+        SessionState.initialize_if_missing(SessionState.PAGE_QUERY, None)
+        SessionState.initialize_if_missing(SessionState.SHUFFLED_IDS, [])
+        SessionState.initialize_if_missing(SessionState.REMOVED_IDS, set())
+        SessionState.initialize_if_missing(SessionState.SEEN_VERSION,
+                                           SessionState.get_manager().version)
+        SessionState.initialize_if_missing(SessionState.SHOWN_VERSIONS, {})
     
     @staticmethod
     def toggle_admin_view() -> None:
@@ -95,6 +158,36 @@ class SessionState:
     def store_random_question(question: Dict) -> None:
         """Store the currently displayed random question."""
         st.session_state[SessionState.RANDOM_QUESTION] = question
+    
+    @staticmethod
+    def mark_shown(q: Dict) -> None:
+        """Record which version of a question is on screen (see auto_refresh)."""
+        st.session_state[SessionState.SHOWN_VERSIONS][q["id"]] = q["version"]
+    
+    @staticmethod
+    def reset_paging(query: Tuple) -> None:
+        """
+        Go back to the first page if the See All query has changed.
+        
+        Args:
+            query: (sort option, status filter, page size) of the current view
+        """
+        if st.session_state[SessionState.PAGE_QUERY] != query:
+            st.session_state[SessionState.PAGE_QUERY] = query
+            st.session_state[SessionState.PAGE_CURSORS] = [None]
+            st.session_state[SessionState.SHUFFLED_IDS] = []
+    
+    @staticmethod
+    def next_page(cursor: str) -> None:
+        """Move to the page starting at the given cursor."""
+        st.session_state[SessionState.PAGE_CURSORS].append(cursor)
+    
+    @staticmethod
+    def previous_page() -> None:
+        """Move back one page."""
+        cursors = st.session_state[SessionState.PAGE_CURSORS]
+        if len(cursors) > 1:
+            cursors.pop()
 
 
 def setup_page():
@@ -138,24 +231,91 @@ def setup_page():
     """, unsafe_allow_html=True)
 
 
-def log_debug_info(message: str):
+def log_debug_info(message: Union[str, Callable[[], str]]):
     """
     Log debug information when debug mode is enabled.
     
+    Pass a callable for messages that are expensive to build (e.g. ones
+    that format every question): it is only called in debug mode.
+    
     Args:
-        message: Debug message to display
+        message: Debug message to display, or a callable returning it
     """
     if st.session_state.get(SessionState.DEBUG_MODE, False):
+        if callable(message):
+            message = message()
         st.markdown(f"<div class='debug-info'>Debug - {message}</div>", unsafe_allow_html=True)
 
 
+def update_question(q: Dict, action: Callable[[], Any]) -> None:
+    """
+    Button callback: change a question and bring its card's copy up to date.
+    
+    Runs before the fragment holding the button reruns, so the card redraws
+    with the new state without a full-app rerun. Also records when the click
+    was handled so the redraw can report its latency in debug mode.
+    
+    Args:
+        q: The question dictionary the card was rendered from
+        action: Manager call that applies the change
+    """
+    st.session_state[SessionState.CLICK_STARTED] = time.perf_counter()
+    try:
+        action()
+    except RateLimitExceeded as e:
+        # Shown by the card when its fragment reruns
+        st.session_state[SessionState.THROTTLED] = str(e)
+        return
+    fresh = SessionState.get_manager().get_question_by_id(q["id"])
+    if fresh is None:
+        st.session_state[SessionState.REMOVED_IDS].add(q["id"])
+        st.session_state[SessionState.SHOWN_VERSIONS].pop(q["id"], None)
+    elif fresh is not q:
+        # Storage returned a copy (e.g. SQLite): refresh the card's dict
+        q.update(fresh)
+
+
+def report_update_latency() -> None:
+    """Show how long the last button click took to redraw (debug mode only)."""
+    started = st.session_state.pop(SessionState.CLICK_STARTED, None)
+    if started is not None:
+        log_debug_info(f"Click-to-update: {(time.perf_counter() - started) * 1000:.1f} ms")
+
+
+def report_throttled() -> None:
+    """Show why the last button click was refused, if it hit a rate limit."""
+    message = st.session_state.pop(SessionState.THROTTLED, None)
+    if message is not None:
+        st.warning(message)
+
+
+def vote_button(q: Dict, key: str) -> None:
+    """
+    Show a question's vote button, or its unvote button if this user already voted.
+    
+    Args:
+        q: Question dictionary
+        key: Widget key for the button
+    """
+    manager = SessionState.get_manager()
+    # Display names can collide; the session ID is unique per browser session
+    user_id = SessionState.get_user_session().session_id
+    if manager.has_voted(q["id"], user_id):
+        label, action = f"👎 Unvote ({q['votes']})", manager.unvote_question
+    else:
+        label, action = f"👍 Vote ({q['votes']})", manager.vote_for_question
+    st.button(label, key=key, on_click=update_question,
+              args=(q, functools.partial(action, q["id"], user_id)))
+
+
 # Use st.fragment directly without custom decorator
 @st.fragment
 def add_marshmallow_tab():
     """Render the Add a Marshmallow tab."""
     manager = SessionState.get_manager()
+    user_session = SessionState.get_user_session()
     
-    st.markdown(f"You are participating as: <span class='user-id'>{manager.user_id}</span>", unsafe_allow_html=True)
+    st.markdown(f"You are participating as: <span class='user-id'>{user_session.user_id}</span>", unsafe_allow_html=True)
     
     with st.form("question_form"):
         question_input = st.text_area(
@@ -166,12 +326,24 @@ def add_marshmallow_tab():
         submit_button = st.form_submit_button("Submit Marshmallow")
         
         if submit_button:
-            if manager.add_question(question_input):
-                st.success("Your marshmallow has been tossed into the pile!")
-                log_debug_info(f"After add: {manager.questions}")
-                st.balloons()
-            else:
-                st.error("Please enter a question before submitting.")
+            try:
+                # Rewordings of a question already on the board count as a vote
+                # for it instead of splitting its votes; checked and applied in
+                # one call, so nothing can change in between
+                merged = []
+                added = manager.add_question(question_input, user_id=user_session.session_id,
+                                             on_duplicate="merge", on_merge=merged.append)
+                if merged:
+                    st.info(f"A very similar marshmallow is already in the pile, so your vote went to it: "
+                            f"\"{merged[0]['text']}\"")
+                elif added:
+                    st.success("Your marshmallow has been tossed into the pile!")
+                    log_debug_info(lambda: f"After add: {manager.questions}")
+                    st.balloons()
+                else:
+                    st.error("Please enter a question before submitting.")
+            except RateLimitExceeded as e:
+                st.warning(str(e))
 
 
 @st.fragment
@@ -183,27 +355,34 @@ def random_marshmallow_tab():
     st.write("Click the button below to get a random question someone has submitted anonymously.")
     
     # Debug info
-    log_debug_info(f"Session questions: {len(manager.questions)}")
-    log_debug_info(f"Questions content: {manager.questions}")
+    log_debug_info(lambda: f"Session questions: {manager.count_questions()}")
+    log_debug_info(lambda: f"Questions content: {manager.questions}")
     
     if st.button("Pick a Random Marshmallow"):
-        random_question = manager.get_random_question()
-        if random_question:
-            # Store in session state for voting
-            SessionState.store_random_question(random_question)
-            
-            st.markdown(f"""
-            <div class='marshmallow-card'>
-                <div class='question-text'>"{random_question["text"]}"</div>
-            </div>
-            """, unsafe_allow_html=True)
-            
-            # Add voting option for random questions
-            if st.button(f"👍 Vote ({random_question['votes']})", key=f"vote_random_{random_question['id']}"):
-                manager.vote_for_question(random_question['id'])
-                st.rerun()  # Rerun the page
-        else:
+        # Store in session state so it stays on screen for voting
+        SessionState.store_random_question(
+            manager.get_random_question(SessionState.get_user_session())
+        )
+        if st.session_state[SessionState.RANDOM_QUESTION] is None:
             st.info("No marshmallows available. Be the first to add one!")
+    
+    random_question = st.session_state[SessionState.RANDOM_QUESTION]
+    if random_question is not None and random_question["id"] in st.session_state[SessionState.REMOVED_IDS]:
+        SessionState.store_random_question(None)
+        random_question = None
+    
+    if random_question is not None:
+        SessionState.mark_shown(random_question)
+        st.markdown(f"""
+        <div class='marshmallow-card'>
+            <div class='question-text'>"{random_question["text"]}"</div>
+        </div>
+        """, unsafe_allow_html=True)
+        
+        # Voting reruns only this tab's fragment
+        vote_button(random_question, f"vote_random_{random_question['id']}")
+        report_throttled()
+        report_update_latency()
 
 
 @st.fragment
@@ -211,11 +390,22 @@ def display_question(q, is_admin=False):
     """
     Display a single question with its controls.
     
+    Each card is its own fragment. Its buttons apply their change in a
+    callback, and the click reruns only this fragment, so just this card
+    is redrawn.
+    
     Args:
         q: Question dictionary
         is_admin: Whether to show admin controls
     """
     manager = SessionState.get_manager()
+    if q["id"] in st.session_state[SessionState.REMOVED_IDS]:
+        return  # Deleted since the page was fetched
+    SessionState.mark_shown(q)
+    
+    def button(label: str, key: str, action: Callable, *args) -> None:
+        st.button(label, key=key, on_click=update_question,
+                  args=(q, functools.partial(action, q['id'], *args)))
     
     card_class = "marshmallow-card"
     if is_admin:
@@ -242,34 +432,25 @@ def display_question(q, is_admin=False):
             
             with col1:
                 if q["status"] == "pending":
-                    if st.button(f"Approve #{q['id']}", key=f"approve_{q['id']}"):
-                        manager.set_question_status(q['id'], "approved")
-                        st.rerun()
+                    button(f"Approve #{q['id']}", f"approve_{q['id']}", manager.set_question_status, "approved")
                 else:
-                    if st.button(f"Hide #{q['id']}", key=f"hide_{q['id']}"):
-                        manager.set_question_status(q['id'], "pending")
-                        st.rerun()
+                    button(f"Hide #{q['id']}", f"hide_{q['id']}", manager.set_question_status, "pending")
             
             with col2:
                 if not q["highlighted"]:
-                    if st.button(f"Highlight #{q['id']}", key=f"highlight_{q['id']}"):
-                        manager.highlight_question(q['id'], True)
-                        st.rerun()
+                    button(f"Highlight #{q['id']}", f"highlight_{q['id']}", manager.highlight_question, True)
                 else:
-                    if st.button(f"Unhighlight #{q['id']}", key=f"unhighlight_{q['id']}"):
-                        manager.highlight_question(q['id'], False)
-                        st.rerun()
+                    button(f"Unhighlight #{q['id']}", f"unhighlight_{q['id']}", manager.highlight_question, False)
             
             with col3:
-                if st.button(f"Delete #{q['id']}", key=f"delete_{q['id']}"):
-                    manager.delete_question(q['id'])
-                    st.rerun()
+                button(f"Delete #{q['id']}", f"delete_{q['id']}", manager.delete_question)
         
         # User controls - voting
         if not is_admin:
-            if st.button(f"👍 Vote ({q['votes']})", key=f"vote_{q['id']}"):
-                manager.vote_for_question(q['id'])
-                st.rerun()
+            vote_button(q, f"vote_{q['id']}")
+            report_throttled()
+    
+    report_update_latency()
 
 
 @st.fragment
@@ -277,9 +458,12 @@ def all_marshmallows_tab():
     """Render the See All Marshmallows tab."""
     manager = SessionState.get_manager()
     
+    # Questions deleted from their cards won't be in a freshly fetched page
+    st.session_state[SessionState.REMOVED_IDS] = set()
+    
     # Debug info
-    log_debug_info(f"Tab3 Session questions: {len(manager.questions)}")
-    log_debug_info(f"Tab3 Questions content: {manager.questions}")
+    log_debug_info(lambda: f"Tab3 Session questions: {manager.count_questions()}")
+    log_debug_info(lambda: f"Tab3 Questions content: {manager.questions}")
     
     # Admin authentication
     admin_col1, admin_col2 = st.columns([3, 1])
@@ -314,22 +498,102 @@ def all_marshmallows_tab():
     # Get the actual sort option value
     selected_sort = sort_options[selected_sort_display]
     
-    # Display questions based on sort and admin status
-    if manager.questions:
-        # Sort questions
-        sorted_questions = manager.get_sorted_questions(selected_sort)
+    # Page size selection (the configured size is always one of the choices)
+    page_size = st.session_state[SessionState.PAGE_SIZE]
+    page_size_options = sorted(set(PAGE_SIZE_OPTIONS) | {page_size})
+    page_size = st.selectbox(
+        "Marshmallows per page:",
+        page_size_options,
+        index=page_size_options.index(page_size),
+        key="page_size_selectbox",
+    )
+    st.session_state[SessionState.PAGE_SIZE] = page_size
+    
+    # Display questions based on sort and admin status, leaving pending
+    # questions out for non-admins
+    is_admin = st.session_state.get(SessionState.ADMIN_VIEW, False)
+    status = None if is_admin else "approved"
+    
+    # A search replaces the paged list with the best matches
+    query = st.text_input("Search marshmallows:", key="search_input").strip()
+    if query:
+        results = manager.search_questions(query, status, limit=page_size)
+        for q in results:
+            display_question(q, is_admin)
+        if not results:
+            st.info("No marshmallows match your search.")
+        return
+    
+    total = manager.count_questions(status)
+    if total:
+        SessionState.reset_paging((selected_sort, status, page_size))
+        page_number = len(st.session_state[SessionState.PAGE_CURSORS])
+        page, next_cursor = get_visible_page(manager, selected_sort, status, page_size)
+        
+        # Only the visible page is rendered, so a rerun costs the same
+        # however many questions there are
+        for q in page:
+            display_question(q, is_admin)
         
-        # Display questions
-        for q in sorted_questions:
-            # Skip pending questions for non-admins
-            if q["status"] == "pending" and not st.session_state.get(SessionState.ADMIN_VIEW, False):
-                continue
-                
-            display_question(q, st.session_state.get(SessionState.ADMIN_VIEW, False))
+        first = (page_number - 1) * page_size + 1
+        prev_col, info_col, next_col = st.columns([1, 2, 1])
+        with prev_col:
+            st.button("◀ Previous", key="previous_page", disabled=page_number == 1,
+                      on_click=SessionState.previous_page)
+        with info_col:
+            st.caption(f"Showing {first}–{first + len(page) - 1} of {total}")
+        with next_col:
+            st.button("Next ▶", key="next_page", disabled=next_cursor is None,
+                      on_click=SessionState.next_page, args=(next_cursor,))
     else:
         st.info("No marshmallows have been added yet. Be the first!")
 
 
+def get_visible_page(manager: MarshmallowManager, sort_by: str, status: Optional[str],
+                     page_size: int) -> Tuple[List[Dict], Optional[str]]:
+    """
+    Fetch the page of questions the See All tab is currently on.
+    
+    Newest and most-voted order use the manager's cursor paging. Random
+    order shuffles the question IDs once per query and pages through that
+    list, so the order doesn't change on every rerun.
+    
+    Args:
+        manager: The shared manager
+        sort_by: Sort option ("newest", "votes" or "random")
+        status: Only include questions with this status (None for all)
+        page_size: Number of questions per page
+        
+    Returns:
+        Tuple of (questions on the page, cursor of the next page or None)
+    """
+    cursors = st.session_state[SessionState.PAGE_CURSORS]
+    if sort_by != "random":
+        try:
+            return manager.get_questions_page(sort_by, status, limit=page_size, cursor=cursors[-1])
+        except ValueError:
+            # Stale cursor (e.g. after a storage change): start over
+            cursors[:] = [None]
+            return manager.get_questions_page(sort_by, status, limit=page_size)
+    
+    if not st.session_state[SessionState.SHUFFLED_IDS]:
+        ids = [q["id"] for q in manager.get_sorted_questions("newest", status)]
+        random.shuffle(ids)
+        st.session_state[SessionState.SHUFFLED_IDS] = ids
+    ids = st.session_state[SessionState.SHUFFLED_IDS]
+    
+    # Random-order cursors are plain offsets into the shuffled IDs
+    start = cursors[-1] or 0
+    page = []
+    for offset in range(start, len(ids)):
+        if len(page) == page_size:
+            return page, offset
+        q = manager.get_question_by_id(ids[offset])
+        if q is not None and (status is None or q["status"] == status):
+            page.append(q)
+    return page, None
+
+
 @st.fragment
 def admin_section():
     """Render the admin controls section at the bottom of the page."""
@@ -343,6 +607,7 @@ def admin_section():
             st.markdown("### Admin Controls")
             if st.button("Clear All Marshmallows"):
                 manager.clear_all_questions()
+                SessionState.store_random_question(None)
                 st.rerun()  # Full rerun since this is a major change
     
     with col2:
@@ -353,24 +618,121 @@ def admin_section():
             key="debug_toggle", 
             on_change=SessionState.toggle_debug_mode
         )
+    
+    if st.session_state.get(SessionState.DEBUG_MODE, False):
+        metrics_panel()
+
+
+@st.fragment
+def metrics_panel():
+    """Render live operation counts and latency percentiles (Debug Mode)."""
+    manager = SessionState.get_manager()
+    if manager.metrics is None:
+        return
+    
+    st.markdown("### Operation Metrics")
+    rows = summary_table(manager.metrics.summary())
+    if rows:
+        st.table(rows)
+    else:
+        st.caption("No operations recorded yet.")
+    st.button("Refresh Metrics", key="refresh_metrics")  # Reruns just this panel
+
+
+@st.fragment(run_every=AUTO_REFRESH_SECONDS)
+def auto_refresh():
+    """
+    Rerun the app when other users' changes affect what this session shows.
+    
+    Runs every AUTO_REFRESH_SECONDS and renders nothing. While the store's
+    change version hasn't moved, that is all it costs: one version check,
+    no query and no redraw. Otherwise it fetches only the changes since
+    the version it last saw, and reruns the app if they touch a question
+    on screen (at a version other than the one shown), or could add one
+    to the first page of the newest or most-voted list.
+    """
+    manager = SessionState.get_manager()
+    seen = st.session_state[SessionState.SEEN_VERSION]
+    if manager.version == seen:
+        return
+    changes = manager.changes_since(seen)
+    st.session_state[SessionState.SEEN_VERSION] = changes["version"]
+    
+    # Keep the random pick's copy current (storage may hand out copies)
+    random_question = st.session_state[SessionState.RANDOM_QUESTION]
+    if random_question is not None:
+        if changes["reset"] or random_question["id"] in changes["deleted"]:
+            SessionState.store_random_question(manager.get_question_by_id(random_question["id"]))
+        for q in changes["updated"]:
+            if q["id"] == random_question["id"]:
+                SessionState.store_random_question(q)
+    
+    if is_view_stale(changes):
+        st.rerun()
 
 
-def run_streamlit_app(storage_type: str = "memory"):
+def is_view_stale(changes: Dict) -> bool:
+    """
+    Check whether changes to the store affect what this session shows.
+    
+    Args:
+        changes: Result of MarshmallowManager.changes_since for the version
+            the session last saw
+        
+    Returns:
+        bool: True if the app should rerun to show them
+    """
+    if changes["reset"]:
+        return True
+    shown = st.session_state[SessionState.SHOWN_VERSIONS]
+    if any(question_id in shown for question_id in changes["deleted"]):
+        return True
+    for q in changes["updated"]:
+        if q["id"] in shown and shown[q["id"]] != q["version"]:
+            return True
+    
+    # Questions not on screen only matter if they may move onto the first
+    # page of a sorted list (a later page, a shuffle or a search stays put)
+    on_first_page = (st.session_state[SessionState.SORT_OPTION] != "random"
+                     and len(st.session_state[SessionState.PAGE_CURSORS]) == 1
+                     and not st.session_state.get("search_input", "").strip())
+    if not on_first_page:
+        return False
+    status = None if st.session_state.get(SessionState.ADMIN_VIEW, False) else "approved"
+    return any(q["id"] not in shown and (status is None or q["status"] == status)
+               for q in changes["added"] + changes["updated"])
+
+
+def run_streamlit_app(storage_type: str = "memory", page_size: int = DEFAULT_PAGE_SIZE,
+                      metrics_log: Optional[str] = None):
     """
     Run the Streamlit GUI application.
     
     Args:
         storage_type: Type of storage to use ("memory" or "file")
+        page_size: Initial number of questions per page in the See All tab
+        metrics_log: Optional JSON-lines file to append operation metrics to
     """
     # Setup page layout and styling
     setup_page()
     
     # Initialize session state
-    SessionState.setup_initial_state(storage_type)
+    SessionState.setup_initial_state(storage_type, page_size, metrics_log)
     
     # Create header
     st.markdown("<h1 class='main-header'>Marshmallows - Anonymous Questions</h1>", unsafe_allow_html=True)
     
+    # The data file loads in the background when the server starts; show
+    # the page header and a spinner rather than a blank page meanwhile
+    manager = SessionState.get_manager()
+    if not manager.wait_until_loaded(0):
+        with st.spinner("Loading questions..."):
+            manager.wait_until_loaded()
+    
+    # This run shows every change so far; auto_refresh watches for newer ones
+    st.session_state[SessionState.SEEN_VERSION] = manager.version
+    st.session_state[SessionState.SHOWN_VERSIONS] = {}
+    
     # Create tabs for different functionalities
     tab1, tab2, tab3 = st.tabs(["Add a Marshmallow", "Pick a Random Marshmallow", "See All Marshmallows"])
     
@@ -391,4 +753,7 @@ def run_streamlit_app(storage_type: str = "memory"):
         all_marshmallows_tab()
     
     # Admin controls at the bottom
-    admin_section()
\ No newline at end of file
+    admin_section()
+    
+    # Pick up other users' changes without a page reload
+    auto_refresh()
\ No newline at end of file
@@ -0,0 +1,21 @@
+"""
+Marshmallows - Anonymous Questions (HTTP/JSON API)
+
+This is the main entry point for the headless API server.
+Run this file with "python server.py" to start it, then open
+http://127.0.0.1:8000/questions (see marshmallow_lib/http_api.py for the endpoints).
+"""
+
+import argparse
+
+from marshmallow_lib.http_api import DEFAULT_HOST, DEFAULT_PORT, run_http_server
+
+# Run the API server
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Marshmallows HTTP/JSON API server")
+    parser.add_argument("--host", default=DEFAULT_HOST, help="Interface to listen on")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="Port to listen on")
+    # By default, use "file" storage for persistence between runs
+    parser.add_argument("--storage", default="file", help="Storage type (memory, file, log or sqlite)")
+    args = parser.parse_args()
+    run_http_server(storage_type=args.storage, host=args.host, port=args.port)
@@ -9,4 +9,21 @@ from pathlib import Path
 
 # Add the parent directory to sys.path so we can import the marshmallow_lib module
 parent_dir = Path(__file__).parent.parent
-sys.path.append(str(parent_dir))
\ No newline at end of file
+sys.path.append(str(parent_dir))
+
+
+DEFAULT_RENDER_BUDGET_MS = 500
+
+
+def pytest_addoption(parser):
+    """Add the command line options used by the Streamlit render tests."""
+    parser.addoption(
+        "--render-budget-ms", type=float, default=DEFAULT_RENDER_BUDGET_MS,
+        help="Maximum script-run latency of one Streamlit tab render, in milliseconds",
+    )
+
+
+@pytest.fixture
+def render_budget_ms(request):
+    """Latency budget for one Streamlit tab render (--render-budget-ms)."""
+    return request.config.getoption("--render-budget-ms")
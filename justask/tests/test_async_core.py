@@ -0,0 +1,131 @@
+"""
+Unit tests for the asyncio interface of the Marshmallows application.
+"""
+
+import asyncio
+import time
+from marshmallow_lib.async_core import AsyncMarshmallowManager
+from marshmallow_lib.core import MarshmallowManager
+from marshmallow_lib.metrics import Metrics
+
+
+def without_timestamps(value):
+    """Copy a result with the questions' timestamps (which differ per run) left out."""
+    if hasattr(value, "keys"):
+        return {k: v for k, v in dict(value).items() if k != "timestamp"}
+    if isinstance(value, (list, tuple)):
+        return type(value)(without_timestamps(v) for v in value)
+    return value
+
+
+class TestAsyncManager:
+    """Tests for the AsyncMarshmallowManager class."""
+
+    def test_matches_sync_manager(self):
+        """Test that the same calls give the same results as the sync class."""
+        sync = MarshmallowManager()
+
+        async def scenario(manager):
+            results = [
+                await manager.add_question("How do lists work?", user_id="Blue Owl"),
+                await manager.add_question("   "),
+                await manager.add_question("What is a tuple?", user_id="Red Fox"),
+                await manager.vote_for_question(1, "Blue Owl"),
+                await manager.vote_for_question(1, "Blue Owl"),
+                await manager.vote_for_question(99),
+                await manager.has_voted(1, "Blue Owl"),
+                await manager.unvote_question(1, "Blue Owl"),
+                await manager.highlight_question(0, True),
+                await manager.set_question_status(1, "pending"),
+                await manager.count_questions("approved"),
+                await manager.search_questions("tuple"),
+                await manager.get_questions_page("votes", limit=1),
+                await manager.delete_question(0),
+                await manager.get_question_by_id(0),
+            ]
+            return [without_timestamps(r) for r in results]
+
+        async def run_async():
+            async with await AsyncMarshmallowManager.open() as manager:
+                return await scenario(manager)
+
+        class SyncAdapter:
+            """Awaitable facade calling the sync manager inline."""
+
+            def __getattr__(self, name):
+                method = getattr(sync, name)
+
+                async def call(*args, **kwargs):
+                    return method(*args, **kwargs)
+                return call
+
+        assert asyncio.run(run_async()) == asyncio.run(scenario(SyncAdapter()))
+
+    def test_concurrent_mutations_are_coalesced(self, tmp_path):
+        """Test that a burst of concurrent votes is saved in a few writes, not one each."""
+        path = tmp_path / "data.json"
+        metrics = Metrics()
+
+        async def burst():
+            manager = await AsyncMarshmallowManager.open(storage_type="file", storage_path=path,
+                                                         metrics=metrics)
+            await manager.add_question("Popular question")
+            results = await asyncio.gather(*(manager.vote_for_question(0, f"user {i}")
+                                             for i in range(500)))
+            await manager.close()
+            return results
+
+        assert all(asyncio.run(burst()))
+        assert metrics.summary()["save_questions"]["writes"] < 50
+
+        # Every vote was saved before its await returned
+        reloaded = MarshmallowManager(storage_type="file", storage_path=path)
+        assert reloaded.question_map[0]["votes"] == 500
+        assert reloaded.has_voted(0, "user 499")
+
+    def test_errors_stay_with_their_call(self):
+        """Test that a failing mutation doesn't fail the others in its batch."""
+        async def mixed():
+            manager = AsyncMarshmallowManager(MarshmallowManager())
+            results = await asyncio.gather(
+                manager.add_question("First"),
+                manager.add_question("Second", on_duplicate="ignore"),
+                manager.add_question("Third"),
+                return_exceptions=True,
+            )
+            count = await manager.count_questions()
+            await manager.close()
+            return results, count
+
+        results, count = asyncio.run(mixed())
+        assert results[0] is True and results[2] is True
+        assert isinstance(results[1], ValueError)
+        assert count == 2
+
+    def test_slow_save_does_not_block_the_loop(self, tmp_path):
+        """Test that the event loop keeps running while the data file is written."""
+        async def measure():
+            manager = await AsyncMarshmallowManager.open(storage_type="file",
+                                                         storage_path=tmp_path / "data.json")
+            save = manager.manager.save_questions
+
+            def slow_save():
+                time.sleep(0.2)
+                save()
+            manager.manager.save_questions = slow_save
+
+            ticks = 0
+
+            async def heartbeat():
+                nonlocal ticks
+                while True:
+                    await asyncio.sleep(0.01)
+                    ticks += 1
+
+            task = asyncio.ensure_future(heartbeat())
+            await manager.add_question("Slow to save")
+            task.cancel()
+            await manager.close()
+            return ticks
+
+        assert asyncio.run(measure()) >= 10
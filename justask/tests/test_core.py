@@ -3,8 +3,13 @@ Unit tests for the core functionality of the Marshmallows application.
 """
 
 import pytest
+import base64
 import datetime
+import json
+import threading
 from marshmallow_lib.core import MarshmallowManager
+from marshmallow_lib.metrics import Metrics
+from marshmallow_lib.ratelimit import Limit, RateLimiter, RateLimitExceeded
 
 
 class TestMarshmallowManager:
@@ -159,4 +164,439 @@ class TestMarshmallowManager:
         assert len(manager.questions) == 0
         assert len(manager.question_map) == 0
         assert len(manager.viewed_questions) == 0
-        assert manager.next_id == 0
\ No newline at end of file
+        assert manager.next_id == 0
+    
+    def test_vote_order_is_maintained_incrementally(self):
+        """Test that vote ordering follows votes and deletes without re-sorting."""
+        manager = MarshmallowManager()
+        for i in range(5):
+            manager.add_question(f"Question {i}")
+        
+        manager.vote_for_question(3)
+        manager.vote_for_question(3)
+        manager.vote_for_question(1)
+        assert [q["id"] for q in manager.get_sorted_questions("votes")] == [3, 1, 0, 2, 4]
+        
+        manager.delete_question(3)
+        manager.vote_for_question(4)
+        manager.vote_for_question(4)
+        assert [q["id"] for q in manager.get_sorted_questions("votes")] == [4, 1, 0, 2]
+        assert [q["id"] for q in manager.get_sorted_questions("newest")] == [4, 2, 1, 0]
+        
+        # Status filtering keeps the order
+        manager.set_question_status(1, "pending")
+        assert [q["id"] for q in manager.get_sorted_questions("votes", "approved")] == [4, 0, 2]
+        
+        # Clearing resets the index
+        manager.clear_all_questions()
+        assert manager.get_sorted_questions("votes") == []
+    
+    def test_delete_keeps_insertion_order(self):
+        """Test that deleting from the middle keeps the remaining order."""
+        manager = MarshmallowManager()
+        for i in range(5):
+            manager.add_question(f"Question {i}")
+        
+        assert manager.delete_question(2)
+        assert not manager.delete_question(2)
+        assert [q["id"] for q in manager.questions] == [0, 1, 3, 4]
+        assert [q["id"] for q in manager.get_sorted_questions("unknown")] == [0, 1, 3, 4]
+        
+        manager.add_question("Question 5")
+        assert [q["id"] for q in manager.questions] == [0, 1, 3, 4, 5]
+        assert manager.count_questions() == 5
+    
+    def test_random_question_cycles_through_approved(self):
+        """Test that random picks see every approved question before repeating."""
+        manager = MarshmallowManager()
+        for i in range(6):
+            manager.add_question(f"Question {i}")
+        manager.set_question_status(2, "pending")
+        manager.delete_question(4)
+        
+        seen = [manager.get_random_question()["id"] for _ in range(4)]
+        assert sorted(seen) == [0, 1, 3, 5]
+        assert manager.viewed_questions == {0, 1, 3, 5}
+        
+        # Re-approving a viewed question doesn't put it back in the pool
+        manager.set_question_status(seen[0], "pending")
+        manager.set_question_status(seen[0], "approved")
+        manager.set_question_status(2, "approved")
+        assert manager.get_random_question()["id"] == 2
+        
+        # Once everything has been viewed the pool resets
+        next_pick = manager.get_random_question()
+        assert next_pick["id"] in {0, 1, 2, 3, 5}
+        assert manager.viewed_questions == {next_pick["id"]}
+        
+        # Hidden questions are never picked
+        for q_id in (0, 1, 2, 3, 5):
+            manager.set_question_status(q_id, "pending")
+        assert manager.get_random_question() is None
+    
+    def test_sessions_have_independent_views(self):
+        """Test that each user session tracks its own viewed questions."""
+        manager = MarshmallowManager()
+        alice = manager.create_session()
+        bob = manager.create_session("Blue Penguin")
+        assert bob.user_id == "Blue Penguin"
+        assert alice.session_id != bob.session_id
+        
+        manager.add_question("Q1", user_id=alice.user_id)
+        manager.add_question("Q2", user_id=bob.user_id)
+        assert manager.question_map[1]["user_id"] == "Blue Penguin"
+        
+        first = manager.get_random_question(alice)
+        second = manager.get_random_question(alice)
+        assert {first["id"], second["id"]} == {0, 1}
+        assert alice.viewed_questions == {0, 1}
+        
+        # Bob and the default session haven't seen anything yet
+        assert bob.viewed_questions == set()
+        assert manager.viewed_questions == set()
+        manager.get_random_question(bob)
+        assert len(bob.viewed_questions) == 1
+        
+        # Deleting a question removes it from every session
+        manager.delete_question(0)
+        assert 0 not in alice.viewed_questions
+    
+    def test_sessions_share_the_random_pool(self):
+        """Test that sessions only get their own pool once they have seen most of the board."""
+        manager = MarshmallowManager()
+        for i in range(100):
+            manager.add_question(f"Question {i}")
+        sessions = [manager.create_session() for _ in range(50)]
+        manager.get_random_question(sessions[0])
+        assert all(session.unviewed_ids is None for session in sessions)
+        
+        # Seeing everything but one question ends with a private pool (no
+        # rejection sampling, which could luckily hit the one question left)
+        manager.PICK_ATTEMPTS = 0
+        viewer = sessions[1]
+        viewer.viewed_questions = set(range(99))
+        assert manager.get_random_question(viewer)["id"] == 99
+        assert viewer.unviewed_ids is not None and len(viewer.unviewed_ids) == 0
+        
+        # ... which is kept up to date and dropped again on reset
+        manager.add_question("Question 100")
+        assert manager.get_random_question(viewer)["id"] == 100
+        assert manager.get_random_question(viewer)["id"] in range(101)
+        assert viewer.unviewed_ids is None and len(viewer.viewed_questions) == 1
+    
+    def test_concurrent_adds_and_votes(self):
+        """Test that threads sharing one manager don't lose updates."""
+        manager = MarshmallowManager()
+        manager.add_question("Shared question")
+        
+        def worker(n):
+            session = manager.create_session()
+            for i in range(200):
+                manager.add_question(f"Question {n}-{i}", user_id=session.user_id)
+                manager.vote_for_question(0)
+                manager.get_random_question(session)
+        
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        
+        assert manager.count_questions() == 1 + 8 * 200
+        assert manager.next_id == 1 + 8 * 200
+        assert manager.question_map[0]["votes"] == 8 * 200
+        assert manager.get_sorted_questions("votes")[0]["id"] == 0
+    
+    def test_questions_page(self):
+        """Test paging through questions with cursors."""
+        manager = MarshmallowManager()
+        for i in range(25):
+            manager.add_question(f"Question {i}")
+        for i in range(0, 25, 3):
+            manager.vote_for_question(i)
+        manager.set_question_status(4, "pending")
+        
+        for sort_by in ("newest", "votes"):
+            for status in (None, "approved", "pending"):
+                pages, cursor = [], None
+                while True:
+                    page, cursor = manager.get_questions_page(sort_by, status, limit=7, cursor=cursor)
+                    pages.append(page)
+                    if cursor is None:
+                        break
+                assert all(len(page) == 7 for page in pages[:-1])
+                paged_ids = [q["id"] for page in pages for q in page]
+                assert paged_ids == [q["id"] for q in manager.get_sorted_questions(sort_by, status)]
+        
+        assert manager.get_questions_page("votes", limit=1)[0][0]["id"] == 0
+        assert manager.get_questions_page("newest", "pending") == ([manager.question_map[4]], None)
+    
+    def test_questions_page_cursor_is_stable(self):
+        """Test that inserts and votes between pages don't shift later pages."""
+        manager = MarshmallowManager()
+        for i in range(10):
+            manager.add_question(f"Question {i}")
+        
+        newest, newest_cursor = manager.get_questions_page("newest", limit=4)
+        by_votes, votes_cursor = manager.get_questions_page("votes", limit=4)
+        assert [q["id"] for q in newest] == [9, 8, 7, 6]
+        assert [q["id"] for q in by_votes] == [0, 1, 2, 3]
+        
+        # A new question lands above the cursor; votes move questions across it
+        manager.add_question("Late question")
+        manager.vote_for_question(7)
+        manager.vote_for_question(5)
+        
+        newest, _ = manager.get_questions_page("newest", limit=4, cursor=newest_cursor)
+        by_votes, _ = manager.get_questions_page("votes", limit=4, cursor=votes_cursor)
+        assert [q["id"] for q in newest] == [5, 4, 3, 2]
+        assert [q["id"] for q in by_votes] == [4, 6, 8, 9]
+    
+    def test_questions_page_rejects_bad_input(self):
+        """Test that unsupported sorts and foreign or corrupt cursors are rejected."""
+        manager = MarshmallowManager()
+        for i in range(3):
+            manager.add_question(f"Question {i}")
+        _, cursor = manager.get_questions_page("newest", limit=1)
+        
+        with pytest.raises(ValueError):
+            manager.get_questions_page("random")
+        with pytest.raises(ValueError):
+            manager.get_questions_page("newest", limit=0)
+        with pytest.raises(ValueError):
+            manager.get_questions_page("votes", cursor=cursor)
+        with pytest.raises(ValueError):
+            manager.get_questions_page("newest", "approved", cursor=cursor)
+        with pytest.raises(ValueError):
+            manager.get_questions_page("newest", cursor="not a cursor")
+    
+    @pytest.mark.parametrize("key", [["-3", 2], [-3, "2"], [None, 2], [True, 2], [-3, 2.5]])
+    def test_questions_page_rejects_forged_cursor(self, key):
+        """Test that a well-formed cursor with wrongly typed key elements is rejected."""
+        manager = MarshmallowManager()
+        for i in range(3):
+            manager.add_question(f"Question {i}")
+        for sort_by in ("newest", "votes"):
+            cursor = base64.urlsafe_b64encode(json.dumps([sort_by, None, *key]).encode()).decode()
+            with pytest.raises(ValueError):
+                manager.get_questions_page(sort_by, cursor=cursor)
+    
+    def test_search_questions(self):
+        """Test that search follows adds, deletes and status changes."""
+        manager = MarshmallowManager()
+        manager.add_question("How do for loops work?")
+        manager.add_question("What is a Python list?")
+        assert manager.search_questions("python") == [manager.question_map[1]]
+        
+        # The index is built by the first search, then kept up to date
+        manager.add_question("Python loops or list comprehensions?")
+        assert [q["id"] for q in manager.search_questions("python", limit=1)] == [2]
+        assert {q["id"] for q in manager.search_questions("loo")} == {0, 2}
+        
+        manager.set_question_status(2, "pending")
+        assert [q["id"] for q in manager.search_questions("python", "approved")] == [1]
+        manager.delete_question(1)
+        assert [q["id"] for q in manager.search_questions("python")] == [2]
+        
+        manager.clear_all_questions()
+        assert manager.search_questions("python") == []
+        assert manager.search_questions("") == []
+    
+    def test_near_duplicates(self):
+        """Test finding near-duplicates and the add_question policies."""
+        manager = MarshmallowManager()
+        manager.add_question("What is a Python list?")
+        manager.add_question("How do for loops work in Python?")
+        
+        assert manager.find_duplicate("what's a python list")["id"] == 0
+        assert manager.find_duplicate("What is a Python dictionary?") is None
+        
+        assert manager.add_question("What is a python list??", on_duplicate="reject") is False
+        assert manager.add_question("What is a python list??", on_duplicate="merge") is True
+        assert manager.count_questions() == 2
+        assert manager.question_map[0]["votes"] == 1
+        assert manager.add_question("What is a python list??") is True  # Default policy allows
+        assert manager.count_questions() == 3
+        
+        # Deleted and filtered-out questions aren't duplicates
+        manager.delete_question(1)
+        assert manager.find_duplicate("How do for loops work in Python?") is None
+        manager.set_question_status(0, "pending")
+        assert manager.find_duplicate("What is a Python list?", status="approved")["id"] == 2
+        
+        with pytest.raises(ValueError):
+            manager.add_question("Another question", on_duplicate="ignore")
+        with pytest.raises(ValueError):
+            MarshmallowManager(duplicate_policy="ignore")
+    
+    def test_duplicate_policy(self):
+        """Test that the manager's duplicate policy applies to every add."""
+        manager = MarshmallowManager(duplicate_policy="merge", duplicate_threshold=0.6)
+        manager.add_question("How do I read a file in Python?")
+        manager.add_question("Reading a python file")  # Shares 2 of 4 words: 0.5
+        assert manager.count_questions() == 2
+        manager.add_question("python file read")
+        assert manager.count_questions() == 2
+        assert manager.question_map[0]["votes"] == 1
+    
+    def test_merge_reports_the_existing_question(self):
+        """Test that a merge reports where the vote went, and skips hidden questions."""
+        manager = MarshmallowManager()
+        manager.add_question("What is a Python list?")
+        merged = []
+        assert manager.add_question("what's a python list", user_id="Red Fox",
+                                    on_duplicate="merge", on_merge=merged.append)
+        assert [q["id"] for q in merged] == [0]
+        assert manager.has_voted(0, "Red Fox")
+        
+        manager.set_question_status(0, "pending")
+        merged.clear()
+        assert manager.add_question("what's a python list", on_duplicate="merge",
+                                    on_merge=merged.append)
+        assert merged == [] and manager.count_questions() == 2
+
+    
+    def test_one_vote_per_user(self):
+        """Test that a user can vote for a question once and take the vote back."""
+        manager = MarshmallowManager()
+        manager.add_question("First")
+        manager.add_question("Second")
+        
+        assert manager.vote_for_question(0, "Red Fox")
+        assert not manager.vote_for_question(0, "Red Fox")
+        assert manager.vote_for_question(0, "Blue Owl")
+        assert manager.vote_for_question(1, "Red Fox")
+        assert manager.question_map[0]["votes"] == 2
+        assert manager.has_voted(0, "Red Fox")
+        assert not manager.has_voted(0, "Green Cat")
+        
+        # Untracked votes always count
+        assert manager.vote_for_question(1)
+        assert manager.vote_for_question(1)
+        assert manager.question_map[1]["votes"] == 3
+        
+        assert manager.unvote_question(0, "Red Fox")
+        assert not manager.unvote_question(0, "Red Fox")
+        assert not manager.unvote_question(0, "Green Cat")
+        assert not manager.has_voted(0, "Red Fox")
+        assert manager.question_map[0]["votes"] == 1
+        assert manager.get_sorted_questions("votes")[0]["id"] == 1
+        
+        # Deleted questions forget their voters
+        manager.delete_question(0)
+        assert not manager.unvote_question(0, "Blue Owl")
+        assert not manager.has_voted(0, "Blue Owl")
+    
+    def test_compare_and_set(self):
+        """Test that each change bumps the question's version and stale updates fail."""
+        manager = MarshmallowManager()
+        manager.add_question("First")
+        manager.add_question("Second")
+        assert [q["version"] for q in manager.questions] == [1, 2]
+        
+        manager.vote_for_question(0)
+        version = manager.get_question_by_id(0)["version"]
+        assert version == 3
+        
+        assert not manager.highlight_question(0, True, expected_version=1)
+        assert manager.highlight_question(0, True, expected_version=version)
+        assert not manager.set_question_status(0, "pending", expected_version=version)
+        assert manager.set_question_status(0, "pending", expected_version=version + 1)
+        assert not manager.delete_question(0, expected_version=version)
+        assert manager.delete_question(0, expected_version=version + 2)
+        assert manager.get_question_by_id(1)["version"] == 2  # Untouched
+    
+    def test_changes_since(self):
+        """Test that a delta lists only what changed after the caller's version."""
+        manager = MarshmallowManager()
+        for i in range(4):
+            manager.add_question(f"Question {i}")
+        seen = manager.version
+        assert manager.changes_since(seen) == {
+            "version": seen, "reset": False, "added": [], "updated": [], "deleted": []
+        }
+        
+        manager.vote_for_question(1)
+        manager.delete_question(2)
+        manager.add_question("Gone again")
+        manager.delete_question(4)  # Added and deleted since: not listed
+        manager.highlight_question(0, True)
+        manager.add_question("New")
+        changes = manager.changes_since(seen)
+        assert changes["version"] == manager.version > seen
+        assert not changes["reset"]
+        assert [q["id"] for q in changes["added"]] == [5]
+        assert [q["id"] for q in changes["updated"]] == [1, 0]
+        assert changes["deleted"] == [2]
+        assert manager.changes_since(changes["version"])["added"] == []
+    
+    def test_changes_since_reset(self):
+        """Test that a delta the manager can't list returns every question instead."""
+        manager = MarshmallowManager()
+        manager.add_question("Before the clear")
+        seen = manager.version
+        manager.clear_all_questions()
+        manager.add_question("After the clear")
+        
+        changes = manager.changes_since(seen)
+        assert changes["reset"]
+        assert [q["text"] for q in changes["added"]] == ["After the clear"]
+        assert manager.changes_since(manager.version + 1)["reset"]  # From another store
+        
+        manager.questions = [dict(manager.questions[0], text="Replaced")]
+        assert manager.changes_since(changes["version"])["reset"]
+    
+    def test_rate_limiting(self, tmp_path):
+        """Test that throttled adds and votes are refused before touching the store."""
+        limiter = RateLimiter({
+            "add": (Limit(rate=0.01, burst=2), Limit(rate=0.01, burst=100)),
+            "vote": (Limit(rate=0.01, burst=3), Limit(rate=0.01, burst=100)),
+        })
+        metrics = Metrics()
+        manager = MarshmallowManager(storage_type="file", storage_path=tmp_path / "data.json",
+                                     metrics=metrics, rate_limiter=limiter)
+        
+        assert manager.add_question("First", user_id="Red Fox")
+        assert manager.add_question("Second", user_id="Red Fox")
+        with pytest.raises(RateLimitExceeded):
+            manager.add_question("Third", user_id="Red Fox")
+        assert manager.add_question("Third", user_id="Blue Owl")
+        
+        # Untracked votes fall back to the default session's user
+        assert manager.vote_for_question(0)
+        assert manager.vote_for_question(0, "Red Fox")
+        assert manager.unvote_question(0, "Red Fox")
+        assert manager.vote_for_question(0, "Red Fox")
+        with pytest.raises(RateLimitExceeded):
+            manager.vote_for_question(1, "Red Fox")
+        with pytest.raises(RateLimitExceeded):
+            manager.unvote_question(0, "Red Fox")
+        
+        assert manager.count_questions() == 3
+        assert manager.question_map[0]["votes"] == 2
+        summary = metrics.summary()
+        assert summary["add_question"]["throttled"] == 1
+        assert summary["vote_for_question"]["throttled"] == 1
+        assert summary["unvote_question"]["throttled"] == 1
+        # Only the accepted calls were written to disk
+        assert summary["save_questions"]["writes"] == 7
+    
+    def test_merge_takes_one_token(self):
+        """Test that a submission merged into a near-duplicate is charged as an add only."""
+        limiter = RateLimiter({
+            "add": (Limit(rate=0.01, burst=2), Limit(rate=0.01, burst=100)),
+            "vote": (Limit(rate=0.01, burst=1), Limit(rate=0.01, burst=100)),
+        })
+        manager = MarshmallowManager(rate_limiter=limiter)
+        manager.add_question("What is a Python list?", user_id="Blue Owl")
+        assert manager.vote_for_question(0, "Red Fox")  # Red Fox's only vote token
+        
+        assert manager.add_question("what's a python list", user_id="Green Cat",
+                                    on_duplicate="merge")
+        assert manager.question_map[0]["votes"] == 2
+        assert manager.vote_for_question(0, "Green Cat") is False  # Vote token untouched
+        
+        manager.add_question("Another question", user_id="Red Fox")
+        manager.add_question("Yet another", user_id="Red Fox")
+        with pytest.raises(RateLimitExceeded):  # The merge is still an add
+            manager.add_question("what's a python list", user_id="Red Fox", on_duplicate="merge")
@@ -0,0 +1,179 @@
+"""
+Unit tests for the HTTP/JSON API of the Marshmallows application.
+"""
+
+import base64
+import http.client
+import json
+import socket
+import threading
+import pytest
+from marshmallow_lib.core import MarshmallowManager
+from marshmallow_lib.http_api import MarshmallowServer
+from marshmallow_lib.ratelimit import Limit, RateLimiter
+
+
+@pytest.fixture
+def server():
+    """A server on a free port backed by an in-memory manager."""
+    manager = MarshmallowManager()
+    server = MarshmallowServer(("127.0.0.1", 0), manager, admin_password="secret")
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def client(server):
+    """One keep-alive connection to the server."""
+    connection = http.client.HTTPConnection(*server.server_address, timeout=5)
+    yield connection
+    connection.close()
+
+
+def request(client, method, path, body=None, **headers):
+    """Send a request and return (status, headers, parsed JSON body or None)."""
+    data = json.dumps(body).encode() if body is not None else None
+    if data is not None:
+        headers["Content-Type"] = "application/json"
+    client.request(method, path, body=data, headers={k.replace("_", "-"): v for k, v in headers.items()})
+    response = client.getresponse()
+    raw = response.read()
+    return response.status, response.headers, json.loads(raw) if raw else None
+
+
+class TestHTTPAPI:
+    """Tests for the HTTP/JSON API server."""
+
+    def test_add_vote_and_list(self, client):
+        """Test the user endpoints over a single kept-alive connection."""
+        assert request(client, "POST", "/questions", {"text": "What is a list?"},
+                       X_User_Id="Red Fox")[0] == 201
+        assert request(client, "POST", "/questions", {"text": "What is a dict?"})[0] == 201
+        status, _, body = request(client, "POST", "/questions/0/vote", X_User_Id="Blue Owl")
+        assert (status, body) == (200, {"voted": True})
+        assert request(client, "POST", "/questions/0/vote", X_User_Id="Blue Owl")[2] == {"voted": False}
+
+        status, _, body = request(client, "GET", "/questions?sort=votes&limit=1")
+        assert status == 200
+        assert [q["text"] for q in body["questions"]] == ["What is a list?"]
+        assert "user_id" not in body["questions"][0]  # Submitters stay anonymous
+        _, _, second = request(client, "GET", f"/questions?sort=votes&limit=1&cursor={body['next_cursor']}")
+        assert [q["id"] for q in second["questions"]] == [1]
+        assert second["next_cursor"] is None
+
+        assert request(client, "GET", "/questions/0", X_User_Id="Blue Owl")[2]["voted"] is True
+        assert request(client, "DELETE", "/questions/0/vote", X_User_Id="Blue Owl")[2] == {"removed": True}
+        assert request(client, "GET", "/questions?q=dict")[2]["questions"][0]["id"] == 1
+        assert request(client, "GET", "/questions/count")[2] == {"count": 2}
+        assert request(client, "GET", "/questions/random")[2]["question"]["id"] in (0, 1)
+
+        # A reworded copy becomes a vote for the original
+        status, _, body = request(client, "POST", "/questions", {"text": "what is a LIST"},
+                                  X_User_Id="Green Cat")
+        assert status == 200 and body["merged_into"]["id"] == 0
+
+    def test_errors(self, client):
+        """Test the error statuses."""
+        assert request(client, "GET", "/questions/7")[0] == 404
+        assert request(client, "GET", "/nothing")[0] == 404
+        status, headers, _ = request(client, "PUT", "/questions")
+        assert status == 405 and headers["Content-Type"] == "application/json"
+        assert request(client, "POST", "/questions", {"text": " "})[0] == 400
+        assert request(client, "GET", "/questions?sort=random")[0] == 400
+        assert request(client, "GET", "/questions?limit=1000")[0] == 400
+        assert request(client, "GET", "/questions?cursor=garbage")[0] == 400
+        request(client, "POST", "/questions", {"text": "Page me"})
+        forged = base64.urlsafe_b64encode(b'["votes", null, "many", 0]').decode()
+        assert request(client, "GET", f"/questions?sort=votes&cursor={forged}")[0] == 400
+
+    def test_admin_endpoints(self, client):
+        """Test that moderation needs the admin password."""
+        request(client, "POST", "/questions", {"text": "Moderate me"})
+        assert request(client, "DELETE", "/questions/0")[0] == 403
+        status, _, body = request(client, "PATCH", "/questions/0", {"status": "pending", "highlighted": True},
+                                  X_Admin_Password="secret")
+        assert status == 200 and body["status"] == "pending" and body["highlighted"] is True
+        assert request(client, "GET", "/questions/count?status=approved")[2] == {"count": 0}
+        assert request(client, "DELETE", "/questions/0", X_Admin_Password="secret")[0] == 200
+        assert request(client, "DELETE", "/questions/0", X_Admin_Password="secret")[0] == 404
+
+    def test_conditional_get(self, client):
+        """Test that an unchanged listing is answered with 304 Not Modified."""
+        request(client, "POST", "/questions", {"text": "Cache me"})
+        status, headers, _ = request(client, "GET", "/questions")
+        etag = headers["ETag"]
+        assert status == 200 and etag
+
+        status, headers, body = request(client, "GET", "/questions", If_None_Match=etag)
+        assert (status, body, headers["ETag"]) == (304, None, etag)
+
+        request(client, "POST", "/questions/0/vote")
+        status, headers, _ = request(client, "GET", "/questions", If_None_Match=etag)
+        assert status == 200 and headers["ETag"] != etag
+
+    def test_random_question_is_never_cached(self, client):
+        """Test that a random pick always returns a question, as each call uses one up."""
+        request(client, "POST", "/questions", {"text": "Pick me"})
+        status, headers, body = request(client, "GET", "/questions/random")
+        assert status == 200 and "ETag" not in headers
+
+        status, _, body = request(client, "GET", "/questions/random", If_None_Match='"anything"')
+        assert status == 200 and body["question"]["text"] == "Pick me"
+
+    def test_changes(self, client):
+        """Test that a client polling /changes gets only what changed since its version."""
+        request(client, "POST", "/questions", {"text": "First"}, X_User_Id="Red Fox")
+        _, _, body = request(client, "GET", "/changes")
+        assert [q["text"] for q in body["added"]] == ["First"]
+        assert "user_id" not in body["added"][0]
+
+        since = body["version"]
+        request(client, "POST", "/questions/0/vote")
+        request(client, "POST", "/questions", {"text": "Second"})
+        _, _, body = request(client, "GET", f"/changes?since={since}")
+        assert [q["id"] for q in body["added"]] == [1]
+        assert [q["votes"] for q in body["updated"]] == [1]
+        assert body["deleted"] == [] and body["reset"] is False
+        assert request(client, "GET", "/changes?since=soon")[0] == 400
+
+    def test_rate_limited(self, server, client):
+        """Test that throttled calls get 429 with Retry-After."""
+        server.manager.rate_limiter = RateLimiter({"vote": (Limit(rate=0.1, burst=1), Limit(rate=10, burst=10))})
+        request(client, "POST", "/questions", {"text": "Vote spam"})
+        assert request(client, "POST", "/questions/0/vote", X_User_Id="Red Fox")[0] == 200
+        status, headers, _ = request(client, "DELETE", "/questions/0/vote", X_User_Id="Red Fox")
+        assert status == 429
+        assert int(headers["Retry-After"]) >= 1
+
+    def test_resubmitting_spends_add_tokens(self, server, client):
+        """Test that posting a duplicate to vote is limited like any other submission."""
+        server.manager.rate_limiter = RateLimiter({"add": (Limit(rate=0.1, burst=2), Limit(rate=10, burst=10))})
+        assert request(client, "POST", "/questions", {"text": "What is a Python list?"},
+                       X_User_Id="Red Fox")[0] == 201
+        status, _, body = request(client, "POST", "/questions", {"text": "what's a python list"},
+                                  X_User_Id="Blue Owl")
+        assert status == 200 and body["merged_into"]["id"] == 0
+        assert request(client, "POST", "/questions", {"text": "python list?"},
+                       X_User_Id="Blue Owl")[0] == 200
+        assert request(client, "POST", "/questions", {"text": "what is a python list"},
+                       X_User_Id="Blue Owl")[0] == 429
+
+    def test_caller_without_user_id(self, server, client):
+        """Test that a caller without X-User-Id is identified by its address, not a shared ID."""
+        request(client, "POST", "/questions", {"text": "Who am I?"})
+        assert request(client, "POST", "/questions/0/vote")[2] == {"voted": True}
+        assert request(client, "POST", "/questions/0/vote")[2] == {"voted": False}
+        assert server.manager.has_voted(0, "127.0.0.1")
+        assert request(client, "POST", "/questions/0/vote", X_User_Id="Red Fox")[2] == {"voted": True}
+
+    @pytest.mark.parametrize("length", ["-1", "lots", str(10 ** 9)])
+    def test_bad_content_length(self, server, length):
+        """Test that a negative, non-numeric or huge Content-Length is refused without reading."""
+        with socket.create_connection(server.server_address, timeout=5) as sock:
+            sock.sendall(f"POST /questions HTTP/1.1\r\nHost: test\r\nContent-Length: {length}\r\n\r\n"
+                         .encode())
+            response = sock.makefile("rb").readline()
+        assert int(response.split()[1]) in (400, 413)
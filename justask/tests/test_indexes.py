@@ -0,0 +1,124 @@
+"""
+Unit tests for the in-memory index structures of the Marshmallows application.
+"""
+
+import random
+import pytest
+from marshmallow_lib.indexes import ChangeIndex, RandomPool, SortedIndex
+
+
+class TestSortedIndex:
+    """Tests for the SortedIndex class."""
+
+    def test_matches_sorted_list(self, monkeypatch):
+        """Test random inserts and removes against a plain sorted list."""
+        # Small blocks so splits and empty blocks are exercised
+        monkeypatch.setattr(SortedIndex, "BLOCK_SIZE", 4)
+        rng = random.Random(42)
+        index = SortedIndex()
+        expected = []
+
+        for _ in range(2000):
+            if expected and rng.random() < 0.4:
+                key = rng.choice(expected)
+                expected.remove(key)
+                index.remove(key)
+            else:
+                key = (rng.randint(-20, 0), rng.randint(0, 10000))
+                expected.append(key)
+                index.add(key)
+            assert len(index) == len(expected)
+
+        assert list(index) == sorted(expected)
+        for key in expected[:50]:
+            assert key in index
+
+    def test_remove_missing_key(self):
+        """Test that removing a missing key raises KeyError and discard doesn't."""
+        index = SortedIndex([(0, 1), (0, 2)])
+        with pytest.raises(KeyError):
+            index.remove((0, 3))
+        index.discard((0, 3))
+        assert (0, 3) not in index
+        assert list(index) == [(0, 1), (0, 2)]
+
+    def test_bulk_update(self):
+        """Test building the index from unsorted keys."""
+        index = SortedIndex([5, 1, 3])
+        index.update([4, 2])
+        assert list(index) == [1, 2, 3, 4, 5]
+        index.clear()
+        assert len(index) == 0
+
+    def test_irange(self, monkeypatch):
+        """Test iterating between bounds across block boundaries."""
+        monkeypatch.setattr(SortedIndex, "BLOCK_SIZE", 4)
+        index = SortedIndex(range(0, 40, 2))
+
+        assert list(index.irange()) == list(range(0, 40, 2))
+        assert list(index.irange(10, 20)) == [10, 12, 14, 16, 18, 20]
+        assert list(index.irange(10, 20, inclusive=(False, False))) == [12, 14, 16, 18]
+        assert list(index.irange(11, 17)) == [12, 14, 16]
+        assert list(index.irange(35)) == [36, 38]
+        assert list(index.irange(38, inclusive=(False, True))) == []
+        assert list(index.irange(maximum=3)) == [0, 2]
+
+
+class TestRandomPool:
+    """Tests for the RandomPool class."""
+
+    def test_add_discard_choice(self):
+        """Test that swap-removal keeps the pool consistent."""
+        pool = RandomPool([1, 2, 3, 4])
+        pool.add(2)  # Duplicate is ignored
+        assert len(pool) == 4
+
+        pool.discard(2)
+        pool.discard(99)  # Missing item is ignored
+        assert sorted(pool) == [1, 3, 4]
+        assert 2 not in pool
+
+        rng = random.Random(0)
+        picks = {pool.choice(rng) for _ in range(100)}
+        assert picks == {1, 3, 4}
+
+        for item in (4, 1, 3):
+            pool.discard(item)
+        assert len(pool) == 0
+        with pytest.raises(IndexError):
+            pool.choice()
+
+
+class TestChangeIndex:
+    """Tests for the ChangeIndex class."""
+
+    def test_since(self):
+        """Test that changes are split into added, updated and deleted questions."""
+        index = ChangeIndex(floor=10)
+        index.update(1, 11)  # Existed before the floor
+        index.add(5, 12)
+        index.update(2, 13)
+        index.update(1, 14)
+        index.delete(3, 15)
+        index.add(6, 16)
+        index.delete(6, 17)  # Added and deleted: never seen
+
+        assert index.since(10) == ([5], [2, 1], [3])
+        assert index.since(12) == ([], [2, 1], [3])
+        assert index.since(14) == ([], [], [3])
+        assert index.since(17) == ([], [], [])
+        assert index.since(9) is None
+
+    def test_old_tombstones_are_dropped(self):
+        """Test that the floor rises past the oldest entries once tombstones overflow."""
+        index = ChangeIndex(max_tombstones=2)
+        index.add(0, 1)
+        index.delete(1, 2)
+        index.update(2, 3)
+        index.delete(3, 4)
+        assert index.since(0) == ([0], [2], [1, 3])
+
+        index.delete(4, 5)
+        assert index.floor == 2
+        assert index.since(1) is None
+        assert index.since(2) == ([], [2], [3, 4])
@@ -0,0 +1,98 @@
+"""
+Unit tests for the operation metrics of the Marshmallows application.
+"""
+
+import json
+import pytest
+from marshmallow_lib.core import MarshmallowManager
+from marshmallow_lib.metrics import (InMemorySink, JSONLinesSink, LatencyHistogram, Metrics,
+                                     MetricsSink, summary_table)
+
+
+class TestLatencyHistogram:
+    """Tests for the LatencyHistogram class."""
+
+    def test_percentiles(self):
+        """Test that percentiles land within one bucket of the true value."""
+        histogram = LatencyHistogram()
+        assert histogram.percentile(50) == 0.0
+
+        for ms in range(1, 101):
+            histogram.add(float(ms))
+
+        assert histogram.count == 100
+        assert 50 <= histogram.percentile(50) <= 50 * 1.25
+        assert 99 <= histogram.percentile(99) <= 100
+        assert histogram.percentile(100) == histogram.max_ms == 100
+
+
+class TestMetrics:
+    """Tests for the Metrics collector and its sinks."""
+
+    def test_manager_reports_operations(self, tmp_path):
+        """Test that manager operations are counted, timed and their writes sized."""
+        metrics = Metrics()
+        manager = MarshmallowManager(storage_type="file", storage_path=tmp_path / "data.json",
+                                     metrics=metrics)
+        manager.add_question("First")
+        manager.add_question("Second")
+        manager.vote_for_question(0)
+        manager.get_sorted_questions("votes")
+
+        summary = metrics.summary()
+        assert summary["add_question"]["count"] == 2
+        assert summary["vote_for_question"]["count"] == 1
+        assert summary["get_sorted_questions"]["count"] == 1
+        assert summary["add_question"]["p99_ms"] > 0
+        # Every mutation rewrote the data file
+        assert summary["save_questions"]["writes"] == 3
+        assert summary["save_questions"]["bytes_written"] > (tmp_path / "data.json").stat().st_size
+
+        rows = summary_table(summary)
+        assert [row["Operation"] for row in rows] == sorted(summary)
+
+    def test_journal_bytes(self, tmp_path):
+        """Test that log storage reports the size of each appended record."""
+        metrics = Metrics()
+        manager = MarshmallowManager(storage_type="log", storage_path=tmp_path / "data.json",
+                                     metrics=metrics)
+        manager.add_question("Logged")
+        manager.vote_for_question(0)
+        manager.close()
+
+        stats = metrics.summary()["journal_append"]
+        assert stats["writes"] == 2
+        assert stats["bytes_written"] == (tmp_path / "data.log").stat().st_size
+
+    def test_json_lines_sink(self, tmp_path):
+        """Test that every event is appended as one JSON line next to the in-memory stats."""
+        path = tmp_path / "metrics.jsonl"
+        memory = InMemorySink()
+        metrics = Metrics([memory, JSONLinesSink(path)])
+        manager = MarshmallowManager(metrics=metrics)
+        manager.add_question("Hello")
+        manager.count_questions()
+        metrics.close()
+
+        events = [json.loads(line) for line in path.read_text().splitlines()]
+        assert [event["op"] for event in events] == ["add_question", "count_questions"]
+        assert all(event["ms"] >= 0 and event["ts"] > 0 for event in events)
+        assert memory.summary()["count_questions"]["count"] == 1
+
+        memory.reset()
+        assert metrics.summary() == {}
+
+    def test_disabled_by_default(self):
+        """Test that managers don't collect metrics unless given a Metrics object."""
+        manager = MarshmallowManager()
+        manager.add_question("Untimed")
+        assert manager.metrics is None
+
+    def test_sink_must_implement_emit(self):
+        """Test that a sink without emit() can't be created."""
+        class IncompleteSink(MetricsSink):
+            def close(self):
+                pass
+
+        with pytest.raises(TypeError):
+            IncompleteSink()
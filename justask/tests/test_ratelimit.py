@@ -0,0 +1,78 @@
+"""
+Unit tests for the rate limiting of the Marshmallows application.
+"""
+
+import pytest
+from marshmallow_lib.ratelimit import Limit, RateLimiter, RateLimitExceeded
+
+
+class FakeClock:
+    """Clock that only moves when told to."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+class TestRateLimiter:
+    """Tests for the RateLimiter class."""
+
+    def test_user_bucket(self, clock):
+        """Test that a user gets a burst, then one call per refilled token."""
+        limiter = RateLimiter({"vote": (Limit(rate=2, burst=3), Limit(rate=100, burst=100))}, clock)
+        for _ in range(3):
+            limiter.acquire("vote", "Red Fox")
+        with pytest.raises(RateLimitExceeded) as excinfo:
+            limiter.acquire("vote", "Red Fox")
+        assert excinfo.value.scope == "user"
+        assert excinfo.value.retry_after == pytest.approx(0.5)
+
+        # Other users have their own bucket
+        limiter.acquire("vote", "Blue Owl")
+
+        clock.now += 0.5
+        limiter.acquire("vote", "Red Fox")
+        with pytest.raises(RateLimitExceeded):
+            limiter.acquire("vote", "Red Fox")
+
+    def test_global_bucket(self, clock):
+        """Test that the global bucket limits everybody together."""
+        limiter = RateLimiter({"add": (Limit(rate=1, burst=5), Limit(rate=1, burst=4))}, clock)
+        for user in range(4):
+            limiter.acquire("add", f"user {user}")
+        with pytest.raises(RateLimitExceeded) as excinfo:
+            limiter.acquire("add", "user 9")
+        assert excinfo.value.scope == "global"
+
+        # The refused call didn't use up the user's token
+        clock.now += 1
+        limiter.acquire("add", "user 9")
+
+    def test_operations_are_separate(self, clock):
+        """Test that each operation has its own buckets and unlisted ones aren't limited."""
+        limiter = RateLimiter({"add": (Limit(rate=1, burst=1), Limit(rate=1, burst=1))}, clock)
+        limiter.acquire("add", "Red Fox")
+        with pytest.raises(RateLimitExceeded):
+            limiter.acquire("add", "Red Fox")
+        for _ in range(100):
+            limiter.acquire("vote", "Red Fox")
+
+    def test_idle_users_expire(self, clock):
+        """Test that buckets which have refilled completely are dropped."""
+        limiter = RateLimiter({"vote": (Limit(rate=1, burst=10), Limit(rate=1000, burst=1000))}, clock)
+        for user in range(100):
+            limiter.acquire("vote", f"user {user}")
+        assert limiter.tracked_users("vote") == 100
+
+        clock.now += 5
+        limiter.acquire("vote", "user 0")  # Still refilling, so kept
+        clock.now += 6
+        limiter.acquire("vote", "Red Fox")
+        assert limiter.tracked_users("vote") == 2
@@ -0,0 +1,76 @@
+"""
+Unit tests for the compact question records of the Marshmallows application.
+"""
+
+import datetime
+import sys
+import pytest
+from marshmallow_lib.core import MarshmallowManager
+from marshmallow_lib.records import QuestionRecord
+
+
+def make_record(**overrides):
+    """Build a record with default field values."""
+    fields = {
+        "id": 7,
+        "text": "What is recursion?",
+        "timestamp": datetime.datetime(2024, 3, 1, 9, 30, 15, 123456),
+        "status": "approved",
+        "user_id": "Blue Penguin",
+        "highlighted": False,
+        "votes": 3,
+    }
+    fields.update(overrides)
+    return QuestionRecord(**fields)
+
+
+class TestQuestionRecord:
+    """Tests for the QuestionRecord class."""
+
+    def test_behaves_like_dict(self):
+        """Test the dict-compatible view used by the GUIs."""
+        record = make_record()
+        assert record["text"] == "What is recursion?"
+        assert record["timestamp"] == datetime.datetime(2024, 3, 1, 9, 30, 15, 123456)
+        assert record["timestamp"].strftime('%I:%M %p') == "09:30 AM"
+        assert record.get("status", "approved") == "approved"
+        assert record.get("missing") is None
+        assert "votes" in record
+        assert list(record) == list(QuestionRecord.FIELDS)
+        assert dict(record) == record.copy()
+        assert record == dict(record)
+
+        record["votes"] += 1
+        record["timestamp"] = datetime.datetime(2023, 1, 2)
+        assert record["votes"] == 4
+        assert record["timestamp"] == datetime.datetime(2023, 1, 2)
+
+    def test_rejects_unknown_fields(self):
+        """Test that only the question fields exist."""
+        record = make_record()
+        with pytest.raises(KeyError):
+            record["nope"]
+        with pytest.raises(KeyError):
+            record["nope"] = 1
+        with pytest.raises(TypeError):
+            del record["votes"]
+        assert not hasattr(record, "__dict__")
+
+    def test_strings_are_interned(self):
+        """Test that repeated user IDs share a single string object."""
+        name = "".join(["Blue ", "Penguin"])  # Built at runtime, not interned
+        first = make_record(user_id=name)
+        second = make_record(user_id="".join(["Blue ", "Penguin"]))
+        assert first.user_id is second.user_id
+        assert first.user_id is sys.intern("Blue Penguin")
+
+    def test_manager_stores_records(self, tmp_path):
+        """Test that the manager keeps records and they survive a save/load."""
+        path = tmp_path / "data.json"
+        manager = MarshmallowManager(storage_type="file", storage_path=path)
+        manager.add_question("Stored compactly")
+        assert isinstance(manager.question_map[0], QuestionRecord)
+
+        reloaded = MarshmallowManager(storage_type="file", storage_path=path)
+        assert isinstance(reloaded.question_map[0], QuestionRecord)
+        assert reloaded.question_map[0] == manager.question_map[0]
@@ -0,0 +1,102 @@
+"""
+Unit tests for the full-text search of the Marshmallows application.
+"""
+
+import random
+from marshmallow_lib.search import (InvertedIndex, content_words, jaccard, parse_query,
+                                    similarity_bounds, tokenize)
+
+
+class TestInvertedIndex:
+    """Tests for the InvertedIndex class."""
+
+    def make_index(self):
+        index = InvertedIndex()
+        index.add(0, "How do for loops work in Python?")
+        index.add(1, "What is a Python list?")
+        index.add(2, "Loops loops loops: when do they stop?")
+        index.add(3, "How do I install packages?")
+        return index
+
+    def test_tokenize_and_parse_query(self):
+        """Test word splitting and which query words match as prefixes."""
+        assert tokenize("What's a LIST?") == ["what", "s", "a", "list"]
+        assert parse_query("pyth* list loo") == [("pyth", True), ("list", False), ("loo", True)]
+        assert parse_query("list list", prefix_last=False) == [("list", False)]
+        assert parse_query("  ?! ") == []
+
+    def test_ranking(self):
+        """Test that matches are ranked by relevance and non-matches left out."""
+        index = self.make_index()
+        assert [doc_id for doc_id, _ in index.search("loops", prefix_last=False)] == [2, 0]
+        # Matching both words beats matching one
+        assert index.search("python loops", prefix_last=False)[0][0] == 0
+        assert index.search("packages python", limit=1, prefix_last=False)[0][0] == 3
+        assert index.search("nothing here") == []
+
+    def test_prefix(self):
+        """Test search as you type and explicit prefix words."""
+        index = self.make_index()
+        assert {doc_id for doc_id, _ in index.search("pyt")} == {0, 1}
+        assert index.search("pyt", prefix_last=False) == []
+        assert {doc_id for doc_id, _ in index.search("inst* how", prefix_last=False)} == {0, 3}
+        assert index.expand_prefix("l") == ["list", "loops"]
+
+    def test_accept_filter(self):
+        """Test that the accept filter drops results."""
+        index = self.make_index()
+        assert [doc_id for doc_id, _ in index.search("python", accept=lambda i: i != 0)] == [1]
+
+    def test_remove_and_clear(self):
+        """Test that removed questions and their words leave the index."""
+        index = self.make_index()
+        index.remove(1, "What is a Python list?")
+        assert len(index) == 3
+        assert [doc_id for doc_id, _ in index.search("python")] == [0]
+        assert index.expand_prefix("li") == []
+        index.remove(1, "What is a Python list?")  # Already gone
+
+        index.clear()
+        assert len(index) == 0
+        assert index.search("loops") == []
+
+
+class TestNearDuplicates:
+    """Tests for the near-duplicate helpers and InvertedIndex.similar_candidates."""
+
+    def test_content_words_and_jaccard(self):
+        """Test that stop words and single letters don't count."""
+        assert content_words("What's a Python list?") == {"python", "list"}
+        assert content_words("How do I?") == {"how", "do", "i"}  # Nothing else left
+        assert jaccard({"python", "list"}, {"python", "list", "loop"}) == 2 / 3
+        assert jaccard(set(), set()) == 1.0
+
+    def test_similarity_bounds(self):
+        """Test the shared-word and size bounds of a similarity threshold."""
+        assert similarity_bounds(10, 0.7) == (7, 7, 14)
+        assert similarity_bounds(3, 0.5) == (2, 2, 6)
+        assert similarity_bounds(2, 1.0) == (2, 2, 2)
+
+    def test_candidates_match_brute_force(self):
+        """Test that every question similar enough is a candidate."""
+        rng = random.Random(7)
+        vocab = [f"word{i}" for i in range(30)]
+        texts = {i: " ".join(rng.sample(vocab, rng.randint(1, 8))) for i in range(400)}
+        index = InvertedIndex()
+        for doc_id, text in texts.items():
+            index.add(doc_id, text)
+        for doc_id in range(0, 400, 4):
+            index.remove(doc_id, texts.pop(doc_id))
+
+        for _ in range(50):
+            words = set(rng.sample(vocab, rng.randint(1, 8)))
+            for threshold in (0.5, 0.7, 1.0):
+                candidates = set(index.similar_candidates(words, threshold))
+                expected = {doc_id for doc_id, text in texts.items()
+                            if jaccard(words, content_words(text)) >= threshold}
+                assert expected <= candidates
+                # Candidates share enough words, so they are few
+                overlap = similarity_bounds(len(words), threshold)[0]
+                assert all(len(words & content_words(texts[doc_id])) >= overlap
+                           for doc_id in candidates)
+
@@ -0,0 +1,228 @@
+"""
+Unit tests for shared (multi-process) file storage in the Marshmallows application.
+"""
+
+import json
+import multiprocessing
+import threading
+from marshmallow_lib import shared
+from marshmallow_lib.core import MarshmallowManager
+from marshmallow_lib.shared import ChangeLog
+
+
+def open_shared(path, **kwargs):
+    """Open a manager on a shared data file."""
+    return MarshmallowManager(storage_type="file", storage_path=path, shared=True, **kwargs)
+
+
+def vote_in_process(path, worker, votes):
+    """Child process: add a question and vote for question 0 as several users."""
+    manager = open_shared(path)
+    manager.add_question(f"Question from worker {worker}", user_id=f"worker {worker}")
+    for vote in range(votes):
+        manager.vote_for_question(0, f"worker {worker} user {vote}")
+    manager.close()
+
+
+class TestSharedFileStorage:
+    """Tests for file storage shared by several managers (and processes)."""
+
+    def test_managers_see_each_others_changes(self, tmp_path):
+        """Test that no change is lost when two managers write one data file."""
+        path = tmp_path / "data.json"
+        first = open_shared(path)
+        second = open_shared(path)
+
+        assert first.add_question("From the first")
+        assert second.add_question("From the second")
+        assert first.vote_for_question(1, "Red Fox")
+        assert not second.vote_for_question(1, "Red Fox")  # Already voted, in the other manager
+        second.highlight_question(0, True)
+        first.set_question_status(1, "pending")
+
+        for manager in (first, second):
+            assert [q["id"] for q in manager.get_sorted_questions("newest")] == [1, 0]
+            assert manager.get_question_by_id(1)["votes"] == 1
+            assert manager.get_question_by_id(0)["highlighted"] is True
+            assert manager.count_questions("pending") == 1
+
+        # Every change is on disk without an explicit save
+        reloaded = MarshmallowManager(storage_type="file", storage_path=path, shared=True)
+        assert [dict(q) for q in reloaded.questions] == [dict(q) for q in first.questions]
+        assert reloaded.has_voted(1, "Red Fox")
+
+    def test_background_load_sees_changes_made_meanwhile(self, tmp_path, monkeypatch):
+        """Test that a shared data file loads in the background without missing concurrent changes."""
+        path = tmp_path / "data.json"
+        first = open_shared(path)
+        first.add_question("Before")
+        first.save_questions()
+
+        release = threading.Event()
+        original = MarshmallowManager._read_data_file
+
+        def slow_read(manager):
+            if threading.current_thread() is not threading.main_thread():
+                release.wait(5)
+            return original(manager)
+
+        monkeypatch.setattr(MarshmallowManager, "_read_data_file", slow_read)
+        loading = open_shared(path)
+        assert not loading.wait_until_loaded(0)
+
+        # Rewrites the data file under the loader's feet
+        first.add_question("While loading")
+        first.save_questions()
+        first.vote_for_question(1, "Red Fox")
+        release.set()
+
+        assert loading.wait_until_loaded(5)
+        assert [q["text"] for q in loading.questions] == ["Before", "While loading"]
+        assert loading.has_voted(1, "Red Fox")
+        loading.close()
+
+    def test_compare_and_set(self, tmp_path):
+        """Test that an update based on a stale version is refused."""
+        path = tmp_path / "data.json"
+        first = open_shared(path)
+        second = open_shared(path)
+        first.add_question("Contested")
+        seen = second.get_question_by_id(0)["version"]
+
+        assert first.vote_for_question(0, "Red Fox")
+        assert not second.set_question_status(0, "pending", expected_version=seen)
+        assert not second.delete_question(0, expected_version=seen)
+
+        current = second.get_question_by_id(0)["version"]
+        assert current > seen
+        assert second.set_question_status(0, "pending", expected_version=current)
+        assert first.get_question_by_id(0)["status"] == "pending"
+
+    def test_changes_since(self, tmp_path):
+        """Test that a delta includes the changes another manager made."""
+        path = tmp_path / "data.json"
+        first = open_shared(path)
+        second = open_shared(path)
+        first.add_question("Existing")
+        seen = second.version
+
+        first.add_question("New")
+        first.vote_for_question(0)
+        assert second.version == first.version > seen
+        changes = second.changes_since(seen)
+        assert [q["id"] for q in changes["added"]] == [1]
+        assert [q["id"] for q in changes["updated"]] == [0]
+        assert changes["updated"][0]["votes"] == 1
+
+    def test_catching_up_reads_only_new_records(self, tmp_path, monkeypatch):
+        """Test that another manager's changes are applied without reloading the file."""
+        path = tmp_path / "data.json"
+        first = open_shared(path)
+        second = open_shared(path)
+        first.add_question("Existing")
+        first.save_questions()  # Fold it into the data file
+        second.count_questions()
+
+        def no_reload():
+            raise AssertionError("Data file reloaded")
+        monkeypatch.setattr(second, "_read_data_file", no_reload)
+
+        first.add_question("New")
+        first.vote_for_question(0)
+        assert [q["text"] for q in second.questions] == ["Existing", "New"]
+        assert second.get_question_by_id(0)["votes"] == 1
+
+    def test_restarted_log(self, tmp_path, monkeypatch):
+        """Test that a manager that missed records of a compacted log reloads the data file."""
+        monkeypatch.setattr(ChangeLog, "DEFAULT_COMPACT_THRESHOLD", 500)
+        path = tmp_path / "data.json"
+        first = open_shared(path, file_format="binary")
+        second = open_shared(path)
+        for i in range(20):
+            first.add_question(f"Question {i}")
+        assert path.stat().st_size > 0
+        assert first._changes.size < 500
+
+        assert second.count_questions() == 20
+        assert [dict(q) for q in second.questions] == [dict(q) for q in first.questions]
+
+        # A change after the restart is picked up incrementally
+        second.vote_for_question(19)
+        assert first.get_question_by_id(19)["votes"] == 1
+
+    def test_existing_data_file(self, tmp_path):
+        """Test that a data file written without sharing is loaded and then shared."""
+        path = tmp_path / "data.json"
+        plain = MarshmallowManager(storage_type="file", storage_path=path)
+        plain.add_question("Written alone")
+        plain.vote_for_question(0)
+
+        manager = open_shared(path)
+        assert manager.get_question_by_id(0)["votes"] == 1
+        manager.add_question("Written shared")
+        header = json.loads(path.with_suffix(".changes").read_text().splitlines()[0])
+        assert header["base"] == plain.get_question_by_id(0)["version"]
+        assert open_shared(path).count_questions() == 2
+
+    def test_torn_record_is_dropped(self, tmp_path):
+        """Test that half a record left by a crashed process is ignored, then overwritten."""
+        path = tmp_path / "data.json"
+        first = open_shared(path)
+        first.add_question("Before the crash")
+        with open(path.with_suffix(".changes"), "a") as f:
+            f.write('{"op": "vote", "ver')
+
+        second = open_shared(path)
+        assert second.get_question_by_id(0)["votes"] == 0
+        second.vote_for_question(0)
+        assert first.get_question_by_id(0)["votes"] == 1
+        assert open_shared(path).get_question_by_id(0)["votes"] == 1
+
+    def test_processes_do_not_lose_votes(self, tmp_path):
+        """Test that concurrent processes sharing a data file lose no changes."""
+        path = tmp_path / "data.json"
+        open_shared(path).add_question("Popular question")
+
+        context = multiprocessing.get_context("spawn")
+        workers = [context.Process(target=vote_in_process, args=(path, worker, 25))
+                   for worker in range(4)]
+        for process in workers:
+            process.start()
+        for process in workers:
+            process.join(timeout=60)
+            assert process.exitcode == 0
+
+        manager = open_shared(path)
+        assert manager.count_questions() == 5
+        assert sorted(q["id"] for q in manager.questions) == [0, 1, 2, 3, 4]
+        assert manager.get_question_by_id(0)["votes"] == 100
+
+
+class TestFileLock:
+    """Tests for the FileLock class."""
+
+    def test_reentrant(self, tmp_path):
+        """Test that nested acquires are counted and the lock is freed at the end."""
+        lock = shared.FileLock(tmp_path / "data.lock")
+        with lock:
+            with lock:
+                assert lock.is_held()
+            assert lock.is_held()
+        assert not lock.is_held()
+
+    def test_excludes_other_holders(self, tmp_path):
+        """Test that a second lock on the same file waits for the first to be released."""
+        path = tmp_path / "data.lock"
+        first, second = shared.FileLock(path), shared.FileLock(path)
+        acquired = threading.Event()
+
+        def take_second():
+            with second:
+                acquired.set()
+
+        with first:
+            thread = threading.Thread(target=take_second)
+            thread.start()
+            assert not acquired.wait(0.2)
+        assert acquired.wait(5)
+        thread.join()
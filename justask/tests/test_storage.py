@@ -0,0 +1,768 @@
+"""
+Unit tests for the storage backends of the Marshmallows application.
+"""
+
+import datetime
+import io
+import json
+import sqlite3
+import sys
+import threading
+import time
+import zlib
+import pytest
+from marshmallow_lib.core import MarshmallowManager
+from marshmallow_lib import core, storage
+from marshmallow_lib.records import QuestionRecord
+from marshmallow_lib.storage import JSONArrayStreamer, decode_binary, is_binary_data_file
+
+
+class TestLogStorage:
+    """Tests for the append-only journal ("log") storage type."""
+
+    def test_mutations_append_records(self, tmp_path):
+        """Test that each mutation appends one record instead of rewriting the file."""
+        path = tmp_path / "data.json"
+        manager = MarshmallowManager(storage_type="log", storage_path=path)
+
+        manager.add_question("First")
+        manager.vote_for_question(0)
+        manager.highlight_question(0, True)
+        manager.set_question_status(0, "pending")
+        manager.close()
+
+        # No snapshot yet, just the journal
+        assert not path.exists()
+        records = [json.loads(line) for line in path.with_suffix(".log").read_text().splitlines()]
+        assert [r["op"] for r in records] == ["add", "vote", "highlight", "status"]
+        assert [r["seq"] for r in records] == [1, 2, 3, 4]
+
+    def test_replay_restores_state(self, tmp_path):
+        """Test that replaying the snapshot plus the log rebuilds the state."""
+        path = tmp_path / "data.json"
+        manager = MarshmallowManager(storage_type="log", storage_path=path)
+        manager.add_question("First")
+        manager.add_question("Second")
+        manager.add_question("Third")
+        manager.vote_for_question(1)
+        manager.vote_for_question(1)
+        manager.highlight_question(2, True)
+        manager.set_question_status(0, "pending")
+        manager.delete_question(0)
+        manager.close()
+
+        reloaded = MarshmallowManager(storage_type="log", storage_path=path)
+        assert [q["id"] for q in reloaded.questions] == [1, 2]
+        assert reloaded.question_map[1]["votes"] == 2
+        assert reloaded.question_map[2]["highlighted"] is True
+        assert reloaded.next_id == 3
+        assert [q["version"] for q in reloaded.questions] == [5, 6]
+
+        # Replayed records were folded into a snapshot
+        assert path.exists()
+        assert path.with_suffix(".log").read_text() == ""
+        reloaded.close()
+
+    def test_voters_are_replayed(self, tmp_path):
+        """Test that per-user votes survive replay and compaction."""
+        path = tmp_path / "data.json"
+        manager = MarshmallowManager(storage_type="log", storage_path=path)
+        manager.add_question("First")
+        manager.vote_for_question(0, "Red Fox")
+        manager.vote_for_question(0, "Blue Owl")
+        manager.unvote_question(0, "Red Fox")
+        manager.vote_for_question(0)
+        manager.close()
+
+        reloaded = MarshmallowManager(storage_type="log", storage_path=path)
+        assert reloaded.question_map[0]["votes"] == 2
+        assert reloaded.has_voted(0, "Blue Owl")
+        assert not reloaded.has_voted(0, "Red Fox")
+        assert not reloaded.vote_for_question(0, "Blue Owl")
+        reloaded.close()
+
+        # Loaded again, now from the snapshot written by the first replay
+        again = MarshmallowManager(storage_type="log", storage_path=path)
+        assert again.has_voted(0, "Blue Owl")
+        assert again.question_map[0]["votes"] == 2
+        again.close()
+
+    def test_clear_is_journaled(self, tmp_path):
+        """Test that clearing all questions survives a reload."""
+        path = tmp_path / "data.json"
+        manager = MarshmallowManager(storage_type="log", storage_path=path)
+        manager.add_question("First")
+        manager.clear_all_questions()
+        manager.add_question("After clear")
+        manager.close()
+
+        reloaded = MarshmallowManager(storage_type="log", storage_path=path)
+        assert [q["text"] for q in reloaded.questions] == ["After clear"]
+        assert reloaded.next_id == 1
+        reloaded.close()
+
+    def test_background_compaction(self, tmp_path):
+        """Test that the log is compacted once it passes the threshold."""
+        path = tmp_path / "data.json"
+        manager = MarshmallowManager(storage_type="log", storage_path=path)
+        manager._journal.compact_threshold = 500
+
+        for i in range(20):
+            manager.add_question(f"Question {i}")
+            manager.vote_for_question(i)
+        manager.close()
+
+        # At least one snapshot was written in the background
+        assert path.exists()
+        assert json.loads(path.read_text())["seq"] > 0
+
+        reloaded = MarshmallowManager(storage_type="log", storage_path=path)
+        assert len(reloaded.questions) == 20
+        assert all(q["votes"] == 1 for q in reloaded.questions)
+        reloaded.close()
+
+    def test_compaction_serializes_off_the_caller_thread(self, tmp_path, monkeypatch):
+        """Test that compaction copies state under the lock but serializes it in the background."""
+        path = tmp_path / "data.json"
+        manager = MarshmallowManager(storage_type="log", storage_path=path)
+        manager.add_question("Question")
+        manager.vote_for_question(0)
+
+        serializing_threads = []
+        release = threading.Event()
+        serialize = core.serialize_question
+
+        def slow_serialize(question):
+            serializing_threads.append(threading.current_thread())
+            release.wait(5)
+            return serialize(question)
+
+        monkeypatch.setattr(core, "serialize_question", slow_serialize)
+        manager._journal.compact(wait=False)
+
+        # Changes made while the snapshot is being written aren't in it
+        manager.vote_for_question(0)
+        release.set()
+        manager.close()
+        assert serializing_threads and threading.main_thread() not in serializing_threads
+        assert json.loads(path.read_text())["questions"][0]["votes"] == 1
+
+        reloaded = MarshmallowManager(storage_type="log", storage_path=path)
+        assert reloaded.get_question_by_id(0)["votes"] == 2
+        reloaded.close()
+
+    def test_interrupted_compaction_is_not_applied_twice(self, tmp_path):
+        """Test that records already in the snapshot are skipped on replay."""
+        path = tmp_path / "data.json"
+        manager = MarshmallowManager(storage_type="log", storage_path=path)
+        manager.add_question("First")
+        manager.vote_for_question(0)
+        manager.save_questions()  # Snapshot now includes both records
+        manager.close()
+
+        # Simulate a crash after the snapshot was written but before the
+        # rotated log was removed
+        pending = path.with_suffix(".log.compacting")
+        pending.write_text(
+            json.dumps({"seq": 2, "op": "vote", "id": 0}) + "\n" +
+            json.dumps({"seq": 3, "op": "vote", "id": 0}) + "\n"
+        )
+
+        reloaded = MarshmallowManager(storage_type="log", storage_path=path)
+        assert reloaded.question_map[0]["votes"] == 2
+        assert not pending.exists()
+        reloaded.close()
+
+    def test_torn_final_record_is_ignored(self, tmp_path):
+        """Test that a partially written last line doesn't break loading."""
+        path = tmp_path / "data.json"
+        manager = MarshmallowManager(storage_type="log", storage_path=path)
+        manager.add_question("First")
+        manager.close()
+
+        with open(path.with_suffix(".log"), "a") as f:
+            f.write('{"seq": 2, "op": "vo')
+
+        reloaded = MarshmallowManager(storage_type="log", storage_path=path)
+        assert reloaded.question_map[0]["votes"] == 0
+        reloaded.vote_for_question(0)
+        reloaded.close()
+
+        again = MarshmallowManager(storage_type="log", storage_path=path)
+        assert again.question_map[0]["votes"] == 1
+        again.close()
+
+
+class TestSQLiteStorage:
+    """Tests for the SQLite storage type."""
+
+    def test_operations_persist(self, tmp_path):
+        """Test that every mutation is written straight to the database."""
+        path = tmp_path / "data.db"
+        manager = MarshmallowManager(storage_type="sqlite", storage_path=path)
+
+        assert not manager.add_question("   ")
+        assert manager.add_question("First")
+        assert manager.add_question("Second")
+        assert manager.vote_for_question(1)
+        assert not manager.vote_for_question(999)
+        assert manager.highlight_question(0, True)
+        assert manager.set_question_status(0, "pending")
+        manager.close()
+
+        reloaded = MarshmallowManager(storage_type="sqlite", storage_path=path)
+        assert reloaded.next_id == 2
+        assert [q["id"] for q in reloaded.questions] == [0, 1]
+        assert reloaded.get_question_by_id(1)["votes"] == 1
+        assert reloaded.question_map[0]["highlighted"] is True
+        assert reloaded.question_map[0]["status"] == "pending"
+        assert 1 in reloaded.question_map
+        assert 999 not in reloaded.question_map
+        assert reloaded.get_question_by_id(999) is None
+
+        assert reloaded.delete_question(0)
+        assert not reloaded.delete_question(0)
+        assert reloaded.count_questions() == 1
+        reloaded.clear_all_questions()
+        assert reloaded.count_questions() == 0
+        assert reloaded.next_id == 0
+        reloaded.close()
+
+    def test_one_vote_per_user(self, tmp_path):
+        """Test that per-user votes are enforced and persisted."""
+        path = tmp_path / "data.db"
+        manager = MarshmallowManager(storage_type="sqlite", storage_path=path)
+        manager.add_question("First")
+        assert manager.vote_for_question(0, "Red Fox")
+        assert not manager.vote_for_question(0, "Red Fox")
+        assert manager.vote_for_question(0, "Blue Owl")
+        assert not manager.vote_for_question(999, "Red Fox")
+        assert not manager.unvote_question(0, "Green Cat")
+        assert manager.unvote_question(0, "Red Fox")
+        manager.close()
+
+        reloaded = MarshmallowManager(storage_type="sqlite", storage_path=path)
+        assert reloaded.get_question_by_id(0)["votes"] == 1
+        assert reloaded.has_voted(0, "Blue Owl")
+        assert not reloaded.has_voted(0, "Red Fox")
+
+        reloaded.delete_question(0)
+        reloaded.add_question("Second")
+        assert not reloaded.has_voted(0, "Blue Owl")
+        reloaded.close()
+
+    def test_compare_and_set(self, tmp_path):
+        """Test that versions are shared by every connection and stale updates fail."""
+        path = tmp_path / "data.db"
+        first = MarshmallowManager(storage_type="sqlite", storage_path=path)
+        second = MarshmallowManager(storage_type="sqlite", storage_path=path)
+        first.add_question("First")
+        second.add_question("Second")
+        assert [q["version"] for q in first.questions] == [1, 2]
+
+        seen = second.get_question_by_id(0)["version"]
+        first.vote_for_question(0, "Red Fox")
+        assert not second.highlight_question(0, True, expected_version=seen)
+        assert not second.delete_question(0, expected_version=seen)
+        current = second.get_question_by_id(0)["version"]
+        assert current == 3
+        assert second.highlight_question(0, True, expected_version=current)
+        assert second.set_question_status(0, "pending")
+        assert first.get_question_by_id(0)["version"] == 5
+        first.close()
+        second.close()
+
+    def test_sorted_and_filtered_queries(self, tmp_path):
+        """Test that sorting and status filtering match the in-memory store."""
+        sqlite_manager = MarshmallowManager(storage_type="sqlite", storage_path=tmp_path / "data.db")
+        memory_manager = MarshmallowManager()
+
+        for manager in (sqlite_manager, memory_manager):
+            for i in range(6):
+                manager.add_question(f"Question {i}")
+            manager.vote_for_question(2)
+            manager.vote_for_question(2)
+            manager.vote_for_question(4)
+            manager.set_question_status(1, "pending")
+
+        for sort_by in ("newest", "votes", "unknown"):
+            for status in (None, "approved", "pending"):
+                expected = [q["id"] for q in memory_manager.get_sorted_questions(sort_by, status)]
+                actual = [q["id"] for q in sqlite_manager.get_sorted_questions(sort_by, status)]
+                assert actual == expected, (sort_by, status)
+
+        assert sqlite_manager.count_questions("approved") == 5
+        assert len(sqlite_manager.get_sorted_questions("random")) == 6
+        sqlite_manager.close()
+
+    def test_questions_page(self, tmp_path):
+        """Test that keyset pages cover the sorted questions and survive votes."""
+        manager = MarshmallowManager(storage_type="sqlite", storage_path=tmp_path / "data.db")
+        for i in range(10):
+            manager.add_question(f"Question {i}")
+        for i in (3, 3, 7):
+            manager.vote_for_question(i)
+        manager.set_question_status(5, "pending")
+
+        for sort_by in ("newest", "votes"):
+            for status in (None, "approved"):
+                ids, cursor = [], None
+                while True:
+                    page, cursor = manager.get_questions_page(sort_by, status, limit=3, cursor=cursor)
+                    ids += [q["id"] for q in page]
+                    if cursor is None:
+                        break
+                assert ids == [q["id"] for q in manager.get_sorted_questions(sort_by, status)]
+
+        first, cursor = manager.get_questions_page("votes", limit=3)
+        assert [q["id"] for q in first] == [3, 7, 0]
+        manager.vote_for_question(9)  # Moves above the cursor
+        second, _ = manager.get_questions_page("votes", limit=3, cursor=cursor)
+        assert [q["id"] for q in second] == [1, 2, 4]
+        manager.close()
+
+    def test_same_timestamp_order(self, tmp_path, monkeypatch):
+        """Test that questions added at the same instant come out newest first, as in memory."""
+        instant = datetime.datetime(2024, 1, 1, 9, 0)
+
+        class FrozenDatetime(datetime.datetime):
+            @classmethod
+            def now(cls, tz=None):
+                return instant
+        monkeypatch.setattr("marshmallow_lib.core.datetime.datetime", FrozenDatetime)
+
+        sqlite_manager = MarshmallowManager(storage_type="sqlite", storage_path=tmp_path / "data.db")
+        memory_manager = MarshmallowManager()
+        pages = []
+        for manager in (sqlite_manager, memory_manager):
+            for i in range(5):
+                manager.add_question(f"Question {i}")
+            first, cursor = manager.get_questions_page("newest", limit=2)
+            second, _ = manager.get_questions_page("newest", limit=2, cursor=cursor)
+            pages.append([q["id"] for q in first + second])
+        assert pages == [[4, 3, 2, 1], [4, 3, 2, 1]]
+        assert ([q["id"] for q in sqlite_manager.get_sorted_questions("newest")]
+                == [q["id"] for q in memory_manager.get_sorted_questions("newest")])
+        sqlite_manager.close()
+
+    def test_failed_clear_changes_nothing(self, tmp_path):
+        """Test that a clear that fails part way is rolled back."""
+        path = tmp_path / "data.db"
+        manager = MarshmallowManager(storage_type="sqlite", storage_path=path)
+        manager.add_question("Keep me")
+        manager.vote_for_question(0, "Red Fox")
+        conn = sqlite3.connect(str(path))
+        conn.execute("CREATE TRIGGER no_clear BEFORE DELETE ON voter_users"
+                     " BEGIN SELECT RAISE(ABORT, 'refused'); END")
+        conn.commit()
+        conn.close()
+
+        with pytest.raises(sqlite3.DatabaseError):
+            manager.clear_all_questions()
+        assert manager.count_questions() == 1
+        assert manager.has_voted(0, "Red Fox")
+        assert manager.next_id == 1
+        manager.close()
+
+    def test_search(self, tmp_path):
+        """Test full-text search against the database."""
+        manager = MarshmallowManager(storage_type="sqlite", storage_path=tmp_path / "data.db")
+        manager.add_question("How do for loops work?")
+        manager.add_question("What is a Python list?")
+        manager.add_question("Python loops or list comprehensions?")
+        manager.set_question_status(2, "pending")
+
+        assert {q["id"] for q in manager.search_questions("python")} == {1, 2}
+        assert [q["id"] for q in manager.search_questions("python", "approved")] == [1]
+        assert {q["id"] for q in manager.search_questions("loo")} == {0, 2}
+        manager.delete_question(1)
+        assert [q["id"] for q in manager.search_questions("list")] == [2]
+        assert manager.search_questions("?!") == []
+        manager.close()
+
+    def test_near_duplicates(self, tmp_path):
+        """Test near-duplicate lookups, including questions stored before the word index."""
+        path = tmp_path / "data.db"
+        manager = MarshmallowManager(storage_type="sqlite", storage_path=path)
+        manager.add_question("What is a Python list?")
+        manager.add_question("How do for loops work in Python?")
+        manager.add_question("What is a Python dictionary?")
+        assert manager.find_duplicate("what's a python list")["id"] == 0
+        assert manager.add_question("python list???", on_duplicate="merge")
+        assert manager.get_question_by_id(0)["votes"] == 1
+        manager.delete_question(0)
+        assert manager.find_duplicate("what's a python list") is None
+
+        # Simulate a database from before question_words: it is filled on open
+        manager._db._conn.executescript(
+            "DELETE FROM question_words; UPDATE meta SET value = 0 WHERE key = 'word_index';"
+        )
+        manager.close()
+        manager = MarshmallowManager(storage_type="sqlite", storage_path=path)
+        assert manager.find_duplicate("How do loops work in Python?")["id"] == 1
+        manager.close()
+
+    def test_random_question_skips_pending(self, tmp_path):
+        """Test random picks only return approved questions and reset when all are viewed."""
+        manager = MarshmallowManager(storage_type="sqlite", storage_path=tmp_path / "data.db")
+        assert manager.get_random_question() is None
+
+        manager.add_question("Visible")
+        manager.add_question("Hidden")
+        manager.set_question_status(1, "pending")
+
+        for _ in range(3):
+            assert manager.get_random_question()["id"] == 0
+            assert manager.viewed_questions == {0}
+        manager.close()
+
+    def test_managers_share_database(self, tmp_path):
+        """Test that two managers on the same file see each other's writes."""
+        path = tmp_path / "data.db"
+        first = MarshmallowManager(storage_type="sqlite", storage_path=path)
+        second = MarshmallowManager(storage_type="sqlite", storage_path=path)
+
+        first.add_question("From first")
+        second.add_question("From second")
+        first.vote_for_question(1)
+        second.vote_for_question(1)
+
+        # IDs are handed out by the database, so they never collide
+        assert [q["id"] for q in first.questions] == [0, 1]
+        assert second.get_question_by_id(1)["votes"] == 2
+        first.close()
+        second.close()
+
+    def test_changes_since(self, tmp_path):
+        """Test that deltas match the in-memory store and include other connections' changes."""
+        path = tmp_path / "data.db"
+        first = MarshmallowManager(storage_type="sqlite", storage_path=path)
+        second = MarshmallowManager(storage_type="sqlite", storage_path=path)
+        for i in range(4):
+            first.add_question(f"Question {i}")
+        seen = second.version
+        assert second.changes_since(seen)["added"] == []
+
+        first.vote_for_question(1)
+        first.delete_question(2)
+        first.add_question("Gone again")
+        first.delete_question(4)
+        first.highlight_question(0, True)
+        first.add_question("New")
+        changes = second.changes_since(seen)
+        assert changes["version"] == first.version > seen
+        assert not changes["reset"]
+        assert [q["id"] for q in changes["added"]] == [5]
+        assert [q["id"] for q in changes["updated"]] == [1, 0]
+        assert changes["updated"][1]["highlighted"] is True
+        assert changes["deleted"] == [2]
+
+        first.clear_all_questions()
+        second.add_question("After the clear")
+        changes = first.changes_since(seen)
+        assert changes["reset"]
+        assert [q["text"] for q in changes["added"]] == ["After the clear"]
+        assert first.changes_since(changes["version"])["reset"] is False
+        first.close()
+        second.close()
+
+    def test_database_from_older_release(self, tmp_path):
+        """Test that a database without the version columns is upgraded on open."""
+        path = tmp_path / "data.db"
+        conn = sqlite3.connect(str(path))
+        conn.executescript("""
+            CREATE TABLE questions (
+                id INTEGER PRIMARY KEY, text TEXT NOT NULL, timestamp TEXT NOT NULL,
+                status TEXT NOT NULL, user_id TEXT NOT NULL,
+                highlighted INTEGER NOT NULL DEFAULT 0, votes INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE TABLE meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL);
+            INSERT INTO meta VALUES ('next_id', 1);
+            INSERT INTO questions VALUES (0, 'Old question', '2024-01-01T00:00:00',
+                                          'approved', 'Blue Owl', 0, 2);
+        """)
+        conn.close()
+
+        manager = MarshmallowManager(storage_type="sqlite", storage_path=path)
+        assert manager.get_question_by_id(0)["votes"] == 2
+        manager.vote_for_question(0)
+        assert manager.get_question_by_id(0)["version"] == manager.version == 1
+        assert [q["id"] for q in manager.changes_since(0)["updated"]] == [0]
+        manager.delete_question(0)
+        assert manager.changes_since(1)["deleted"] == [0]
+        manager.close()
+
+
+class TestWriteBehind:
+    """Tests for write-behind (group commit) mode of file storage."""
+
+    def test_burst_is_batched_until_flush(self, tmp_path):
+        """Test that a burst of votes isn't written until a flush."""
+        path = tmp_path / "data.json"
+        manager = MarshmallowManager(storage_type="file", storage_path=path,
+                                     write_behind=True, flush_interval_ms=60000,
+                                     flush_after=1000)
+        manager.add_question("Question")
+        for _ in range(200):
+            manager.vote_for_question(0)
+        assert not path.exists()
+
+        manager.flush()
+        assert json.loads(path.read_text())["questions"][0]["votes"] == 200
+        manager.close()
+
+    def test_flush_after_mutation_count(self, tmp_path):
+        """Test that reaching flush_after triggers a background flush."""
+        path = tmp_path / "data.json"
+        manager = MarshmallowManager(storage_type="file", storage_path=path,
+                                     write_behind=True, flush_interval_ms=60000,
+                                     flush_after=5)
+        for i in range(5):
+            manager.add_question(f"Question {i}")
+
+        deadline = time.monotonic() + 5
+        while not path.exists() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert len(json.loads(path.read_text())["questions"]) == 5
+        manager.close()
+
+    def test_flush_after_interval(self, tmp_path):
+        """Test that changes are flushed once the interval has passed."""
+        path = tmp_path / "data.json"
+        manager = MarshmallowManager(storage_type="file", storage_path=path,
+                                     write_behind=True, flush_interval_ms=20)
+        manager.add_question("Question")
+
+        deadline = time.monotonic() + 5
+        while not path.exists() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert path.exists()
+        manager.close()
+
+    def test_flush_writes_outside_the_lock(self, tmp_path, monkeypatch):
+        """Test that a slow flush doesn't block other threads, nor undo a newer flush."""
+        path = tmp_path / "data.json"
+        manager = MarshmallowManager(storage_type="file", storage_path=path,
+                                     write_behind=True, flush_interval_ms=60000,
+                                     flush_after=1000)
+        manager.add_question("Question")
+
+        serializing = threading.Event()
+        release = threading.Event()
+        serialize = core.serialize_question
+
+        def slow_serialize(question):
+            if threading.current_thread() is not threading.main_thread():
+                serializing.set()
+                release.wait(5)
+            return serialize(question)
+
+        monkeypatch.setattr(core, "serialize_question", slow_serialize)
+        slow_flush = threading.Thread(target=manager.flush)
+        slow_flush.start()
+        assert serializing.wait(5)
+
+        # The manager stays usable while the first flush is stuck writing
+        assert manager.vote_for_question(0)
+        assert manager.get_question_by_id(0)["votes"] == 1
+        assert slow_flush.is_alive()
+        manager.flush()
+        release.set()
+        slow_flush.join(5)
+        assert json.loads(path.read_text())["questions"][0]["votes"] == 1
+        manager.close()
+
+    def test_close_flushes(self, tmp_path):
+        """Test that closing the manager writes pending changes."""
+        path = tmp_path / "data.json"
+        manager = MarshmallowManager(storage_type="file", storage_path=path,
+                                     write_behind=True, flush_interval_ms=60000)
+        manager.add_question("Question")
+        manager.vote_for_question(0)
+        manager.close()
+
+        reloaded = MarshmallowManager(storage_type="file", storage_path=path)
+        assert reloaded.question_map[0]["votes"] == 1
+
+
+class TestStreamingLoader:
+    """Tests for streaming, lazy loading of JSON data files."""
+
+    QUESTION = {"id": 0, "text": "Q, with [brackets] and {braces}", "timestamp": "2024-01-01T10:00:00",
+                "status": "approved", "user_id": "Red Fox", "highlighted": False, "votes": 12345}
+
+    def stream(self, text, monkeypatch):
+        """Stream a document with a tiny chunk size to exercise chunk boundaries."""
+        monkeypatch.setattr(JSONArrayStreamer, "CHUNK_SIZE", 3)
+        streamer = JSONArrayStreamer(io.StringIO(text))
+        return list(streamer.questions()), streamer.header
+
+    @pytest.mark.parametrize("document", [
+        {"next_id": 12345, "questions": [QUESTION, dict(QUESTION, id=1)]},
+        {"questions": [QUESTION, dict(QUESTION, id=1)], "next_id": 12345},
+    ])
+    def test_current_format(self, document, monkeypatch):
+        """Test streaming the dict format, whatever the key order."""
+        questions, header = self.stream(json.dumps(document, indent=1), monkeypatch)
+        assert questions == document["questions"]
+        assert header == {"next_id": 12345}
+
+    def test_legacy_format(self, monkeypatch):
+        """Test streaming the old list format."""
+        questions, header = self.stream(json.dumps([self.QUESTION]), monkeypatch)
+        assert questions == [self.QUESTION]
+        assert header == {}
+        assert self.stream("[]", monkeypatch) == ([], {})
+        assert self.stream('{"questions": []}', monkeypatch) == ([], {})
+
+    def test_malformed_document(self, monkeypatch):
+        """Test that truncated documents raise a decode error."""
+        text = json.dumps({"next_id": 1, "questions": [self.QUESTION]})
+        with pytest.raises(json.JSONDecodeError):
+            self.stream(text[:-10], monkeypatch)
+        with pytest.raises(json.JSONDecodeError):
+            self.stream("42", monkeypatch)
+
+    def test_timestamps_parsed_on_access(self, tmp_path):
+        """Test that loading leaves timestamps unparsed until they're read."""
+        path = tmp_path / "data.json"
+        path.write_text(json.dumps({"next_id": 5, "questions": [self.QUESTION]}))
+
+        manager = MarshmallowManager(storage_type="file", storage_path=path)
+        record = manager.question_map[0]
+        assert manager.next_id == 5
+        assert isinstance(record.timestamp_us, str)
+
+        assert record["timestamp"] == datetime.datetime(2024, 1, 1, 10)
+        assert isinstance(record.timestamp_us, int)
+
+    def test_legacy_file_next_id(self, tmp_path):
+        """Test that old list-format files still load, with next_id from the count."""
+        path = tmp_path / "data.json"
+        path.write_text(json.dumps([self.QUESTION, dict(self.QUESTION, id=1)]))
+
+        manager = MarshmallowManager(storage_type="file", storage_path=path)
+        assert manager.next_id == 2
+        assert manager.get_sorted_questions("votes")[0]["id"] == 0
+
+    def test_background_load(self, tmp_path, monkeypatch):
+        """Test that the constructor returns before loading and methods wait for it."""
+        path = tmp_path / "data.json"
+        path.write_text(json.dumps({"next_id": 1, "questions": [self.QUESTION]}))
+
+        release = threading.Event()
+        original = MarshmallowManager._read_data_file
+
+        def slow_read(manager):
+            release.wait()
+            return original(manager)
+
+        monkeypatch.setattr(MarshmallowManager, "_read_data_file", slow_read)
+        manager = MarshmallowManager(storage_type="file", storage_path=path)
+
+        # Sessions can be created while the file is still loading
+        session = manager.create_session()
+        release.set()
+        assert manager.get_random_question(session)["id"] == 0
+        assert manager.count_questions() == 1
+        manager.close()
+
+    def test_unparsed_timestamps_are_saved_unchanged(self, tmp_path):
+        """Test that saving writes never-accessed timestamps back verbatim."""
+        path = tmp_path / "data.json"
+        path.write_text(json.dumps({"next_id": 1, "questions": [self.QUESTION]}))
+
+        manager = MarshmallowManager(storage_type="file", storage_path=path)
+        manager.vote_for_question(0)
+        saved = json.loads(path.read_text())["questions"][0]
+        assert saved["timestamp"] == "2024-01-01T10:00:00"
+        assert isinstance(manager.question_map[0].timestamp_us, str)
+
+
+class TestBinaryFormat:
+    """Tests for the binary data file format."""
+
+    @pytest.mark.parametrize("compress", [True, False])
+    def test_round_trip(self, tmp_path, compress):
+        """Test that saving and loading the binary format preserves every field."""
+        path = tmp_path / "data.json"
+        manager = MarshmallowManager(storage_type="file", storage_path=path,
+                                     file_format="binary", compress=compress)
+        manager.add_question("Plain question")
+        manager.add_question("Ünïcödé question 🍡", user_id="Red Fox")
+        manager.add_question("Deleted")
+        manager.vote_for_question(1)
+        manager.vote_for_question(1, "Blue Owl")
+        manager.vote_for_question(2, "Blue Owl")
+        manager.highlight_question(1, True)
+        manager.set_question_status(0, "pending")
+        manager.delete_question(2)
+        assert is_binary_data_file(path)
+
+        reloaded = MarshmallowManager(storage_type="file", storage_path=path)
+        assert reloaded.next_id == 3
+        assert [dict(q) for q in reloaded.questions] == [dict(q) for q in manager.questions]
+        assert reloaded.question_map[1].user_id is sys.intern("Red Fox")
+        assert reloaded.has_voted(1, "Blue Owl")
+        assert not reloaded.vote_for_question(1, "Blue Owl")
+
+    def test_reads_version_1(self, tmp_path, monkeypatch):
+        """Test that files written before voters were tracked still load."""
+        monkeypatch.setattr(storage, "BINARY_VERSION", 1)
+        path = tmp_path / "data.json"
+        data = storage.encode_binary(1, [QuestionRecord.from_dict({
+            "id": 0, "text": "Old", "timestamp": datetime.datetime(2024, 1, 1),
+            "status": "approved", "user_id": "Red Fox", "highlighted": False, "votes": 4,
+        })], voters=None)
+        # Version 1 ends after the questions: drop the empty voter section
+        # and the change versions
+        payload = zlib.decompress(data[storage.HEADER_STRUCT.size:])[:-8 - 16]
+        path.write_bytes(data[:storage.HEADER_STRUCT.size] + zlib.compress(payload))
+
+        manager = MarshmallowManager(storage_type="file", storage_path=path)
+        assert manager.question_map[0]["votes"] == 4
+        assert manager.vote_for_question(0, "Blue Owl")
+
+    def test_json_file_migrates(self, tmp_path):
+        """Test that an existing JSON file loads and is rewritten as binary."""
+        path = tmp_path / "data.json"
+        json_manager = MarshmallowManager(storage_type="file", storage_path=path)
+        json_manager.add_question("Old question")
+        assert not is_binary_data_file(path)
+
+        binary_manager = MarshmallowManager(storage_type="file", storage_path=path,
+                                            file_format="binary")
+        assert binary_manager.question_map[0]["text"] == "Old question"
+        binary_manager.add_question("New question")
+        assert is_binary_data_file(path)
+
+        # Reading it back with the default (JSON) settings still works
+        reloaded = MarshmallowManager(storage_type="file", storage_path=path)
+        assert [q["text"] for q in reloaded.questions] == ["Old question", "New question"]
+
+    @pytest.mark.parametrize("attribute", ["questions", "question_map"])
+    def test_assigned_dicts_are_saved(self, tmp_path, attribute):
+        """Test that plain question dicts assigned to the manager can be saved as binary."""
+        question = {"id": 0, "text": "Assigned", "timestamp": datetime.datetime(2024, 1, 1, 10),
+                    "status": "approved", "user_id": "Blue Owl", "highlighted": False, "votes": 2}
+        path = tmp_path / "data.json"
+        manager = MarshmallowManager(storage_type="file", storage_path=path, file_format="binary")
+        setattr(manager, attribute, [question] if attribute == "questions" else {0: question})
+        manager.save_questions()
+
+        reloaded = MarshmallowManager(storage_type="file", storage_path=path)
+        assert reloaded.question_map[0]["text"] == "Assigned"
+        assert reloaded.question_map[0]["votes"] == 2
+
+    def test_corrupt_file(self, tmp_path, capsys):
+        """Test that a corrupt binary file is reported and treated as empty."""
+        path = tmp_path / "data.json"
+        path.write_bytes(b"MMQB\x01\x01not zlib data")
+        manager = MarshmallowManager(storage_type="file", storage_path=path)
+        assert manager.count_questions() == 0
+        assert "Error loading questions" in capsys.readouterr().out
+
+    def test_decode_rejects_other_data(self):
+        """Test that decode_binary refuses non-binary data."""
+        with pytest.raises(ValueError):
+            decode_binary(b'{"next_id": 0, "questions": []}')
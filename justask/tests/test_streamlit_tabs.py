@@ -0,0 +1,182 @@
+"""
+Render-latency budget tests for the tabs of the Streamlit interface.
+
+Each tab is rendered headless with Streamlit's AppTest on boards of growing
+size. A render fails if it takes longer than the budget set with
+--render-budget-ms, and the number of widgets and markdown elements it
+emits is recorded (see the junit-xml properties) and must not grow with the
+board.
+"""
+
+import time
+import pytest
+
+pytest.importorskip("streamlit")
+
+from streamlit.testing.v1 import AppTest
+from marshmallow_lib.core import MarshmallowManager
+from marshmallow_lib.ratelimit import Limit, RateLimiter
+from marshmallow_lib.streamlit_gui import SessionState
+
+
+TABS = ["add_marshmallow_tab", "random_marshmallow_tab", "all_marshmallows_tab", "admin_section"]
+BOARD_SIZES = [10, 1_000, 10_000]
+
+_boards = {}
+
+
+def tab_script(tab_name: str) -> None:
+    """Script rendering a single tab (AppTest runs this function's body)."""
+    from marshmallow_lib import streamlit_gui
+    streamlit_gui.SessionState.setup_initial_state("memory")
+    getattr(streamlit_gui, tab_name)()
+
+
+def card_script(question_id: int) -> None:
+    """Script rendering a single question card."""
+    from marshmallow_lib import streamlit_gui
+    streamlit_gui.SessionState.setup_initial_state("memory")
+    manager = streamlit_gui.SessionState.get_manager()
+    streamlit_gui.display_question(manager.get_question_by_id(question_id))
+
+
+def get_board(size: int) -> MarshmallowManager:
+    """Get a manager holding the given number of questions (built once per size)."""
+    if size not in _boards:
+        manager = MarshmallowManager()
+        for i in range(size):
+            manager.add_question(f"Question {i}?")
+            if i % 3 == 0:
+                manager.vote_for_question(i)
+        _boards[size] = manager
+    return _boards[size]
+
+
+def render(tab_name: str, manager: MarshmallowManager, debug: bool = False):
+    """
+    Render a tab and time one script run.
+
+    Returns:
+        Tuple of (the AppTest after the run, run latency in ms)
+    """
+    at = AppTest.from_function(tab_script, args=(tab_name,), default_timeout=30)
+    at.session_state[SessionState.MANAGER] = manager
+    at.session_state[SessionState.USER_SESSION] = manager.create_session()
+    at.session_state[SessionState.DEBUG_MODE] = debug
+    at.run()  # First run pays for imports and session setup
+
+    start = time.perf_counter()
+    at.run()
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    assert not at.exception
+    return at, elapsed_ms
+
+
+def element_counts(at: AppTest) -> dict:
+    """Count the widgets and markdown elements a run emitted."""
+    widgets = sum(len(elements) for elements in
+                  (at.button, at.checkbox, at.selectbox, at.text_area, at.text_input))
+    return {"widgets": widgets, "markdown": len(at.markdown)}
+
+
+class TestRenderLatency:
+    """Latency budget and element-count tests for each tab."""
+
+    @pytest.mark.parametrize("size", BOARD_SIZES)
+    @pytest.mark.parametrize("tab_name", TABS)
+    def test_render_within_budget(self, tab_name, size, render_budget_ms, record_property):
+        """Test that rendering a tab stays within the latency budget."""
+        at, elapsed_ms = render(tab_name, get_board(size))
+
+        record_property("render_ms", round(elapsed_ms, 1))
+        for name, count in element_counts(at).items():
+            record_property(name, count)
+        assert elapsed_ms <= render_budget_ms, (
+            f"{tab_name} took {elapsed_ms:.0f} ms on {size} questions "
+            f"(budget {render_budget_ms:.0f} ms)"
+        )
+
+    @pytest.mark.parametrize("tab_name", TABS)
+    def test_element_count_is_flat(self, tab_name):
+        """Test that a tab emits as many elements for a big board as for a small one."""
+        # Both boards fill a whole See All page
+        small, _ = render(tab_name, get_board(BOARD_SIZES[1]))
+        large, _ = render(tab_name, get_board(BOARD_SIZES[-1]))
+        assert element_counts(large) == element_counts(small)
+
+    def test_debug_messages_are_lazy(self, monkeypatch):
+        """Test that debug messages aren't built (formatting every question) unless debug is on."""
+        reads = []
+        questions = MarshmallowManager.questions
+        monkeypatch.setattr(MarshmallowManager, "questions",
+                            property(lambda self: reads.append(1) or questions.fget(self)))
+        manager = get_board(BOARD_SIZES[0])
+
+        for tab_name in ("random_marshmallow_tab", "all_marshmallows_tab"):
+            render(tab_name, manager)
+        assert not reads
+
+        render("random_marshmallow_tab", manager, debug=True)
+        assert reads
+
+
+class TestClickToUpdate:
+    """Tests for the click-to-update path of the question cards."""
+
+    def click_vote(self, manager: MarshmallowManager, question_id: int, debug: bool = False,
+                   user_id: str = None):
+        """
+        Render a card, click its vote button and time the click.
+
+        Returns:
+            Tuple of (the AppTest after the click, click-to-update latency in ms)
+        """
+        at = AppTest.from_function(card_script, args=(question_id,), default_timeout=30)
+        at.session_state[SessionState.MANAGER] = manager
+        at.session_state[SessionState.USER_SESSION] = manager.create_session(user_id)
+        at.session_state[SessionState.DEBUG_MODE] = debug
+        at.run()
+
+        start = time.perf_counter()
+        at.button(key=f"vote_{question_id}").click().run()
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        assert not at.exception
+        return at, elapsed_ms
+
+    def test_vote_click_updates_card_within_budget(self, render_budget_ms, record_property):
+        """Test that a vote click redraws the card with the new count within the budget."""
+        manager = MarshmallowManager()
+        manager.add_question("Click me?")
+        question_id = 0
+
+        at, elapsed_ms = self.click_vote(manager, question_id)
+
+        record_property("click_ms", round(elapsed_ms, 1))
+        assert manager.get_question_by_id(question_id)["votes"] == 1
+        assert at.button(key=f"vote_{question_id}").label == "👎 Unvote (1)"
+        assert elapsed_ms <= render_budget_ms
+
+    def test_debug_mode_reports_click_latency(self):
+        """Test that the redrawn card shows its click-to-update latency in debug mode."""
+        manager = MarshmallowManager()
+        manager.add_question("Click me?")
+        question_id = 0
+
+        at, _ = self.click_vote(manager, question_id, debug=True)
+        assert any("Click-to-update:" in md.value for md in at.markdown)
+
+        at.run()  # A rerun without a click reports nothing
+        assert not any("Click-to-update:" in md.value for md in at.markdown)
+
+    def test_sessions_sharing_a_name_vote_separately(self):
+        """Test that two sessions with the same display name get their own vote and rate limit."""
+        manager = MarshmallowManager()
+        manager.add_question("Click me?")
+        manager.rate_limiter = RateLimiter({"vote": (Limit(rate=0.01, burst=1), Limit(rate=100, burst=100))})
+
+        first, _ = self.click_vote(manager, 0, user_id="Blue Owl")
+        second, _ = self.click_vote(manager, 0, user_id="Blue Owl")
+
+        assert manager.get_question_by_id(0)["votes"] == 2
+        assert not first.warning and not second.warning
+        assert second.button(key="vote_0").label == "👎 Unvote (2)"
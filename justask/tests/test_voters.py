@@ -0,0 +1,90 @@
+"""
+Unit tests for the voter tracking structures of the Marshmallows application.
+"""
+
+import random
+import pytest
+from marshmallow_lib.voters import VoterIndex, VoterSet
+
+
+class TestVoterSet:
+    """Tests for the VoterSet class."""
+
+    def test_matches_set(self):
+        """Test random adds and discards against a plain set, across both forms."""
+        rng = random.Random(7)
+        voters = VoterSet()
+        expected = set()
+
+        for _ in range(3000):
+            number = rng.randint(0, 600)
+            if rng.random() < 0.4:
+                assert voters.discard(number) == (number in expected)
+                expected.discard(number)
+            else:
+                assert voters.add(number) == (number not in expected)
+                expected.add(number)
+            assert len(voters) == len(expected)
+
+        assert list(voters) == sorted(expected)
+        for number in range(700):
+            assert (number in voters) == (number in expected)
+
+    def test_dense_set_is_a_bitmap(self):
+        """Test that a whole class of voters serializes to a bitmap of a few bytes."""
+        voters = VoterSet(range(500))
+        assert len(voters.to_bytes()) == 1 + 63  # 500 bits
+        sparse = VoterSet([3, 100_000])
+        assert len(sparse.to_bytes()) == 1 + 2 * 4
+
+    @pytest.mark.parametrize("numbers", [[], [5, 9], list(range(0, 400, 2)), [0, 70_000]])
+    def test_bytes_round_trip(self, numbers):
+        """Test that to_bytes and from_bytes preserve the set."""
+        voters = VoterSet.from_bytes(VoterSet(numbers).to_bytes())
+        assert list(voters) == numbers
+
+    def test_from_bytes_rejects_other_data(self):
+        """Test that from_bytes refuses data that isn't a serialized set."""
+        with pytest.raises(ValueError):
+            VoterSet.from_bytes(b"\x07abc")
+        with pytest.raises(ValueError):
+            VoterSet.from_bytes(b"\x00abc")
+
+
+class TestVoterIndex:
+    """Tests for the VoterIndex class."""
+
+    def test_one_vote_per_user(self):
+        """Test that each user votes for a question at most once."""
+        index = VoterIndex()
+        assert index.add(1, "Red Fox")
+        assert not index.add(1, "Red Fox")
+        assert index.add(1, "Blue Owl")
+        assert index.add(2, "Red Fox")
+        assert index.has_voted(1, "Red Fox")
+        assert not index.has_voted(3, "Red Fox")
+        assert not index.has_voted(1, "Green Cat")
+        assert index.voters(1) == ["Red Fox", "Blue Owl"]
+
+        assert index.discard(1, "Red Fox")
+        assert not index.discard(1, "Red Fox")
+        assert not index.discard(1, "Green Cat")
+        assert index.voters(1) == ["Blue Owl"]
+
+        index.remove_question(1)
+        assert index.voters(1) == []
+        assert index.user_ids == ["Red Fox", "Blue Owl"]  # Numbers are kept
+
+    def test_serialized_round_trip(self):
+        """Test that to_serialized and from_serialized preserve every vote."""
+        index = VoterIndex()
+        for question_id in range(20):
+            for user in range(question_id * 10):
+                index.add(question_id, f"user {user}")
+
+        reloaded = VoterIndex.from_serialized(index.to_serialized())
+        assert reloaded.user_ids == index.user_ids
+        for question_id in range(20):
+            assert reloaded.voters(question_id) == index.voters(question_id)
+        assert not reloaded.add(5, "user 3")
+        assert VoterIndex.from_serialized(None).voter_sets == {}